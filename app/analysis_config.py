@@ -0,0 +1,13 @@
+# pyright: reportMissingImports=false
+# Kept apart from app_functions, so the app can build its layout without importing the analytics stack
+
+# The vectorize_document parameters used by the web app
+ANALYSIS_PARAMS = {'max_features': 5000, 'expanded_stop_words': True, 'section_count': 10, 'split_by': 'characters'}
+
+# The stages of analyze_upload_stages, in the order they complete, and the results each produces
+ANALYSIS_STAGES = {
+  'vectorizing': ['word_counts', 'word_freq_df', 'relative_freq_section', 'summary'],
+  'bigrams': ['bigrams'],
+  'readability': ['stats'],
+  'correlations': ['correlation_index'],
+}
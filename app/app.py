@@ -1,16 +1,26 @@
 # pyright: reportMissingImports=false
 import os
+import threading
+import uuid
 
 from dash import Dash
 from dash import dcc, html
+from dash import no_update
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 import dash_loading_spinners as dls
-from flask import Flask, render_template
-from helpers import write_file
-from render_app import RunApplication
-from collections import defaultdict
-from app_functions import *
+from flask import Flask, Response, render_template
+import metrics
+from analysis_config import ANALYSIS_PARAMS, ANALYSIS_STAGES
+from document_store import create_document_store
+from helpers import table_page, write_file
+from jobs import get_executor, submit_analysis
+from render_app import (CorpusApplication, RunApplication, analysis_error, network_panel_body, readability_panel_body,
+  reading_stats_body, stats_panel_body)
+from result_cache import cache_key, create_result_cache
+# The analytics stack (pandas, sklearn, scipy, plotly express, visdcc) is imported by the
+# callbacks that need it, so the layout and static pages are served as soon as the app starts.
+# warm_up loads it ahead of the first upload.
 
 # external style sheets
 external_stylesheets = [{
@@ -34,7 +44,10 @@ external_stylesheets = [{
 server = Flask(__name__, static_folder='assets')
 app = Dash(server=server, external_stylesheets=external_stylesheets)
 app.title = 'Linguine - Text Analysis App'
-AppData = defaultdict(lambda: None)
+documents = create_document_store()
+results = create_result_cache()
+# @FIXME: upload the file to a better location. S3 bucket?
+UPLOAD_DIRECTORY = '/tmp/uploads'
 
 # Route other pages
 @server.route('/about/')
@@ -45,107 +58,366 @@ def about():
 def interpretation():
   return render_template('interpretation.html')
 
+if metrics.ENABLED:
+  @server.route('/metrics')
+  def serve_metrics():
+    # the stage and callback timings of every process of the app, for Prometheus to scrape
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def warm_up(background=True):
+  """Import the analytics stack, so the first upload does not wait for it
+
+  Args:
+    background (bool, optional): Whether to import from a daemon thread and return at once. Defaults to True.
+  """
+  def load():
+    import app_functions  # noqa: F401
+    from correlator import get_tokenizer
+    get_tokenizer(ANALYSIS_PARAMS['expanded_stop_words'])
+  if background:
+    threading.Thread(target=load, name='warm-up', daemon=True).start()
+  else:
+    load()
+
 # Define app callbacks for initial load
 @app.callback(
-  Output('linguine-app', 'children'),
-  [Input('upload-data', 'filename'), Input('upload-data', 'contents')]
+  [Output('linguine-app', 'children'), Output('upload-status', 'children')],
+  [Input('upload-data', 'filename'), Input('upload-data', 'contents')],
+  State('session-id', 'data')
 )
-def save_file(filename, contents):
-  # @FIXME: upload the file to a better location. S3 bucket?
-  UPLOAD_DIRECTORY = '/tmp/uploads'
+@metrics.callback
+def save_file(filename, contents, session_id):
   if filename is None or contents is None:
     raise PreventUpdate
   else:
     if filename.endswith('.txt'):
-      write_file(UPLOAD_DIRECTORY, filename, contents)
+      with metrics.stage('write_file') as labels:
+        file__path, document_hash = write_file(UPLOAD_DIRECTORY, filename, contents)
+        labels['document_size'] = os.path.getsize(file__path)
     else:
       raise PreventUpdate
-  file__path = os.path.join(UPLOAD_DIRECTORY, filename)
-  word_count_df, bigrams, stats = get_data_and_stats(file__path)
-  word_freq_df = generate_word_frequency(word_count_df, stats)
-  relative_freq_section_df = relative_frequency_by_section(word_count_df)
-  stats['filename'] = filename.lower().split('.')[0]
-  stats['top_10_words'] = [word_freq_df['Word'].iloc[i] for i in range(10)]
-  AppData['word_count_df'] = word_count_df
-  AppData['bigrams'] = bigrams
-  AppData['stats'] = stats
-  AppData['word_freq_df'] = word_freq_df
-  AppData['relative_freq_section_df'] = relative_freq_section_df
-  return RunApplication(AppData)
+  from correlator import get_stop_words
+  # the same text analysed with the same parameters is only ever analysed once
+  key = cache_key(document_hash, get_stop_words(ANALYSIS_PARAMS['expanded_stop_words']), **ANALYSIS_PARAMS)
+  filename = filename.lower().split('.')[0]
+  with metrics.stage('load_results', os.path.getsize(file__path)):
+    document = results.load(key)
+  if document is None:
+    # analyse in the background, the panels fill in as the stages complete
+    submit_analysis(documents, results, session_id, file__path, document_hash, filename, key)
+    return RunApplication([]), None
+  document['document_hash'] = document_hash
+  document['analysis_key'] = key
+  document['summary']['filename'] = filename
+  progress = {'stages': list(ANALYSIS_STAGES), 'error': None}
+  documents.delete(session_id)
+  documents.save(session_id, progress=progress, **document)
+  return RunApplication(progress['stages']), None
+
+@app.callback(
+  [*[Output(f'stage-{stage}', 'data') for stage in ANALYSIS_STAGES],
+    Output('analysis-error', 'children'), Output('analysis-poll', 'disabled')],
+  Input('analysis-poll', 'n_intervals'),
+  [State(f'stage-{stage}', 'data') for stage in ANALYSIS_STAGES],
+  State('session-id', 'data')
+)
+@metrics.callback
+def poll_analysis(n_intervals, *states):
+  """Mark the stages the background analysis completed, which loads their panels
+
+  Args:
+    n_intervals (int): Number of polls so far
+    *states: Whether each stage was already marked completed, then the session id
+
+  Returns:
+    tuple: The completed flag of every stage, the analysis error and whether to stop polling
+  """
+  *completed, session_id = states
+  progress = documents.get(session_id, 'progress')
+  if progress is None:
+    raise PreventUpdate
+  finished = progress['error'] is not None or len(progress['stages']) == len(ANALYSIS_STAGES)
+  # only flip the stores that changed, so every panel callback runs once
+  flags = [True if stage in progress['stages'] and not done else no_update
+    for stage, done in zip(ANALYSIS_STAGES, completed)]
+  return (*flags, analysis_error(progress['error']) if progress['error'] else no_update, finished)
+
+@app.callback(
+  Output('stats-panel', 'children'),
+  Input('stage-vectorizing', 'data'),
+  State('session-id', 'data')
+)
+@metrics.callback
+def update_stats_panel(ready, session_id):
+  summary = documents.get(session_id, 'summary') if ready else None
+  if summary is None:
+    raise PreventUpdate
+  return stats_panel_body(summary)
+
+@app.callback(
+  [Output('reading-stats', 'children'), Output('readability-panel', 'children')],
+  Input('stage-readability', 'data'),
+  State('session-id', 'data')
+)
+@metrics.callback
+def update_readability_panels(ready, session_id):
+  stats = documents.get(session_id, 'stats') if ready else None
+  if stats is None:
+    raise PreventUpdate
+  return reading_stats_body(stats), readability_panel_body(stats)
+
+@app.callback(
+  Output('network-panel', 'children'),
+  Input('stage-bigrams', 'data'),
+  State('session-id', 'data')
+)
+@metrics.callback
+def update_network_panel(ready, session_id):
+  bigrams = documents.get(session_id, 'bigrams') if ready else None
+  if bigrams is None:
+    raise PreventUpdate
+  return network_panel_body(bigrams)
+
+@app.callback(
+  [Output('word-frequency-table', 'data'), Output('word-frequency-table', 'page_count')],
+  [Input('stage-vectorizing', 'data'),
+    Input('word-frequency-table', 'page_current'), Input('word-frequency-table', 'page_size'),
+    Input('word-frequency-table', 'sort_by'), Input('word-frequency-table', 'filter_query')],
+  State('session-id', 'data')
+)
+@metrics.callback
+def update_word_frequency_table(ready, page_current, page_size, sort_by, filter_query, session_id):
+  """Serve one page of the word frequency table
+
+  Args:
+    ready (bool): Whether the words have been counted
+    page_current (int): The page to show
+    page_size (int): The number of rows per page
+    sort_by (list): The column to sort by and its direction
+    filter_query (str): The filter typed under the column headers
+    session_id (str): The session whose document is shown
+
+  Returns:
+    tuple: The rows of the page and the number of pages
+  """
+  word_freq_df = documents.get(session_id, 'word_freq_df') if ready else None
+  if word_freq_df is None:
+    raise PreventUpdate
+  return table_page(word_freq_df, page_current, page_size, sort_by, filter_query)
 
 @app.callback(
     Output('word-frequency', 'figure'),
-    Input('search-word-frequency-button', 'n_clicks'),
-    State('search-word-frequency-input', 'value')
+    [Input('stage-vectorizing', 'data'), Input('search-word-frequency-button', 'n_clicks')],
+    State('search-word-frequency-input', 'value'),
+    State('session-id', 'data')
   )
-def update_word_frequency_plot(n_clicks, words):
+@metrics.callback
+def update_word_frequency_plot(ready, n_clicks, words, session_id):
   """Update word frequency plot
 
   Args:
+    ready (bool): Whether the words have been counted
     n_clicks (int): Number of clicks on the button
     words (str): Words to search for
+    session_id (str): The session whose document is plotted
 
   Returns:
     dash.figure: Plotly figure
   """
-  relative_freq_section_df = AppData['relative_freq_section_df']
+  relative_freq_section = documents.get(session_id, 'relative_freq_section') if ready else None
+  if relative_freq_section is None:
+    raise PreventUpdate
+  from app_functions import plot_word_frequency
   words = [] if len(words.strip()) == 0 else words.split(',')
-  fig = plot_word_frequency(relative_freq_section_df, words)
+  fig = plot_word_frequency(relative_freq_section, words)
   return fig
 
 @app.callback(
   Output('word-correlation-table', 'children'),
-  Input('search-word-correlation-button', 'n_clicks'),
-  State('search-word-correlation-input', 'value')
+  [Input('stage-correlations', 'data'), Input('search-word-correlation-button', 'n_clicks')],
+  State('search-word-correlation-input', 'value'),
+  State('session-id', 'data')
 )
-def update_word_correlation_table(n_clicks, word):
+@metrics.callback
+def update_word_correlation_table(ready, n_clicks, word, session_id):
   """Update the word correlation table
 
   Args:
+    ready (bool): Whether the correlations have been computed
     n_clicks (int): Number of clicks
     word (str): Word to search for
+    session_id (str): The session whose document is searched
 
   Returns:
     html: Table with word correlation
   """
-  word_count_df = AppData['word_count_df']
-  word = word.strip()
-  table = plot_word_correlations(word_count_df, word)
+  key = documents.get(session_id, 'analysis_key') if ready else None
+  if key is None:
+    raise PreventUpdate
+  from app_functions import plot_word_correlations
+  from correlation_index import correlation_indexes
+  # the store is only read the first time this process searches the analysis
+  index = correlation_indexes.get(key, lambda: stored_correlation_index(session_id))
+  table = plot_word_correlations(None, word, index)
   return table
 
-# Main app layout
-app.layout = html.Div(children=[
-  html.Div(className='container px-0', children=[
-    html.Div(className='navbar __navbar', children=[
-      html.Div(className='navbar-section', children=[
-        html.A(className='btn btn-link header-link', href='/', children='Home'),
-        html.A(className='btn btn-link header-link', href='/about', children='About'),
-        html.A(className='btn btn-link header-link', href='/interpretation', children='Interpretation'),
+def stored_correlation_index(session_id):
+  """The correlation index of a session, built from its word counts for cached analyses"""
+  index = documents.get(session_id, 'correlation_index')
+  if index is None:
+    word_counts = documents.get(session_id, 'word_counts')
+    if word_counts is None:
+      raise PreventUpdate
+    from correlation_index import CorrelationIndex
+    index = CorrelationIndex(word_counts)
+  return index
+
+def corpus_session(session_id):
+  """The store session of the corpus of a session, apart from its single document"""
+  return f'{session_id}:corpus'
+
+@app.callback(
+  [Output('corpus-app', 'children'), Output('corpus-status', 'children')],
+  [Input('corpus-upload', 'filename'), Input('corpus-upload', 'contents')],
+  State('session-id', 'data')
+)
+@metrics.callback
+def save_corpus(filenames, contents, session_id):
+  """Add uploaded files to the corpus of the session
+
+  The files the corpus does not hold yet are counted in parallel in the job pool and
+  added to its shared vocabulary matrix, the documents already counted are kept as is.
+
+  Args:
+    filenames (list): The names of the uploaded files
+    contents (list): The base64 contents of the files
+    session_id (str): The session whose corpus grows
+
+  Returns:
+    tuple: The corpus dashboard and the upload status
+  """
+  if not filenames or not contents:
+    raise PreventUpdate
+  from corpus import Corpus, count_documents
+  corpus = documents.get(corpus_session(session_id), 'corpus') or Corpus()
+  uploads = {}
+  for filename, content in zip(filenames, contents):
+    if filename.endswith('.txt'):
+      file_path, document_hash = write_file(UPLOAD_DIRECTORY, filename, content)
+      if document_hash not in corpus:
+        uploads[document_hash] = (filename.lower().split('.')[0], file_path)
+  if len(corpus) + len(uploads) == 0:
+    raise PreventUpdate
+  with metrics.stage('count_documents') as labels:
+    counts = count_documents([file_path for _, file_path in uploads.values()], get_executor(documents),
+      ANALYSIS_PARAMS['expanded_stop_words'])
+    labels['document_size'] = sum(os.path.getsize(file_path) for _, file_path in uploads.values())
+  for (document_hash, (name, _)), document_counts in zip(uploads.items(), counts):
+    corpus.add(name, document_counts, key=document_hash)
+  documents.save(corpus_session(session_id), corpus=corpus)
+  return CorpusApplication(corpus.documents, corpus.summary()), None
+
+@app.callback(
+  Output('corpus-frequency', 'figure'),
+  Input('search-corpus-frequency-button', 'n_clicks'),
+  State('search-corpus-frequency-input', 'value'),
+  State('session-id', 'data')
+)
+@metrics.callback
+def update_corpus_frequency_plot(n_clicks, words, session_id):
+  """Compare the relative frequency of words across the documents of the corpus
+
+  Args:
+    n_clicks (int): Number of clicks on the button
+    words (str): Words to compare, separated by commas
+    session_id (str): The session whose corpus is plotted
+
+  Returns:
+    dash.figure: Plotly figure
+  """
+  corpus = documents.get(corpus_session(session_id), 'corpus')
+  if corpus is None:
+    raise PreventUpdate
+  from app_functions import plot_corpus_frequency
+  return plot_corpus_frequency(corpus, words.split(','))
+
+@app.callback(
+  Output('distinctive-words-table', 'children'),
+  Input('corpus-document', 'value'),
+  State('session-id', 'data')
+)
+@metrics.callback
+def update_distinctive_words(document, session_id):
+  """Show the distinctive words of a document of the corpus
+
+  Args:
+    document (str): The name of the document
+    session_id (str): The session whose corpus is searched
+
+  Returns:
+    html: Table with the distinctive words
+  """
+  corpus = documents.get(corpus_session(session_id), 'corpus')
+  if corpus is None or document not in corpus.documents:
+    raise PreventUpdate
+  from app_functions import distinctive_words_table
+  return distinctive_words_table(corpus, document)
+
+# Main app layout, built per page load so that every visitor gets their own session
+def serve_layout():
+  return html.Div(children=[
+    dcc.Store(id='session-id', data=uuid.uuid4().hex),
+    html.Div(className='container px-0', children=[
+      html.Div(className='navbar __navbar', children=[
+        html.Div(className='navbar-section', children=[
+          html.A(className='btn btn-link header-link', href='/', children='Home'),
+          html.A(className='btn btn-link header-link', href='/about', children='About'),
+          html.A(className='btn btn-link header-link', href='/interpretation', children='Interpretation'),
+        ]),
+        html.Div(className='navbar-center', children=[
+          html.H2(className='navbar-brand mr-2 logo', children='Linguine Labs'),
+        ]),
+        html.Div(className='navbar-section', children=[
+          html.Div(className='input-group input-inline', children=[
+            html.A(className='btn btn-link header-link', href='//github.com/collinsnji/LinguineLabs', children='GitHub')
+          ])
+        ])
       ]),
-      html.Div(className='navbar-center', children=[
-        html.H2(className='navbar-brand mr-2 logo', children='Linguine Labs'),
+      html.Div(className='file-upload', children=[
+        dcc.Upload(id='upload-data',
+          className='file-upload__input',
+          children=html.Div(['Drag and drop or click to select a file to upload.']),
+          multiple=False
+        ),
       ]),
-      html.Div(className='navbar-section', children=[
-        html.Div(className='input-group input-inline', children=[
-          html.A(className='btn btn-link header-link', href='//github.com/collinsnji/LinguineLabs', children='GitHub')
-        ])
-      ])
-    ]),
-    html.Div(className='file-upload', children=[
-      dcc.Upload(id='upload-data',
-        className='file-upload__input',
-        children=html.Div(['Drag and drop or click to select a file to upload.']),
-        multiple=False
+      html.Div(className='file-upload', children=[
+        dcc.Upload(id='corpus-upload',
+          className='file-upload__input',
+          children=html.Div(['Or drop several files to compare them as a corpus.']),
+          multiple=True
+        ),
+      ]),
+      dls.Bars(
+        html.Div(id='upload-status'),
+        fullscreen=True,
+        show_initially=False
       ),
-    ]),
-    dls.Bars(
+      dls.Bars(
+        html.Div(id='corpus-status'),
+        fullscreen=True,
+        show_initially=False
+      ),
+      # outside the spinner, panels show their own progress while they load
       html.Div(id='linguine-app', children=[]),
-      fullscreen=True,
-      show_initially=False
-    )
+      html.Div(id='corpus-app', children=[])
+    ])
   ])
-])
+
+app.layout = serve_layout
 
 # Run the app
 if __name__ == '__main__':
+  if metrics.ENABLED:
+    metrics.registry.reset()
+  warm_up()
   app.run_server(debug=False, threaded=True)
\ No newline at end of file
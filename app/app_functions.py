@@ -1,134 +1,249 @@
 # pyright: reportMissingImports=false
+import os
 import random
 
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import textstat as ts
-import visdcc
-from correlator import get_all_correlations, get_vectorization
+from scipy.sparse import diags
+from bigram_graph import BigramGraph
+from correlation_index import CorrelationIndex
+from correlator import SectionMatrix, count_bigrams, get_all_correlations, vectorize_document
 from collections import defaultdict
-from helpers import generate_table
+from metrics import stage
+from readability import Readability, section_readability
+from analysis_config import ANALYSIS_PARAMS, ANALYSIS_STAGES
 
+# plotly, visdcc and the dash helpers are imported by the functions that draw, so the batch CLI runs without dash
 
 # Define functions for the app
-def get_data_and_stats(file_path):
-  """Reads in the data and returns a dataframe and a dictionary of stats
+def get_readability_stats(text, word_count, sections=None):
+  """Computes the readability statistics shown in the summary bar
 
   Args:
-    file_path (str): The path to the raw data
+    text (str): The raw text of the document
+    word_count (int): The number of words in the document
+    sections (list, optional): The section strings of the document. When given, the stats
+      also hold the readability of every section. Defaults to None.
 
   Returns:
-    tuple: A tuple containing the dataframes and the stats dictionary (df, bigram_df, stats)
+    dict: The stats dictionary
   """
-  word_count_data = get_vectorization(file_path)
-  df_bigrams = get_vectorization(file_path, ngrams_range=(2, 2))
-  total_word_count = word_count_data['word_count'].sum()
-  df_bigrams = df_bigrams.drop(columns=['word_count'])
-  bigram_freq_df = df_bigrams.T
-  bigram_freq_df = bigram_freq_df.sum(axis=1)
-  bigram_freq_df = bigram_freq_df.T.reset_index()
-  bigram_freq_df.columns = ['bigram', 'count']
-  bigrams_df = bigram_freq_df.sort_values(by='count', ascending=False)
-  with open(file_path, 'r', encoding='utf8', errors='ignore') as f:
-    text = f.read()
-  
   grade_levels = ['Kindergarten', '1st Grade', '2nd Grade', '3rd Grade', 
     '4th Grade', '5th Grade', '6th Grade', '7th Grade', '8th Grade', 
     '9th Grade', '10th Grade', '11th Grade', '12th Grade', 'College', 'College Graduate']
+  readability = Readability.of(text)
   stats = {
-    'word_count': total_word_count,
-    'reading_ease': ts.flesch_reading_ease(text),
-    'reading_time': round(ts.reading_time(text, ms_per_char=0.65)),
-    'reading_level': grade_levels[min(24, round(abs(ts.automated_readability_index(text))))],
-    'text_standard': ts.text_standard(text)
+    'word_count': word_count,
+    'reading_ease': readability.flesch_reading_ease(),
+    'reading_time': round(readability.reading_time(ms_per_char=0.65)),
+    'reading_level': grade_levels[min(len(grade_levels) - 1, round(abs(readability.automated_readability_index())))],
+    'text_standard': readability.text_standard()
+  }
+  if sections is not None:
+    stats['section_readability'] = section_readability(sections).to_dict('list')
+  return stats
+
+def analyze_upload_stages(file_path, correlations=True, **analysis_params):
+  """Runs every analysis the dashboard shows on an uploaded file, one stage at a time
+
+  Args:
+    file_path (str): The path to the uploaded file
+    correlations (bool, optional): Whether to build the correlation index as a last stage. Defaults to True.
+    **analysis_params: Passed on to correlator.vectorize_document, defaults to ANALYSIS_PARAMS
+
+  Yields:
+    tuple: The name of the completed stage and a dict of the results it produced (stage, results)
+  """
+  params = {**ANALYSIS_PARAMS, **analysis_params}
+  labels = {'document_bytes': os.path.getsize(file_path)}
+  with stage('vectorize_document', **labels) as stage_labels:
+    analysis = vectorize_document(file_path, **params)
+    stage_labels['vocabulary'] = labels['vocabulary'] = len(analysis.word_counts.vocabulary)
+  word_counts = analysis.word_counts
+  word_count = word_counts.word_count.sum()
+  with stage('generate_word_frequency', **labels):
+    word_freq_df = generate_word_frequency(word_counts, {'word_count': word_count})
+    relative_freq_section = relative_frequency_by_section(word_counts)
+  # the cheap stats, shown before the readability formulas are done
+  summary = {'word_count': word_count, 'top_10_words': word_freq_df['Word'].iloc[:10].tolist()}
+  yield 'vectorizing', {
+    'word_counts': word_counts,
+    'word_freq_df': word_freq_df,
+    'relative_freq_section': relative_freq_section,
+    'summary': summary,
   }
-  return word_count_data, bigrams_df, stats
+  with stage('count_bigrams', **labels):
+    bigrams = count_bigrams(analysis.section_tokens, params['max_features'], analysis.token_ids)
+  yield 'bigrams', {'bigrams': bigrams}
+  with stage('get_readability_stats', **labels):
+    stats = get_readability_stats(analysis.text, word_count, analysis.sections)
+  stats['top_10_words'] = summary['top_10_words']
+  yield 'readability', {'stats': stats}
+  if correlations:
+    with stage('build_correlation_index', **labels):
+      index = CorrelationIndex(word_counts)
+      index.build()
+    yield 'correlations', {'correlation_index': index}
 
-def network_visualization(df, min_count=3):
-  """Creates a network visualization of the bigrams
+def analyze_upload(file_path, **analysis_params):
+  """Runs every analysis the dashboard shows on an uploaded file
 
   Args:
-    df (pd.DataFrame): The bigram dataframe
-    min_count (int, optional): Minimum number of connections required to plot. Defaults to 3.
+    file_path (str): The path to the uploaded file
+    **analysis_params: Passed on to correlator.vectorize_document, defaults to ANALYSIS_PARAMS
+
+  Returns:
+    dict: The word_counts SectionMatrix, the bigrams, the summary, the stats, the word_freq_df
+      and the relative_freq_section of the document
+  """
+  document = {}
+  for _, results in analyze_upload_stages(file_path, correlations=False, **analysis_params):
+    document.update(results)
+  return document
+
+def bigram_graph(bigrams, min_count):
+  """The graph of the bigram counts, unless it is one already"""
+  return bigrams if isinstance(bigrams, BigramGraph) else BigramGraph.from_pairs(*bigrams, min_count=min_count)
+
+def network_visualization(bigrams, min_count=3, max_nodes=50, max_edges=150, rank=None):
+  """Creates a network visualization of the most central words of the bigram graph
+
+  Args:
+    bigrams (BigramCounts | BigramGraph): The bigram counts, see correlator.count_bigrams, or
+      their graph, already built with a min_count
+    min_count (int, optional): Minimum number of connections required to plot, unless bigrams is a graph. Defaults to 3.
+    max_nodes (int, optional): The number of words to plot, by PageRank. Defaults to 50.
+    max_edges (int, optional): The number of bigrams between those words to plot, by count. Defaults to 150.
+    rank (np.ndarray, optional): The PageRank of every word of the graph, if already computed. Defaults to None.
 
   Returns:
     visdcc.Network: The network visualization
   """
-  with pd.option_context('mode.chained_assignment', None):
-    df = df[df['count']>min_count]
-    df.reset_index(inplace=True, drop=True)
-    df[['source', 'target']] = df['bigram'].str.split(' ', expand=True)
-    df = df.drop(columns=['bigram'])
-    df = df[['source', 'target', 'count']]
-  node_list = list(set(df['source'].values.tolist() + df['target'].values.tolist()))
-  nodes = [{'id': node, 'label': node, 'shape': 'dot', 'size': 7 } for _, node in enumerate(node_list)]
+  import visdcc
+  graph = bigram_graph(bigrams, min_count)
+  rank = graph.pagerank() if rank is None else rank
+  top = graph.top(max_nodes, max_edges, rank=rank)
+  # top keeps the words in this order
+  order = np.argsort(-rank, kind='stable')[:max_nodes]
+  top_rank, degree = rank[order], graph.degree()[order]
+  node_sizes = 7 + 18 * top_rank / top_rank.max() if len(top_rank) else top_rank
+  nodes = [{
+    'id': word, 'label': word, 'shape': 'dot', 'size': float(size),
+    'title': f'{word}: degree {d}, PageRank {r:.4f}'}
+  for word, size, d, r in zip(top.words, node_sizes, degree, top_rank)]
+  widths = 1 + 4 * top.weights / top.weights.max() if len(top.weights) else top.weights
   edges = [{
-    'id': f'{row["source"]}__{row["target"]}',
-    'from': row['source'], 'to': row['target'],
-    'width': row['count']*0.5}
-  for _, row in df.iterrows()]
+    'id': f'{top.words[source]}__{top.words[target]}',
+    'from': top.words[source], 'to': top.words[target],
+    'width': float(width)}
+  for source, target, width in zip(top.sources, top.targets, widths)]
   return visdcc.Network(
     id = 'net', 
     data = {'nodes': nodes, 'edges': edges},
     options = dict(height= '400px', width= '100%'))
 
+def centrality_table(bigrams, min_count=3, max_rows=10, rank=None):
+  """Tabulates the most central words of the bigram graph
+
+  Args:
+    bigrams (BigramCounts | BigramGraph): The bigram counts, see correlator.count_bigrams, or
+      their graph, already built with a min_count
+    min_count (int, optional): Minimum number of connections required to be ranked, unless bigrams is a graph. Defaults to 3.
+    max_rows (int, optional): The number of words to show. Defaults to 10.
+    rank (np.ndarray, optional): The PageRank of every word of the graph, if already computed. Defaults to None.
+
+  Returns:
+    html.Table: The degree, weighted degree and PageRank of the most central words
+  """
+  from helpers import generate_table
+  centrality = bigram_graph(bigrams, min_count).centrality(rank).head(max_rows)
+  centrality = centrality.rename(columns={'word': 'Word', 'degree': 'Degree', 'weighted_degree': 'Weighted Degree', 'pagerank': 'PageRank'})
+  centrality['PageRank'] = centrality['PageRank'].round(4)
+  return generate_table(centrality, max_rows=max_rows)
 
 def generate_word_frequency(df, stats):
   """Generates the word frequency data with relative frequencies
   
   Args:
-    df (pd.DataFrame): The word frequency dataframe
+    df (pd.DataFrame | SectionMatrix): The word frequency dataframe
     stats (dict): The stats dictionary
   
   Returns:
     pd.DataFrame: The word frequency data
   """
-  word_freq_df = df.drop(columns=['word_count'])
-  word_freq_df = df.sum(axis=0)
-  word_freq_df = word_freq_df.T.reset_index()
-  word_freq_df.columns = ['Word', 'Count']
-  word_freq_df = word_freq_df.sort_values(by='Count', ascending=False)
-  word_freq_df = word_freq_df[1:] # drop the word_count row
-  word_freq_df.columns = ['Word', 'Count']
-  word_freq_df['Relative'] = word_freq_df['Count'].apply(lambda v: round((v/stats['word_count'] * 100000), 3))
+  if isinstance(df, SectionMatrix):
+    word_freq_df = pd.DataFrame({'Word': df.vocabulary, 'Count': df.totals()})
+    word_freq_df = word_freq_df.sort_values(by='Count', ascending=False)
+  else:
+    word_freq_df = df.drop(columns=['word_count'])
+    word_freq_df = df.sum(axis=0)
+    word_freq_df = word_freq_df.T.reset_index()
+    word_freq_df.columns = ['Word', 'Count']
+    word_freq_df = word_freq_df.sort_values(by='Count', ascending=False)
+    word_freq_df = word_freq_df[1:] # drop the word_count row
+    word_freq_df.columns = ['Word', 'Count']
+  word_freq_df['Relative'] = (word_freq_df['Count'] / stats['word_count'] * 100000).round(3)
   return word_freq_df
 
-def relative_frequency_by_section(df):
-  """Generates the relative frequency by section data
+def relative_frequency_by_section(df, normalize='document'):
+  """Generates the relative frequency by section data, in occurrences per 100,000 words
 
   Args:
-    df (pd.DataFrame): The word frequency dataframe
+    df (pd.DataFrame | SectionMatrix): The word frequency dataframe, left unchanged
+    normalize (str, optional): Divide by the word count of the whole 'document' or of each 'section'.
+      Defaults to 'document'.
   
+  Raises:
+    ValueError: If normalize is not 'document' or 'section'
+
   Returns:
-    pd.DataFrame: The relative frequency by section data
+    pd.DataFrame | SectionMatrix: The relative frequency by section data
   """
-  df.reset_index(inplace=True)
-  df = df.rename(columns = {'index': 'section'})
-  total_word_count = df['word_count'].sum()
-  for col in df.columns:
-    if col != 'word_count' and col != 'section':
-      df[col] = df[[col, 'word_count']].apply(lambda x: (x[0]/total_word_count) * 100000, axis=1)
-  df = df.sort_values(by='word_count', ascending=False)
-  return df
+  if normalize not in ('document', 'section'):
+    raise ValueError("normalize must be 'document' or 'section'")
+  if isinstance(df, SectionMatrix):
+    word_count = df.word_count.astype(float)
+    if normalize == 'document':
+      return df._replace(counts=(df.counts / word_count.sum()) * 100000)
+    scale = np.divide(100000, word_count, out=np.zeros_like(word_count), where=word_count > 0)
+    return df._replace(counts=diags(scale) @ df.counts)
+  words = df.columns.drop('word_count')
+  word_count = df['word_count'].to_numpy(dtype=float)
+  divisor = word_count.sum() if normalize == 'document' else word_count[:, None]
+  counts = df[words].to_numpy(dtype=float)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    relative = np.where(divisor > 0, counts / divisor, 0) * 100000
+  relative_df = pd.DataFrame(relative, columns=words)
+  relative_df.insert(0, 'section', df.index)
+  relative_df['word_count'] = word_count.astype(df['word_count'].dtype)
+  return relative_df.sort_values(by='word_count', ascending=False)
 
 def plot_word_frequency(df, words=[]):
   """Plots the word frequency data
 
   Args:
-    df (pd.DataFrame): The word frequency dataframe
+    df (pd.DataFrame | SectionMatrix): The word frequency dataframe
     words (list, optional): The words to highlight. Defaults to [].
   
   Returns:
     plotly.express.line: The word frequency plot
   """
-  cols = random.sample(df.columns.tolist(), 5)
-  if len(words) == 0 or words is None:
-    df = df[['section', *cols]]
+  import plotly.express as px
+  if isinstance(df, SectionMatrix):
+    # only the plotted words are turned into a dataframe
+    word_filter = [word for word in words if word in df]
+    vocabulary = df.vocabulary.tolist()
+    df = df.to_frame(word_filter or random.sample(vocabulary, min(5, len(vocabulary))), word_count=False)
+    df = df.rename_axis('section').reset_index()
   else:
-    word_filter = [word for word in words if word in df.columns]
-    if len(word_filter) == 0:
+    cols = random.sample(df.columns.tolist(), min(5, len(df.columns)))
+    if len(words) == 0 or words is None:
       df = df[['section', *cols]]
-    df = df[['section', *word_filter]]
+    else:
+      word_filter = [word for word in words if word in df.columns]
+      if len(word_filter) == 0:
+        df = df[['section', *cols]]
+      df = df[['section', *word_filter]]
   with pd.option_context('mode.chained_assignment', None):
     df.section = df.section.astype(int)
     df.sort_values(by='section', ascending=True, inplace=True)
@@ -143,23 +258,55 @@ def plot_word_frequency(df, words=[]):
   fig.update_xaxes(tickmode='linear')
   return fig
 
-def plot_word_correlations(df, word=''):
+def plot_section_readability(section_readability):
+  """Plots how the readability of a document changes from section to section
+
+  Args:
+    section_readability (dict): The section, reading_ease and grade_level lists of the stats
+
+  Returns:
+    plotly.express.line: The readability plot
+  """
+  import plotly.express as px
+  df = pd.DataFrame(section_readability)
+  fig = px.line(df,
+    x='section',
+    y=['reading_ease', 'grade_level'],
+    line_shape='spline',
+    template='simple_white',
+    markers=True)
+  fig.update_xaxes(title_text='Segment')
+  fig.update_yaxes(title_text='Score')
+  fig.update_xaxes(tickmode='linear')
+  return fig
+
+def plot_word_correlations(df, word='', index=None):
   """Plots the word correlations for the first 10 words
 
   Args:
-    df (pd.DataFrame): The word frequency dataframe
+    df (pd.DataFrame | SectionMatrix): The word frequency dataframe, not needed when index is given
     word (str, optional): The word to plot. Defaults to ''.
+    index (CorrelationIndex, optional): The precomputed correlations of the document. Defaults to None,
+      which computes the correlations of the word against every other word.
   
   Returns:
     plotly.html: The word correlation table
   """
+  from helpers import generate_table
   all_correlations = []
   word = word.strip()
+  if index is not None:
+    words = index.words
+  else:
+    words = df.vocabulary if isinstance(df, SectionMatrix) else df.columns
   if len(word) == 0 or word is None or word == '':
-    word = random.sample(df.columns.tolist(), 1)[0]
-  if len(word) > 0 and word not in df.columns:
-    word = random.sample(df.columns.tolist(), 1)[0]
-  all_correlations = [*get_all_correlations(df, word)]
+    word = random.sample(words.tolist(), 1)[0]
+  if len(word) > 0 and word not in words:
+    word = random.sample(words.tolist(), 1)[0]
+  if index is None:
+    all_correlations = [*get_all_correlations(df, word)]
+  else:
+    all_correlations = index.get_correlations(word)
   word_list = []
   correlations_data = defaultdict(list)
   for corr in all_correlations:
@@ -172,3 +319,38 @@ def plot_word_correlations(df, word=''):
     correlations_df.reset_index(inplace=True)
     correlations_df = correlations_df.rename(columns={'level_0': 'statistic'})
   return generate_table(correlations_df.iloc[:, :11])
+
+def plot_corpus_frequency(corpus, words=[]):
+  """Plots the relative frequency of some words in every document of a corpus
+
+  Args:
+    corpus (Corpus): The corpus
+    words (list, optional): The words to plot. Defaults to the 5 most frequent words of the corpus.
+
+  Returns:
+    plotly.express.bar: The relative frequency plot, a group of bars per document
+  """
+  import plotly.express as px
+  words = [word.strip().lower() for word in words if word.strip()] or corpus.top_words(5)
+  df = corpus.relative_frequency(words).reset_index()
+  fig = px.bar(df,
+    x='Document',
+    y=words,
+    barmode='group',
+    template='simple_white')
+  fig.update_yaxes(title_text='Per 100,000 words')
+  return fig
+
+def distinctive_words_table(corpus, document, max_rows=15):
+  """The words a document of a corpus uses most, compared with the other documents
+
+  Args:
+    corpus (Corpus): The corpus
+    document (str): The name of the document
+    max_rows (int, optional): Maximum number of rows to show. Defaults to 15.
+
+  Returns:
+    html.Table: The distinctive words table, see Corpus.distinctive_words
+  """
+  from helpers import generate_table
+  return generate_table(corpus.distinctive_words(document, max_rows), max_rows=max_rows)
@@ -0,0 +1,200 @@
+"""Run the dashboard analysis over a corpus of text files.
+
+Every document gets the word frequencies, bigrams, readability and per-section
+readability the web app shows. They are written as Parquet tables with one file per
+document, so any table of the whole corpus can be read back with, e.g.,
+pd.read_parquet('<output>/word_frequency'). A document's stats file is written last,
+and documents that already have one are skipped, so an interrupted run resumes where
+it stopped.
+
+Usage:
+  python app/batch.py data/books --output data/processed/books [--workers 8]
+  python app/batch.py manifest.txt --output data/processed/books
+"""
+# pyright: reportMissingImports=false
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from tqdm import tqdm
+
+from app_functions import ANALYSIS_PARAMS, analyze_upload
+
+TABLES = ['word_frequency', 'bigrams', 'sections', 'stats']
+
+
+def find_documents(source):
+  """The text files of a directory (searched recursively) or listed in a manifest, one path per line
+
+  Returns:
+    list: (document id, path) tuples, the id being the path relative to the directory or manifest
+  """
+  if os.path.isdir(source):
+    root = source
+    paths = sorted(
+      os.path.join(directory, name)
+      for directory, _, names in os.walk(source) for name in names if name.endswith('.txt'))
+  else:
+    root = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+      paths = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    paths = [path if os.path.isabs(path) else os.path.join(root, path) for path in paths]
+  return [(document_id(os.path.relpath(path, root)), path) for path in paths]
+
+
+def document_id(relative_path):
+  """A file name safe id for a document, readable and unique per path"""
+  stem = os.path.splitext(relative_path)[0].replace(os.sep, '__')
+  return f'{stem[:80]}-{hashlib.sha1(relative_path.encode("utf8")).hexdigest()[:8]}'
+
+
+def table_path(output, table, doc_id):
+  return os.path.join(output, table, f'{doc_id}.parquet')
+
+
+def write_table(df, path):
+  """Write a Parquet file atomically, so a killed worker never leaves half a table behind"""
+  handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+  os.close(handle)
+  df.to_parquet(temporary_path, index=False)
+  os.replace(temporary_path, path)
+
+
+def analyze_file(doc_id, path, output, analysis_params):
+  """Analyse one document and write its tables
+
+  Any error, while reading, analysing or writing, fails this document only.
+
+  Returns:
+    tuple: The document id, its size in bytes and the error message if it failed (doc_id, size, error)
+  """
+  size = 0
+  try:
+    size = os.path.getsize(path)
+    write_tables(doc_id, path, size, output, analysis_params)
+  except Exception as e:
+    return doc_id, size, error_message(e)
+  return doc_id, size, None
+
+
+def error_message(error):
+  return f'{type(error).__name__}: {error}'
+
+
+def write_tables(doc_id, path, size, output, analysis_params):
+  """Analyse one document and write its tables, the stats table last"""
+  start = time.perf_counter()
+  document = analyze_upload(path, **analysis_params)
+  word_freq_df = document['word_freq_df']
+  write_table(pd.DataFrame({
+    'document': doc_id,
+    'word': word_freq_df['Word'].to_numpy(dtype=str),
+    'count': word_freq_df['Count'].to_numpy(),
+    'relative': word_freq_df['Relative'].to_numpy(dtype=float),
+  }), table_path(output, 'word_frequency', doc_id))
+  bigrams = document['bigrams'].to_frame()
+  write_table(pd.DataFrame({
+    'document': doc_id,
+    'bigram': bigrams['bigram'].to_numpy(dtype=str),
+    'count': bigrams['count'].to_numpy(),
+  }), table_path(output, 'bigrams', doc_id))
+  stats = document['stats']
+  sections = pd.DataFrame(stats['section_readability'])
+  sections.insert(0, 'document', doc_id)
+  sections['word_count'] = document['word_counts'].word_count
+  write_table(sections, table_path(output, 'sections', doc_id))
+  # the stats file marks the document done, so it goes last
+  write_table(pd.DataFrame([{
+    'document': doc_id,
+    'path': path,
+    'bytes': size,
+    'word_count': int(stats['word_count']),
+    'reading_ease': stats['reading_ease'],
+    'reading_time': stats['reading_time'],
+    'reading_level': stats['reading_level'],
+    'text_standard': stats['text_standard'],
+    'top_10_words': ' '.join(stats['top_10_words']),
+    'seconds': time.perf_counter() - start,
+  }]), table_path(output, 'stats', doc_id))
+
+
+def run(documents, output, workers=None, analysis_params=None):
+  """Analyse every document that has no stats yet across a process pool
+
+  The documents that fail are listed with their error in <output>/failed.tsv, which is
+  rewritten by every run: the documents that failed before are retried.
+
+  Args:
+    documents (list): (document id, path) tuples, see find_documents
+    output (str): The output directory
+    workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+    analysis_params (dict, optional): Overrides of ANALYSIS_PARAMS. Defaults to None.
+
+  Returns:
+    dict: The number of documents analysed, skipped and failed, and the throughput
+  """
+  analysis_params = {**ANALYSIS_PARAMS, **(analysis_params or {})}
+  for table in TABLES:
+    os.makedirs(os.path.join(output, table), exist_ok=True)
+  todo = [(doc_id, path) for doc_id, path in documents if not os.path.exists(table_path(output, 'stats', doc_id))]
+  analysed = failed = total_bytes = 0
+  start = time.perf_counter()
+  with ProcessPoolExecutor(max_workers=workers) as pool, open(os.path.join(output, 'failed.tsv'), 'w') as failures:
+    futures = {pool.submit(analyze_file, doc_id, path, output, analysis_params): doc_id for doc_id, path in todo}
+    progress = tqdm(as_completed(futures), total=len(futures), unit='doc')
+    for future in progress:
+      try:
+        doc_id, size, error = future.result()
+      except Exception as e:
+        # the worker itself died, e.g. killed for running out of memory
+        doc_id, size, error = futures[future], 0, error_message(e)
+      total_bytes += size
+      if error is None:
+        analysed += 1
+      else:
+        failed += 1
+        failures.write(f'{doc_id}\t{error}\n')
+        failures.flush()
+      elapsed = time.perf_counter() - start
+      progress.set_postfix_str(f'{total_bytes / elapsed / 2**20:.2f} MB/s, {failed} failed')
+  elapsed = time.perf_counter() - start
+  return {
+    'analysed': analysed,
+    'skipped': len(documents) - len(todo),
+    'failed': failed,
+    'seconds': elapsed,
+    'documents_per_second': (analysed + failed) / elapsed if elapsed else 0.0,
+    'mb_per_second': total_bytes / elapsed / 2**20 if elapsed else 0.0,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('source', help='a directory of .txt files, or a manifest listing one path per line')
+  parser.add_argument('--output', required=True, help='the directory the Parquet tables are written to')
+  parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+  parser.add_argument('--max-features', type=int, default=ANALYSIS_PARAMS['max_features'])
+  parser.add_argument('--section-count', type=int, default=ANALYSIS_PARAMS['section_count'])
+  parser.add_argument('--split-by', default=ANALYSIS_PARAMS['split_by'],
+    choices=['characters', 'tokens', 'paragraphs', 'chapters'])
+  args = parser.parse_args()
+
+  documents = find_documents(args.source)
+  summary = run(documents, args.output, args.workers, {
+    'max_features': args.max_features,
+    'section_count': args.section_count,
+    'split_by': args.split_by,
+  })
+  print(f"{summary['analysed']} analysed, {summary['skipped']} already done, {summary['failed']} failed "
+    f"in {summary['seconds']:.1f}s: {summary['documents_per_second']:.2f} documents/s, "
+    f"{summary['mb_per_second']:.2f} MB/s")
+  return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
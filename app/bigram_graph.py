@@ -0,0 +1,129 @@
+# pyright: reportMissingImports=false
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+
+class BigramGraph(namedtuple('BigramGraph', ['words', 'sources', 'targets', 'weights'])):
+  """A word graph with an edge from the first to the second word of every bigram
+
+  Args:
+    words (np.ndarray): The word of every node
+    sources (np.ndarray): The node id of the first word of every edge
+    targets (np.ndarray): The node id of the second word of every edge
+    weights (np.ndarray): The count of every edge
+
+  Example:
+    >>> graph = BigramGraph.from_pairs(*count_bigrams(section_tokens), min_count=2)
+    >>> graph.centrality().head()
+  """
+  __slots__ = ()
+
+  @classmethod
+  def from_pairs(cls, vocabulary, sources, targets, weights, min_count=0):
+    """Build the graph of integer-encoded bigrams, keeping only the words that appear in an edge
+
+    The arguments are the fields of a correlator.BigramCounts, in order.
+
+    Args:
+      vocabulary (np.ndarray): The word of every token id
+      sources (np.ndarray): The token id of the first word of every bigram
+      targets (np.ndarray): The token id of the second word of every bigram
+      weights (np.ndarray): The count of every bigram
+      min_count (int, optional): Keep the bigrams seen more than min_count times. Defaults to 0.
+    """
+    weights = np.asarray(weights)
+    keep = weights > min_count
+    sources, targets = np.asarray(sources)[keep], np.asarray(targets)[keep]
+    ids, codes = np.unique(np.concatenate([sources, targets]), return_inverse=True)
+    return cls(np.asarray(vocabulary, dtype=object)[ids], codes[:len(sources)], codes[len(sources):], weights[keep])
+
+  def adjacency(self):
+    """The symmetric weighted adjacency matrix, bigrams in both directions summed"""
+    n = len(self.words)
+    adjacency = coo_matrix((self.weights, (self.sources, self.targets)), shape=(n, n)).tocsr()
+    return adjacency + adjacency.T
+
+  def degree(self):
+    """The number of distinct neighbours of every word, ignoring repeated words like 'very very'"""
+    n = len(self.words)
+    # self-loops are dropped before the matrix is built, clearing its diagonal would change its structure
+    loops = self.sources == self.targets
+    adjacency = coo_matrix((np.ones((~loops).sum()), (self.sources[~loops], self.targets[~loops])), shape=(n, n)).tocsr()
+    return np.diff((adjacency + adjacency.T).indptr)
+
+  def weighted_degree(self):
+    """The number of bigrams every word appears in"""
+    n = len(self.words)
+    return np.bincount(self.sources, self.weights, n) + np.bincount(self.targets, self.weights, n)
+
+  def pagerank(self, damping=0.85, tol=1e-10, max_iter=100):
+    """The PageRank of every word on the undirected weighted graph, as in TextRank
+
+    Args:
+      damping (float, optional): The probability of following an edge. Defaults to 0.85.
+      tol (float, optional): The L1 change at which the power iteration stops. Defaults to 1e-10.
+      max_iter (int, optional): The maximum number of power iterations. Defaults to 100.
+
+    Returns:
+      np.ndarray: The ranks, summing to 1
+    """
+    n = len(self.words)
+    if n == 0:
+      return np.zeros(0)
+    adjacency = self.adjacency().astype(float)
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    # column-stochastic transitions, words without edges jump anywhere
+    transitions = (adjacency.multiply(1 / np.where(strength > 0, strength, 1)[:, None])).T.tocsr()
+    dangling = strength == 0
+    rank = np.full(n, 1 / n)
+    for _ in range(max_iter):
+      previous = rank
+      rank = damping * (transitions @ rank + rank[dangling].sum() / n) + (1 - damping) / n
+      if np.abs(rank - previous).sum() < tol:
+        break
+    return rank
+
+  def centrality(self, rank=None):
+    """The degree, weighted degree and PageRank of every word, most central first
+
+    Args:
+      rank (np.ndarray, optional): The PageRank of every word, if already computed. Defaults to None.
+
+    Returns:
+      pd.DataFrame: word, degree, weighted_degree and pagerank columns
+    """
+    df = pd.DataFrame({
+      'word': self.words,
+      'degree': self.degree(),
+      'weighted_degree': self.weighted_degree().astype(self.weights.dtype),
+      'pagerank': self.pagerank() if rank is None else rank,
+    })
+    return df.sort_values(by=['pagerank', 'weighted_degree'], ascending=False, kind='stable')
+
+  def top(self, max_nodes=50, max_edges=150, rank=None):
+    """The subgraph of the most central words and their heaviest edges
+
+    The size of the subgraph is bounded by max_nodes and max_edges whatever the size of
+    the document. Centrality is ranked on the whole graph before it is cut down.
+
+    Args:
+      max_nodes (int, optional): The number of words to keep, by PageRank. Defaults to 50.
+      max_edges (int, optional): The number of edges between those words to keep, by count. Defaults to 150.
+      rank (np.ndarray, optional): The PageRank of every word, if already computed. Defaults to None.
+
+    Returns:
+      BigramGraph: The subgraph, node ids renumbered
+    """
+    rank = self.pagerank() if rank is None else rank
+    nodes = np.argsort(-rank, kind='stable')[:max_nodes]
+    keep = np.zeros(len(self.words), dtype=bool)
+    keep[nodes] = True
+    edges = np.flatnonzero(keep[self.sources] & keep[self.targets])
+    edges = edges[np.argsort(-self.weights[edges], kind='stable')[:max_edges]]
+    # renumber the kept words so the subgraph is self-contained
+    renumber = np.full(len(self.words), -1)
+    renumber[nodes] = np.arange(len(nodes))
+    return BigramGraph(self.words[nodes], renumber[self.sources[edges]], renumber[self.targets[edges]], self.weights[edges])
@@ -0,0 +1,194 @@
+# pyright: reportMissingImports=false
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from correlator import count_words, get_tokenizer, read_text
+
+DocumentCounts = namedtuple('DocumentCounts', ['words', 'counts', 'word_count'])
+
+
+def count_document(file_name, expanded_stop_words=True):
+  """Count the words of a file with the tokenizer of the single document analysis
+
+  Args:
+    file_name (str): The path of the file
+    expanded_stop_words (bool, optional): Whether to use the expanded stop words list. Defaults to True.
+
+  Returns:
+    DocumentCounts: The distinct words, their counts, and the number of words of the text
+      before stop words were dropped (words, counts, word_count)
+  """
+  text = read_text(file_name)
+  words, counts = np.unique(get_tokenizer(expanded_stop_words).tokenize(text), return_counts=True)
+  return DocumentCounts(words, counts, count_words(text))
+
+
+def count_documents(file_names, executor=None, expanded_stop_words=True):
+  """Count the words of several files in parallel, see count_document
+
+  Args:
+    file_names (list): The paths of the files
+    executor (concurrent.futures.Executor, optional): The pool to count in. Defaults to a new process pool.
+    expanded_stop_words (bool, optional): Whether to use the expanded stop words list. Defaults to True.
+
+  Returns:
+    list: The DocumentCounts of every file, in order
+  """
+  if executor is None:
+    with ProcessPoolExecutor() as executor:
+      return count_documents(file_names, executor, expanded_stop_words)
+  futures = [executor.submit(count_document, file_name, expanded_stop_words) for file_name in file_names]
+  return [future.result() for future in futures]
+
+
+class Corpus:
+  """The word counts of several documents over one shared vocabulary
+
+  The counts are kept as a document by word CSR matrix. Adding a document only counts
+  that document: new words get the next free columns, so the rows already counted never
+  change and nothing is fitted again.
+
+  Example:
+    >>> corpus = Corpus()
+    >>> for name, counts in zip(['emma', 'persuasion'], count_documents(['emma.txt', 'persuasion.txt'])):
+    >>>   corpus.add(name, counts)
+    >>> corpus.distinctive_words('emma').head()
+  """
+  def __init__(self):
+    # word -> column, in the order the words were first seen
+    self.vocabulary = {}
+    self.documents = []
+    self.keys = []
+    self.word_counts = np.zeros(0, dtype=np.int64)
+    self.indptr = np.zeros(1, dtype=np.int64)
+    self.indices = np.zeros(0, dtype=np.int64)
+    self.data = np.zeros(0, dtype=np.int64)
+
+  def __len__(self):
+    return len(self.documents)
+
+  def __contains__(self, key):
+    return key in self.keys
+
+  def add(self, name, document_counts, key=None):
+    """Add the counts of a document as a new row
+
+    Args:
+      name (str): The name of the document, made unique with a number if another document has it
+      document_counts (DocumentCounts): The counts, see count_document
+      key (str, optional): A key to tell whether the document was added already, e.g. its hash. Defaults to None.
+
+    Returns:
+      str: The name the document was added under
+    """
+    vocabulary = self.vocabulary
+    ids = np.fromiter((vocabulary.setdefault(word, len(vocabulary)) for word in document_counts.words),
+      dtype=np.int64, count=len(document_counts.words))
+    order = np.argsort(ids)
+    self.indices = np.concatenate([self.indices, ids[order]])
+    self.data = np.concatenate([self.data, np.asarray(document_counts.counts, dtype=np.int64)[order]])
+    self.indptr = np.append(self.indptr, len(self.indices))
+    self.word_counts = np.append(self.word_counts, document_counts.word_count)
+    unique_name, number = name, 1
+    while unique_name in self.documents:
+      number += 1
+      unique_name = f'{name} ({number})'
+    self.documents.append(unique_name)
+    self.keys.append(key)
+    return unique_name
+
+  def matrix(self):
+    """The document by word counts, the columns in vocabulary order"""
+    return csr_matrix((self.data, self.indices, self.indptr), shape=(len(self.documents), len(self.vocabulary)))
+
+  def words(self):
+    return list(self.vocabulary)
+
+  def column(self, word):
+    """The counts of a word in every document, zeros for words of no document"""
+    if word not in self.vocabulary:
+      return np.zeros(len(self.documents), dtype=np.int64)
+    return self.matrix()[:, self.vocabulary[word]].toarray().ravel()
+
+  def top_words(self, count=5):
+    """The most frequent words of the whole corpus"""
+    totals = np.asarray(self.matrix().sum(axis=0)).ravel()
+    words = self.words()
+    return [words[i] for i in np.argsort(-totals, kind='stable')[:count]]
+
+  def summary(self):
+    """The size of every document
+
+    Returns:
+      pd.DataFrame: The Document, its Words, the Tokens left once stop words are dropped
+        and its Vocabulary, the number of distinct tokens
+    """
+    matrix = self.matrix()
+    return pd.DataFrame({
+      'Document': self.documents,
+      'Words': self.word_counts,
+      'Tokens': np.asarray(matrix.sum(axis=1)).ravel().astype(np.int64),
+      'Vocabulary': np.diff(self.indptr),
+    })
+
+  def relative_frequency(self, words):
+    """The occurrences of some words per 100,000 words of every document
+
+    Args:
+      words (list): The words
+
+    Returns:
+      pd.DataFrame: A column per word, indexed by document
+    """
+    word_counts = self.word_counts.astype(float)
+    columns = {word: np.divide(self.column(word) * 100000, word_counts, out=np.zeros(len(self)), where=word_counts > 0)
+      for word in words}
+    return pd.DataFrame(columns, index=pd.Index(self.documents, name='Document'))
+
+  def distinctive_words(self, document, max_words=None):
+    """The words a document uses more than the rest of the corpus, most distinctive first
+
+    Words are ranked by their log-likelihood (G2) keyness: how unlikely their count in the
+    document is given their count in the other documents.
+
+    Args:
+      document (str): The name of the document
+      max_words (int, optional): The number of words to return. Defaults to all of them.
+
+    Raises:
+      ValueError: If the document is not in the corpus
+
+    Returns:
+      pd.DataFrame: The Word, its Count in the document, its Relative frequency there and in
+        the rest of the Corpus per 100,000 tokens, and its Keyness
+    """
+    if document not in self.documents:
+      raise ValueError(f"'{document}' not in the corpus")
+    matrix = self.matrix()
+    row = self.documents.index(document)
+    totals = np.asarray(matrix.sum(axis=0)).ravel()
+    start, end = self.indptr[row], self.indptr[row + 1]
+    ids, counts = self.indices[start:end], self.data[start:end].astype(float)
+    rest = (totals[ids] - counts).astype(float)
+    size = counts.sum()
+    rest_size = float(totals.sum()) - size
+    # the counts the document and the rest would have if the word were spread evenly
+    expected = counts + rest
+    expected_here, expected_rest = expected * size / (size + rest_size), expected * rest_size / (size + rest_size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      keyness = 2 * (np.where(counts > 0, counts * np.log(counts / expected_here), 0)
+        + np.where(rest > 0, rest * np.log(rest / expected_rest), 0))
+    overused = counts > expected_here
+    words = np.array(self.words(), dtype=object)[ids]
+    df = pd.DataFrame({
+      'Word': words[overused],
+      'Count': counts[overused].astype(np.int64),
+      'Relative': np.round(counts[overused] / size * 100000, 3),
+      'Corpus': np.round(rest[overused] / rest_size * 100000 if rest_size else 0, 3),
+      'Keyness': np.round(keyness[overused], 3),
+    })
+    df = df.sort_values(by=['Keyness', 'Count'], ascending=False, kind='stable')
+    return df if max_words is None else df.head(max_words)
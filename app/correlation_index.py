@@ -0,0 +1,144 @@
+# pyright: reportMissingImports=false
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+from correlator import Correlation, SectionMatrix, correlation_order, correlation_p_values, pearson_r
+
+
+def top_columns(strength, k):
+  """The columns of the k largest values of every row, ties going to the first columns as in a stable sort"""
+  top = np.argpartition(-strength, k - 1, axis=1)[:, :k]
+  weakest = np.take_along_axis(strength, top, axis=1).min(axis=1, keepdims=True)
+  # argpartition keeps any of the columns tied with the weakest kept one
+  kept_ties = (np.take_along_axis(strength, top, axis=1) == weakest).sum(axis=1)
+  rows = np.flatnonzero((strength == weakest).sum(axis=1) > kept_ties)
+  if len(rows):
+    stronger, tied = strength[rows] > weakest[rows], strength[rows] == weakest[rows]
+    first_ties = np.cumsum(tied, axis=1) <= k - stronger.sum(axis=1, keepdims=True)
+    top[rows] = np.nonzero(stronger | (tied & first_ties))[1].reshape(len(rows), k)
+  return top
+
+
+class CorrelationIndex:
+  """The top-k correlated words of every word in a document
+
+  The index is built on the first query. It correlates the section-by-word
+  matrix block by block, keeps the k strongest correlations of every column,
+  and only computes p-values for those.
+
+  Args:
+    dataframe (pd.DataFrame | SectionMatrix): The section by word counts
+    top_k (int, optional): The number of correlated words to keep per word. Defaults to 25.
+    block_size (int, optional): The number of words correlated per block. Defaults to 512.
+
+  Example:
+    >>> index = CorrelationIndex(df)
+    >>> index.get_correlations('cancer')[:3]
+  """
+  def __init__(self, dataframe, top_k=25, block_size=512):
+    if isinstance(dataframe, SectionMatrix):
+      self.words, self.values = dataframe.vocabulary, dataframe.counts
+    else:
+      self.words, self.values = dataframe.columns, dataframe.to_numpy().astype('int')
+    self.positions = {word: i for i, word in enumerate(self.words)}
+    if self.values.shape[0] < 2:
+      raise ValueError("at least two sections are needed to compute a correlation")
+    self.top_k = max(0, min(top_k, len(self.words) - 1))
+    self.block_size = block_size
+    self.neighbors = None
+    self.lock = Lock()
+
+  def __contains__(self, word):
+    return word in self.positions
+
+  def __getstate__(self):
+    # built indexes are handed between processes through the document store
+    state = self.__dict__.copy()
+    del state['lock']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.lock = Lock()
+
+  def build(self):
+    """Compute the top-k correlations of every word"""
+    word_count = len(self.words)
+    neighbors = np.empty((word_count, self.top_k), dtype=np.int32)
+    correlations = np.empty((word_count, self.top_k))
+    p_values = np.empty((word_count, self.top_k))
+    for start in range(0, word_count if self.top_k else 0, self.block_size):
+      rows = np.arange(start, min(start + self.block_size, word_count))
+      r = pearson_r(self.values, rows)
+      # p-values fall as |r| grows, so the strongest |r| are the lowest p-values
+      strength = np.where(np.isnan(r), -1.0, np.abs(r))
+      strength[np.arange(len(rows)), rows] = -np.inf
+      top = top_columns(strength, self.top_k)
+      top_r = np.take_along_axis(r, top, axis=1)
+      top_p = correlation_p_values(top_r, self.values.shape[0])
+      # the same order as get_all_correlations, which this index gives the first top_k of
+      order = correlation_order(top_r, top_p, top)
+      neighbors[rows] = np.take_along_axis(top, order, axis=1)
+      correlations[rows] = np.take_along_axis(top_r, order, axis=1)
+      p_values[rows] = np.take_along_axis(top_p, order, axis=1)
+    self.neighbors = (neighbors, correlations, p_values)
+
+  def get_correlations(self, word):
+    """Get the top-k correlations for a word, sorted by p-value
+
+    Args:
+      word (str): The word to get correlations for
+
+    Raises:
+      ValueError: If word is not in the document
+
+    Returns:
+      list: Correlation namedtuples, as returned by correlator.get_all_correlations
+    """
+    if word not in self.positions:
+      raise ValueError(f"'{word}' not in dataframe")
+    if self.neighbors is None:
+      with self.lock:
+        if self.neighbors is None:
+          self.build()
+    neighbors, correlations, p_values = self.neighbors
+    i = self.positions[word]
+    return [
+      Correlation(word, self.words[j], r, p, p < 0.05)
+      for j, r, p in zip(neighbors[i], correlations[i], p_values[i])
+    ]
+
+
+class CorrelationIndexCache:
+  """A bounded LRU cache of correlation indexes keyed by analysis
+
+  Args:
+    maxsize (int, optional): The number of document indexes to keep. Defaults to 16.
+  """
+  def __init__(self, maxsize=16):
+    self.maxsize = maxsize
+    self.indexes = OrderedDict()
+    self.lock = Lock()
+
+  def get(self, key, create):
+    """Get the index of an analysis, creating it if it is not cached
+
+    Args:
+      key (str): The key of the analysis, see result_cache.cache_key
+      create (callable): Returns the CorrelationIndex of the analysis, only called on a miss
+
+    Returns:
+      CorrelationIndex: The (possibly not yet built) index
+    """
+    with self.lock:
+      index = self.indexes.get(key)
+      if index is None:
+        index = self.indexes[key] = create()
+      self.indexes.move_to_end(key)
+      while len(self.indexes) > self.maxsize:
+        self.indexes.popitem(last=False)
+      return index
+
+
+correlation_indexes = CorrelationIndexCache()
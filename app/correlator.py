@@ -1,37 +1,401 @@
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+import mmap
 import re
 import os
-from scipy.stats import pearsonr
+from scipy.sparse import csr_matrix, issparse
+from scipy.special import betainc
+from bisect import bisect_left, bisect_right
 from collections import namedtuple
+from functools import lru_cache
+from tokenizer import Tokenizer
+
+SPLIT_MARKERS = {
+  'paragraphs': re.compile(r'\n[ \t]*\n\s*'),
+  'chapters': re.compile(r'^[ \t]*(?:chapter|book|part|letter)\b[^\n]*$', re.IGNORECASE | re.MULTILINE),
+}
+WHITESPACE = re.compile(r'\s')
+# whether a code point is whitespace to str.split, the last entry stands for every code point past it
+IS_SPACE = np.array([chr(code).isspace() for code in range(0x3001)] + [False])
+BLOCK_SIZE = 1 << 20
+# next to this module, so the list is found whatever the working directory
+STOP_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stopwords.txt')
+
+def next_boundary(text, position):
+  """Move a position forward to the next whitespace so that no token is cut
+
+  Args:
+    text (str): The text being split
+    position (int): The position to start from
+
+  Returns:
+    int: The position of the next whitespace character, or the length of the text
+  """
+  if position <= 0:
+    return 0
+  match = WHITESPACE.search(text, position)
+  return match.start() if match else len(text)
+
+def character_boundaries(text, section_count):
+  """Section boundaries at equal character offsets, moved forward to whitespace"""
+  return [next_boundary(text, (len(text) * i) // section_count) for i in range(1, section_count)]
+
+def token_starts(text):
+  """The offsets of the tokens of a text, i.e. of every non-whitespace character that follows whitespace
+
+  The text is read as an array of code points, so the offsets are found without a Python
+  loop. The first character counts as following whitespace.
+  """
+  codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+  # the ASCII whitespace of str.split, \t to \r and \x1c to space, as unsigned ranges
+  space = (codes - 9 <= 4) | (codes - 28 <= 4)
+  high = np.flatnonzero(codes >= 0x85)
+  space[high] = IS_SPACE[np.minimum(codes[high], len(IS_SPACE) - 1)]
+  follows_space = np.empty_like(space)
+  follows_space[:1] = True
+  follows_space[1:] = space[:-1]
+  return np.flatnonzero(follows_space & ~space)
+
+def token_boundaries(text, section_count):
+  """Section boundaries at the start of every (len(tokens) / section_count)-th token"""
+  # the token offsets of every block, blocks end at whitespace so no token spans two
+  blocks, start = [], 0
+  while start < len(text):
+    end = next_boundary(text, start + BLOCK_SIZE)
+    blocks.append((start, token_starts(text[start:end]).astype(np.int32)))
+    start = end
+  seen = np.cumsum([0] + [len(starts) for _, starts in blocks])
+  targets = [(int(seen[-1]) * i) // section_count for i in range(1, section_count)]
+  boundaries = []
+  for target in targets:
+    block = bisect_right(seen, target) - 1
+    if block >= len(blocks):
+      boundaries.append(len(text))
+    else:
+      start, starts = blocks[block]
+      boundaries.append(start + int(starts[target - seen[block]]))
+  return boundaries
+
+def marker_boundaries(text, section_count, marker):
+  """Section boundaries at the paragraph or chapter markers closest to equal character offsets"""
+  if marker not in SPLIT_MARKERS:
+    raise ValueError(f"split_by must be one of 'characters', 'tokens', {', '.join(map(repr, SPLIT_MARKERS))}")
+  pattern = SPLIT_MARKERS[marker]
+  candidates = [match.start() if marker == 'chapters' else match.end() for match in pattern.finditer(text)]
+  candidates = [position for position in candidates if 0 < position < len(text)]
+  if not candidates:
+    return []
+  boundaries = set()
+  for i in range(1, section_count):
+    target = (len(text) * i) // section_count
+    index = bisect_left(candidates, target)
+    nearby = candidates[max(0, index - 1):index + 1]
+    boundaries.add(min(nearby, key=lambda position: abs(position - target)))
+  return sorted(boundaries)
+
+def split_sections(text, section_count=10, split_by='characters'):
+  """Divide a text into sections without cutting any token in half
+
+  Args:
+    text (str): The text to divide
+    section_count (int, optional): The number of sections. Defaults to 10.
+    split_by (str, optional): How sections are measured; one of 'characters', 'tokens',
+      'paragraphs' or 'chapters'. Defaults to 'characters'.
+
+  Raises:
+    ValueError: If section_count is not positive or split_by is not supported
+
+  Returns:
+    list: The sections of the text. Splitting on paragraph or chapter markers returns
+      fewer sections when the text has fewer markers than sections.
+
+  Example:
+    >>> split_sections('This is a test', 2)
+    >>> ['This is', ' a test']
+  """
+  if section_count < 1:
+    raise ValueError("section_count must be a positive integer")
+  if split_by == 'characters':
+    boundaries = character_boundaries(text, section_count)
+  elif split_by == 'tokens':
+    boundaries = token_boundaries(text, section_count)
+  else:
+    boundaries = marker_boundaries(text, section_count, split_by)
+  positions = [0, *boundaries, len(text)]
+  return [text[start:end] for start, end in zip(positions, positions[1:])]
 
 def create_sections(text, section_size):
-  """Divide a text into sections of equal length
-  
+  """Divide a text into sections of roughly equal length
+
   Args:
     text (str): The text to divide
-    section_size (int): The size of each section
-    
+    section_size (int): The number of sections
+
   Yields:
     str: A section of the text
-    
+
   Example:
     >>> for section in create_sections('This is a test', 2):
     >>>   print(section)
   """
-  # Credit: https://stackoverflow.com/a/22571421/6544244
-  chunk_size = len(text)//section_size
-  if len(text) % section_size: chunk_size += 1
-  iterator = iter(text)
-  for _ in range(section_size):
-      accumulator = list()
-      for _ in range(chunk_size):
-          try: accumulator.append(next(iterator))
-          except StopIteration: break
-      yield ''.join(accumulator)
-
-def get_vectorization(file_name, max_features=5000, expanded_stop_words=True, ngrams_range=(1, 1)):
+  yield from split_sections(text, section_size)
+
+def read_text(file_name):
+  """Read a UTF-8 text file, decoding straight from a memory map of the file
+
+  Decoding from the map avoids holding a second, bytes copy of the file while the
+  text is built.
+
+  Args:
+    file_name (str): The name of the file to read
+
+  Returns:
+    str: The text, with undecodable bytes dropped and newlines translated as in text mode
+  """
+  with open(file_name, 'rb') as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return ''
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+      text = str(view, 'utf8', errors='ignore')
+  if '\r' in text:
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+  return text
+
+def count_words(text):
+  """The number of whitespace separated words of a text, the word count of every view of the app
+
+  Counting a text section by section gives the same total, since sections are cut at whitespace.
+  """
+  return len(text.split())
+
+@lru_cache(maxsize=None)
+def get_stop_words(expanded_stop_words=True):
+  """Get the stop words used by the vectorizers, read once per process
+
+  Args:
+    expanded_stop_words (bool, optional): Whether to use the expanded stop words list. Defaults to True.
+
+  Returns:
+    frozenset | str: The stop words, or 'english' when the expanded list is not available
+  """
+  stop_words = 'english'
+  if expanded_stop_words:
+    if os.path.exists(STOP_WORDS_PATH):
+      with open(STOP_WORDS_PATH, 'r') as f:
+        stop_words = f.read().splitlines()
+        stop_words = list(set([word.lower() for word in stop_words]))
+        stop_words = ENGLISH_STOP_WORDS.union(stop_words)
+  return stop_words
+
+@lru_cache(maxsize=None)
+def get_tokenizer(expanded_stop_words=True):
+  """Get the tokenizer of the vectorizers, built once per process
+
+  Args:
+    expanded_stop_words (bool, optional): Whether to use the expanded stop words list. Defaults to True.
+
+  Returns:
+    Tokenizer: Lowercases, deletes digits and underscores, and drops the stop words
+  """
+  stop_words = get_stop_words(expanded_stop_words)
+  return Tokenizer(ENGLISH_STOP_WORDS if stop_words == 'english' else stop_words)
+
+def tokenize_sections(sections, tokenizer):
+  """Tokenize each section once, with the same rules as get_vectorization
+
+  Args:
+    sections (list): The sections of the text
+    tokenizer (Tokenizer): The tokenizer, see get_tokenizer
+
+  Returns:
+    list: A list of token lists, one per section
+  """
+  return [tokenizer.tokenize(section) for section in sections]
+
+class SectionMatrix(namedtuple('SectionMatrix', ['counts', 'vocabulary', 'word_count'])):
+  """A sparse section by word matrix, the compact alternative to the word count dataframe
+
+  Attributes:
+    counts (scipy.sparse.csr_matrix): One row per section and one column per word
+    vocabulary (np.ndarray): The word of each column, sorted
+    word_count (np.ndarray): The number of words in each section
+
+  Example:
+    >>> matrix = get_vectorization('data/dataset.txt', sparse=True)
+    >>> matrix.to_frame(['cancer', 'breast'])
+  """
+  __slots__ = ()
+
+  def __contains__(self, word):
+    return self.column(word) is not None
+
+  def column(self, word):
+    """The column of a word, or None if the word is not in the vocabulary"""
+    i = np.searchsorted(self.vocabulary, word)
+    return int(i) if i < len(self.vocabulary) and self.vocabulary[i] == word else None
+
+  def section_labels(self):
+    return [f'{i}' for i in range(1, self.counts.shape[0] + 1)]
+
+  def to_frame(self, words=None, word_count=True):
+    """Build a dense dataframe for some of the words
+
+    Args:
+      words (list, optional): The words to include. Defaults to None, which includes every word.
+      word_count (bool, optional): Whether to add the word_count column. Defaults to True.
+
+    Returns:
+      pd.DataFrame: The section by word dataframe, laid out like get_vectorization's
+    """
+    columns = slice(None) if words is None else [self.column(word) for word in words]
+    df = pd.DataFrame(self.counts[:, columns].toarray(), columns=self.vocabulary[columns], index=self.section_labels())
+    if word_count:
+      df['word_count'] = self.word_count
+    return df
+
+  def totals(self):
+    """The number of occurrences of each word in the whole document"""
+    return np.asarray(self.counts.sum(axis=0)).ravel()
+
+def count_ngrams(section_tokens, max_features=5000, ngrams_range=(1, 1), token_ids=None):
+  """Count the n-grams of already tokenized sections
+
+  Gives the same counts and columns as CountVectorizer(max_features=max_features), from the
+  token ids of the document rather than from n-gram strings.
+
+  Args:
+    section_tokens (list): A list of token lists, one per section
+    max_features (int, optional): The maximum number of features to use. Defaults to 5000.
+    ngrams_range (tuple, optional): The range of ngrams to use. Defaults to (1, 1).
+    token_ids (TokenIds, optional): The section_tokens already encoded. Defaults to None.
+
+  Raises:
+    ValueError: If ngrams_range is not a pair, or if the sections hold no n-gram
+
+  Returns:
+    tuple: The sparse section by n-gram counts and the n-gram of each column (counts, vocabulary)
+  """
+  if type(ngrams_range) != tuple or len(ngrams_range) != 2:
+    raise ValueError("ngram_range must be a tuple of length 2")
+  token_ids = encode_tokens(section_tokens) if token_ids is None else token_ids
+  ngrams, sections, columns = [], [], []
+  for n in range(ngrams_range[0], ngrams_range[1] + 1):
+    keys, key_sections = pack_ngrams(token_ids, n)
+    keys, key_columns = np.unique(keys, return_inverse=True)
+    columns.append(key_columns + sum(map(len, ngrams)))
+    sections.append(key_sections)
+    ngrams.append(decode_ngrams(token_ids.vocabulary, keys, n))
+  vocabulary = np.concatenate(ngrams) if ngrams else np.zeros(0, dtype=object)
+  if not len(vocabulary):
+    raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+  sections, columns = np.concatenate(sections), np.concatenate(columns)
+  if len(ngrams) > 1:
+    # columns in alphabetical order, as in CountVectorizer, whatever the length of the n-grams
+    order = np.argsort(vocabulary, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    columns, vocabulary = rank[columns], vocabulary[order]
+  # sorting the cells by section then column counts them and lays them out as a CSR matrix
+  cells, cell_counts = np.unique(sections * len(vocabulary) + columns, return_counts=True)
+  rows, columns = np.divmod(cells, len(vocabulary))
+  indptr = np.searchsorted(rows, np.arange(len(section_tokens) + 1))
+  counts = csr_matrix((cell_counts, columns, indptr), shape=(len(section_tokens), len(vocabulary)))
+  if max_features is not None and len(vocabulary) > max_features:
+    # the same selection as CountVectorizer, including how it breaks ties
+    top = np.sort((-np.asarray(counts.sum(axis=0)).ravel()).argsort()[:max_features])
+    counts, vocabulary = counts[:, top], vocabulary[top]
+  return counts, vocabulary
+
+def encode_tokens(section_tokens):
+  """Replace the tokens of every section with integer ids, see Tokenizer.encode"""
+  return get_tokenizer().encode(section_tokens)
+
+def pack_ngrams(token_ids, n=2):
+  """Pack the ids of every n-gram that does not cross a section boundary into one int64
+
+  Args:
+    token_ids (TokenIds): The encoded tokens
+    n (int, optional): The n-gram size. Defaults to 2.
+
+  Raises:
+    ValueError: If the vocabulary is too large for n ids to fit in an int64
+
+  Returns:
+    tuple: The packed n-grams, in text order, and the section of each (keys, sections)
+  """
+  size = len(token_ids.vocabulary)
+  if size ** n >= 2 ** 63:
+    raise ValueError(f"a vocabulary of {size} words is too large to pack {n}-grams into int64")
+  length = len(token_ids.ids) - n + 1
+  if length <= 0:
+    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+  keys = token_ids.ids[:length].copy()
+  for i in range(1, n):
+    keys = keys * size + token_ids.ids[i:i + length]
+  within = token_ids.sections[:length] == token_ids.sections[n - 1:]
+  return keys[within], token_ids.sections[:length][within]
+
+def decode_ngrams(vocabulary, keys, n=2):
+  """The n-grams of some packed keys, see pack_ngrams, joined with a space as in CountVectorizer"""
+  words = []
+  for _ in range(n):
+    keys, ids = np.divmod(keys, max(len(vocabulary), 1))
+    words.append(vocabulary[ids])
+  ngrams = words.pop()
+  for word in reversed(words):
+    ngrams = ngrams + ' ' + word
+  return ngrams
+
+class BigramCounts(namedtuple('BigramCounts', ['vocabulary', 'sources', 'targets', 'counts'])):
+  """The bigram totals of a text as pairs of word ids
+
+  Args:
+    vocabulary (np.ndarray): The words of the bigrams, in alphabetical order
+    sources (np.ndarray): The id of the first word of every bigram
+    targets (np.ndarray): The id of the second word of every bigram
+    counts (np.ndarray): The count of every bigram
+
+  Bigrams are in alphabetical order, as in CountVectorizer.
+  """
+  __slots__ = ()
+
+  def __len__(self):
+    return len(self.counts)
+
+  def to_frame(self):
+    """The bigram totals as a dataframe with bigram and count columns, sorted by count"""
+    bigrams = [f'{first} {second}' for first, second in zip(self.vocabulary[self.sources], self.vocabulary[self.targets])]
+    bigrams_df = pd.DataFrame({'bigram': pd.Series(bigrams, dtype=object), 'count': self.counts})
+    return bigrams_df.sort_values(by='count', ascending=False)
+
+def count_bigrams(section_tokens, max_features=5000, token_ids=None):
+  """Count the bigrams of already tokenized sections over the whole text
+
+  Keeps the same bigrams as CountVectorizer(max_features=max_features), the most
+  frequent ones, without decoding them to strings.
+
+  Args:
+    section_tokens (list): A list of token lists, one per section
+    max_features (int, optional): The maximum number of bigrams to keep. Defaults to 5000.
+    token_ids (TokenIds, optional): The section_tokens already encoded. Defaults to None.
+
+  Returns:
+    BigramCounts: The bigrams as pairs of word ids, and their counts
+  """
+  token_ids = encode_tokens(section_tokens) if token_ids is None else token_ids
+  keys, counts = np.unique(pack_ngrams(token_ids, 2)[0], return_counts=True)
+  if max_features is not None:
+    # the same selection as CountVectorizer, including how it breaks ties
+    top = np.sort((-counts).argsort()[:max_features])
+    keys, counts = keys[top], counts[top]
+  sources, targets = np.divmod(keys, max(len(token_ids.vocabulary), 1))
+  # only the words of the kept bigrams are kept, renumbered in the same order
+  words, ids = np.unique(np.concatenate([sources, targets]), return_inverse=True)
+  return BigramCounts(token_ids.vocabulary[words], ids[:len(keys)], ids[len(keys):], counts.astype(np.int64))
+
+def get_vectorization(file_name, max_features=5000, expanded_stop_words=True, ngrams_range=(1, 1),
+                      section_count=10, split_by='characters', sparse=False):
   """Get the vectorization of a file
 
   Args:
@@ -39,52 +403,155 @@ def get_vectorization(file_name, max_features=5000, expanded_stop_words=True, ng
       max_features (int, optional): The maximum number of features to use. Defaults to 5000.
       expanded_stop_words (bool, optional): Whether to use the expanded stop words list. Defaults to True.
       ngrams_range (tuple, optional): The range of ngrams to use. Defaults to (1, 1).
+      section_count (int, optional): The number of sections to split the text into. Defaults to 10.
+      split_by (str, optional): How sections are measured, see split_sections. Defaults to 'characters'.
+      sparse (bool, optional): Whether to return a SectionMatrix instead of a dataframe. Defaults to False.
   
   Returns:
-      pd.DataFrame: The vectorized dataframe
+      pd.DataFrame | SectionMatrix: The vectorized dataframe, or the sparse matrix when sparse is True
   
   Example:
       >>> df = get_vectorization('data/dataset.txt')
       >>> df.head()
   """
-  stop_words = 'english'
-  if expanded_stop_words:
-    if os.path.exists('stopwords.txt'):
-      with open('stopwords.txt', 'r') as f:
-        stop_words = f.read().splitlines()
-        stop_words = list(set([word.lower() for word in stop_words]))
-        stop_words = ENGLISH_STOP_WORDS.union(stop_words)
-  
-  if type(ngrams_range) == tuple and len(ngrams_range) == 2:
-    ngrams_range = ngrams_range
-  else:
-    raise ValueError("ngram_range must be a tuple of length 2")
-  vectorizer = CountVectorizer(
-    stop_words=stop_words,
-    strip_accents='ascii',
-    lowercase=True,
-    decode_error='ignore',
-    ngram_range=ngrams_range,
-    max_features = max_features,
-    preprocessor=lambda x: re.sub(r'_|\d+', '', x.lower()).lower()
-  )
-  with open(file_name, encoding='utf8', errors='ignore') as f:
-    corpus = f.read()
-    corpus = list(create_sections(corpus, 10))
+  corpus = split_sections(read_text(file_name), section_count, split_by)
   try:
-    feature_matrix = vectorizer.fit(corpus)
-    feature_vector = feature_matrix.transform(corpus)
-    word_list = vectorizer.get_feature_names_out()
-    frequency = feature_vector.toarray()
-    sections = [f'{i}' for i in range(1, len(corpus) + 1)]
-    df = pd.DataFrame(frequency, columns=word_list, index=sections)
-    section_lengths = [len(section.split(" ")) for section in corpus]
-    df['word_count'] = pd.Series(section_lengths, index=df.index)
-    return df
+    section_tokens = tokenize_sections(corpus, get_tokenizer(expanded_stop_words))
+    counts, vocabulary = count_ngrams(section_tokens, max_features, ngrams_range)
+  except ValueError as e:
+    print(f"Error with {file_name}")
+    raise e
+  section_lengths = np.array([count_words(section) for section in corpus])
+  matrix = SectionMatrix(counts, vocabulary, section_lengths)
+  return matrix if sparse else matrix.to_frame()
+
+DocumentAnalysis = namedtuple('DocumentAnalysis', ['text', 'sections', 'section_tokens', 'token_ids', 'word_counts'])
+
+def vectorize_document(file_name, max_features=5000, expanded_stop_words=True, section_count=10, split_by='characters'):
+  """Read, section and tokenize a file once and count its words
+
+  Args:
+    file_name (str): The name of the file to analyze
+    max_features (int, optional): The maximum number of words to keep. Defaults to 5000.
+    expanded_stop_words (bool, optional): Whether to use the expanded stop words list. Defaults to True.
+    section_count (int, optional): The number of sections to split the text into. Defaults to 10.
+    split_by (str, optional): How sections are measured, see split_sections. Defaults to 'characters'.
+
+  Returns:
+    DocumentAnalysis: The text, sections, section_tokens, token_ids and the word_counts SectionMatrix
+  """
+  text = read_text(file_name)
+  sections = split_sections(text, section_count, split_by)
+  tokenizer = get_tokenizer(expanded_stop_words)
+  try:
+    section_tokens = tokenize_sections(sections, tokenizer)
+    token_ids = tokenizer.encode(section_tokens)
+    counts, vocabulary = count_ngrams(section_tokens, max_features, token_ids=token_ids)
   except ValueError as e:
     print(f"Error with {file_name}")
     raise e
+  section_lengths = np.array([count_words(section) for section in sections])
+  word_counts = SectionMatrix(counts, vocabulary, section_lengths)
+  return DocumentAnalysis(text, sections, section_tokens, token_ids, word_counts)
+
+def get_bigrams(section_tokens, max_features=5000):
+  """Count the bigrams of already tokenized sections
+
+  Args:
+    section_tokens (list): A list of token lists, one per section
+    max_features (int, optional): The maximum number of bigrams to keep. Defaults to 5000.
+
+  Returns:
+    pd.DataFrame: The bigram totals, with bigram and count columns sorted by count
+  """
+  return count_bigrams(section_tokens, max_features).to_frame()
+
+
+Correlation = namedtuple('Correlation', ['word1', 'word2', 'correlation', 'p_value', 'is_significant'])
+
+def pearson_r(matrix, index=None):
+  """Pearson correlations between the columns of a matrix
+
+  Args:
+    matrix (np.ndarray | scipy.sparse.spmatrix): A sections by words matrix
+    index (int | array-like, optional): The column(s) to correlate with every column.
+      Defaults to None, which returns the full words by words matrix.
+
+  Returns:
+    np.ndarray: The correlations, shaped like matrix[:, index].T @ matrix
+  """
+  if issparse(matrix):
+    # n * cov(x, y) = sum(xy) - sum(x) * sum(y) / n, computed without densifying the matrix
+    values = matrix.tocsc().astype(float)
+    sections = values.shape[0]
+    sums = np.asarray(values.sum(axis=0)).ravel()
+    squares = np.asarray(values.multiply(values).sum(axis=0)).ravel()
+    norms = np.sqrt(np.maximum(squares - sums ** 2 / sections, 0))
+    # sparse column indexing always returns a 2-d matrix, so a single column is squeezed back afterwards
+    selected = values if index is None else values[:, np.atleast_1d(index)]
+    products = (selected.T @ values).toarray()
+    if index is not None and np.ndim(index) == 0:
+      products = products[0]
+    covariances = products - np.multiply.outer(sums if index is None else sums[index], sums) / sections
+  else:
+    values = np.asarray(matrix, dtype=float)
+    centered = values - values.mean(axis=0)
+    norms = np.sqrt(np.einsum('ij,ij->j', centered, centered))
+    selected = centered if index is None else centered[:, index]
+    covariances = selected.T @ centered
+  with np.errstate(divide='ignore', invalid='ignore'):
+    r = covariances / np.multiply.outer(norms if index is None else norms[index], norms)
+  return np.clip(r, -1.0, 1.0)
+
+def pearson_correlations(matrix, index=None):
+  """Pearson correlations and two-sided p-values between the columns of a matrix
+
+  Computes the same statistics as scipy.stats.pearsonr for many column pairs at once.
+
+  Args:
+    matrix (np.ndarray): A sections by words matrix
+    index (int | array-like, optional): The column(s) to correlate with every column.
+      Defaults to None, which returns the full words by words matrix.
+
+  Returns:
+    tuple: The correlations and p-values (r, p), shaped like matrix[:, index].T @ matrix
+  """
+  sections = np.shape(matrix)[0]
+  if sections < 2:
+    raise ValueError("at least two sections are needed to compute a correlation")
+  r = pearson_r(matrix, index)
+  return r, correlation_p_values(r, sections)
+
+def correlation_p_values(r, sections):
+  """Two-sided p-values of Pearson correlations, as computed by scipy.stats.pearsonr
 
+  Args:
+    r (np.ndarray): The correlations
+    sections (int): The number of observations each correlation was computed from
+
+  Returns:
+    np.ndarray: The p-values, NaN where the correlation is undefined
+  """
+  if sections == 2:
+    return np.where(np.isnan(r), np.nan, 1.0)
+  # the sampling distribution of r is a beta distribution on [-1, 1]
+  ab = sections / 2 - 1
+  return np.minimum(2 * betainc(ab, ab, 0.5 * (1 - np.abs(r))), 1.0)
+
+def correlation_order(r, p_values, columns=None):
+  """The order of correlations by p-value, then by strongest |r|, then by column, undefined ones last
+
+  Args:
+    r (np.ndarray): The correlations, one row per word when 2-d
+    p_values (np.ndarray): Their p-values
+    columns (np.ndarray, optional): The column of every correlation. Defaults to their positions.
+
+  Returns:
+    np.ndarray: The indices that sort every row
+  """
+  strength = np.where(np.isnan(r), -1.0, np.abs(r))
+  keys = [-strength, np.where(np.isnan(p_values), np.inf, p_values)]
+  return np.lexsort(keys if columns is None else [columns, *keys], axis=-1)
 
 def get_correlation(dataframe: pd.DataFrame, word_list: list) -> namedtuple:
   """Get the correlation between two words
@@ -117,10 +584,9 @@ def get_correlation(dataframe: pd.DataFrame, word_list: list) -> namedtuple:
       raise ValueError("word_list must be of length 2")
   word1, word2 = word_list
 
-  Correlation = namedtuple('Correlation', ['word1', 'word2', 'correlation', 'p_value', 'is_significant'])
-  col1 = dataframe[word1].astype('int').to_numpy()
-  col2 = dataframe[word2].astype('int').to_numpy()
-  correlation, p_value = pearsonr(col1, col2)
+  columns = dataframe[[word1, word2]].astype('int').to_numpy()
+  r, p_value = pearson_correlations(columns, 0)
+  correlation, p_value = float(r[1]), float(p_value[1])
   is_significant = p_value < 0.05
   return Correlation(word1, word2, correlation, p_value, is_significant)
 
@@ -128,11 +594,11 @@ def get_all_correlations(dataframe, word):
   """Get all correlations for a given word
 
   Args:
-      dataframe (pandas.Dataframe): A dataframe with the columns being the words
+      dataframe (pandas.Dataframe | SectionMatrix): A dataframe with the columns being the words
       word (str): The word to get correlations for
 
   Raises:
-      TypeError: If dataframe is not a pandas DataFrame
+      TypeError: If dataframe is not a pandas DataFrame or a SectionMatrix
       ValueError: If word is not in the dataframe
 
   Returns:
@@ -146,18 +612,25 @@ def get_all_correlations(dataframe, word):
       >>> get_all_correlations(df, 'cancer')
       >>> Correlation(word1='cancer', word2='breast', correlation=0.99 p_value=0.0, is_significant=True)
   """
-  if not isinstance(dataframe, pd.DataFrame):
-    raise TypeError("dataframe must be a pandas DataFrame")
-  if word not in dataframe.columns:
-    raise ValueError(f"'{word}' not in dataframe")
-  correlations = []
-  for col in dataframe.columns:
-    if col == word:
-      continue
-    correlations.append(get_correlation(dataframe, [word, col]))
-  # sort by p-value, where lower is better
-  correlations.sort(key=lambda x: x.p_value)
-  return correlations
+  if isinstance(dataframe, SectionMatrix):
+    if word not in dataframe:
+      raise ValueError(f"'{word}' not in dataframe")
+    columns, index = dataframe.vocabulary, dataframe.column(word)
+    r, p_value = pearson_correlations(dataframe.counts, index)
+  elif isinstance(dataframe, pd.DataFrame):
+    if word not in dataframe.columns:
+      raise ValueError(f"'{word}' not in dataframe")
+    columns = dataframe.columns
+    index = columns.get_loc(word)
+    r, p_value = pearson_correlations(dataframe.to_numpy().astype('int'), index)
+  else:
+    raise TypeError("dataframe must be a pandas DataFrame or a SectionMatrix")
+  # sort by p-value, where lower is better, then by |r|, whose p-values can tie at 0, then by column
+  order = correlation_order(r, p_value)
+  return [
+    Correlation(word, columns[i], r[i], p_value[i], p_value[i] < 0.05)
+    for i in order if i != index
+  ]
 
 if __name__ == "__main__":
   f = "/tmp/frankenstein-or-the-modern-prometheus.txt"
@@ -0,0 +1,218 @@
+# pyright: reportMissingImports=false
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from itertools import islice
+from threading import Lock
+
+
+def serialize(value):
+  return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def estimate_size(value, sample=64):
+  """The approximate memory a value holds, without copying or pickling it
+
+  Arrays count their buffers, sparse matrices their arrays, and containers and other
+  objects what they hold. The Python objects of object arrays, dataframe columns and
+  containers of more than sample items are estimated from the first sample of them.
+  """
+  if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+    return sys.getsizeof(value)
+  if hasattr(value, 'memory_usage') and hasattr(value, 'dtypes'):
+    # pandas dataframes, object columns hold pointers to strings
+    size = int(value.memory_usage(deep=False).sum())
+    columns = [value.index] + [value.iloc[:, i] for i, dtype in enumerate(value.dtypes) if dtype == object]
+    return size + sum(estimate_items(column.to_numpy(), sample) for column in columns if column.dtype == object)
+  if hasattr(value, 'nbytes'):
+    # numpy arrays
+    return int(value.nbytes) + (estimate_items(value.ravel(), sample) if value.dtype == object else 0)
+  if hasattr(value, 'tocsr'):
+    # scipy sparse matrices
+    return sum(getattr(value, name).nbytes for name in ['data', 'indices', 'indptr', 'row', 'col'] if hasattr(value, name))
+  if isinstance(value, dict):
+    return sys.getsizeof(value) + estimate_items(value.keys(), sample) + estimate_items(value.values(), sample)
+  if isinstance(value, (list, tuple, set, frozenset)):
+    return sys.getsizeof(value) + estimate_items(value, sample)
+  if hasattr(value, '__dict__'):
+    return estimate_size(vars(value), sample)
+  return sys.getsizeof(value)
+
+
+def estimate_items(items, sample=64):
+  """The approximate memory of the items of a collection, see estimate_size"""
+  sizes = [estimate_size(item, sample) for item in islice(items, sample)]
+  return sum(sizes) * len(items) // sample if len(sizes) == sample else sum(sizes)
+
+
+class MemoryBackend:
+  """Keeps documents in the current process, evicting the least recently used sessions
+
+  Only suitable when the app runs in a single process, e.g. `python app/app.py`.
+
+  Args:
+    max_bytes (int): The memory budget for all stored values, see estimate_size
+  """
+  def __init__(self, max_bytes):
+    self.max_bytes = max_bytes
+    # session id -> [expiry time, {name: (value, size)}], least recently used first
+    self.sessions = OrderedDict()
+    self.size = 0
+    self.lock = Lock()
+
+  def put(self, session_id, name, value, expires):
+    size = estimate_size(value)
+    with self.lock:
+      session = self.sessions.setdefault(session_id, [expires, {}])
+      if name in session[1]:
+        self.size -= session[1][name][1]
+      session[1][name] = (value, size)
+      self.size += size
+      self.touch(session_id, expires)
+      self.evict()
+
+  def get(self, session_id, name, expires):
+    with self.lock:
+      self.evict()
+      session = self.sessions.get(session_id)
+      if session is None or name not in session[1]:
+        return None
+      self.touch(session_id, expires)
+      return session[1][name][0]
+
+  def delete(self, session_id):
+    with self.lock:
+      self.remove(session_id)
+
+  def touch(self, session_id, expires):
+    self.sessions[session_id][0] = expires
+    self.sessions.move_to_end(session_id)
+
+  def remove(self, session_id):
+    _, values = self.sessions.pop(session_id, (None, {}))
+    self.size -= sum(size for _, size in values.values())
+
+  def evict(self):
+    now = time.time()
+    for session_id in [key for key, (expires, _) in self.sessions.items() if expires < now]:
+      self.remove(session_id)
+    while self.size > self.max_bytes and len(self.sessions) > 1:
+      self.remove(next(iter(self.sessions)))
+
+
+class SQLiteBackend:
+  """Keeps documents in a SQLite file that every worker process can read
+
+  Args:
+    path (str): The path of the database file
+    max_bytes (int): The disk budget for all stored values
+  """
+  def __init__(self, path, max_bytes):
+    self.path = path
+    self.max_bytes = max_bytes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with self.connect() as db:
+      db.execute('PRAGMA journal_mode=WAL')
+      db.execute('''CREATE TABLE IF NOT EXISTS documents (
+        session_id TEXT, name TEXT, value BLOB, size INTEGER, expires REAL, accessed REAL,
+        PRIMARY KEY (session_id, name))''')
+
+  def connect(self):
+    return sqlite3.connect(self.path, timeout=30)
+
+  def put(self, session_id, name, value, expires):
+    data = serialize(value)
+    with self.connect() as db:
+      db.execute('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)',
+        (session_id, name, data, len(data), expires, time.time()))
+      self.evict(db)
+
+  def get(self, session_id, name, expires):
+    with self.connect() as db:
+      row = db.execute('SELECT value FROM documents WHERE session_id = ? AND name = ? AND expires >= ?',
+        (session_id, name, time.time())).fetchone()
+      if row is None:
+        return None
+      db.execute('UPDATE documents SET expires = ?, accessed = ? WHERE session_id = ?',
+        (expires, time.time(), session_id))
+    return pickle.loads(row[0])
+
+  def delete(self, session_id):
+    with self.connect() as db:
+      db.execute('DELETE FROM documents WHERE session_id = ?', (session_id,))
+
+  def evict(self, db):
+    db.execute('DELETE FROM documents WHERE expires < ?', (time.time(),))
+    size = db.execute('SELECT COALESCE(SUM(size), 0) FROM documents').fetchone()[0]
+    if size <= self.max_bytes:
+      return
+    # drop whole sessions, least recently used first, until the budget is met
+    sessions = db.execute('''SELECT session_id, SUM(size) FROM documents
+      GROUP BY session_id ORDER BY MAX(accessed)''').fetchall()
+    for session_id, session_size in sessions[:-1]:
+      db.execute('DELETE FROM documents WHERE session_id = ?', (session_id,))
+      size -= session_size
+      if size <= self.max_bytes:
+        break
+
+
+class DocumentStore:
+  """Per-session storage for the analysis results of an uploaded document
+
+  Every value is stored under its own name so callbacks only load what they use.
+  Sessions expire ttl seconds after they were last read or written.
+
+  Args:
+    backend (MemoryBackend | SQLiteBackend): Where the values are kept
+    ttl (int, optional): Seconds of inactivity before a session expires. Defaults to 3600.
+
+  Example:
+    >>> store = DocumentStore(MemoryBackend(max_bytes=2**30))
+    >>> store.save(session_id, stats=stats, bigrams=bigrams)
+    >>> store.get(session_id, 'stats')
+  """
+  def __init__(self, backend, ttl=3600):
+    self.backend = backend
+    self.ttl = ttl
+
+  def save(self, session_id, **values):
+    """Store values under their keyword names"""
+    expires = time.time() + self.ttl
+    for name, value in values.items():
+      self.backend.put(session_id, name, value, expires)
+
+  def get(self, session_id, name):
+    """Get one value, or None if the session has no such value or expired"""
+    if session_id is None:
+      return None
+    return self.backend.get(session_id, name, time.time() + self.ttl)
+
+  def load(self, session_id, *names):
+    """Get several values as a dict, or None if any of them is missing"""
+    values = {name: self.get(session_id, name) for name in names}
+    return None if any(value is None for value in values.values()) else values
+
+  def delete(self, session_id):
+    self.backend.delete(session_id)
+
+
+def create_document_store():
+  """Create the store configured by the environment
+
+  LINGUINE_STORE selects the backend: 'sqlite' (the default, shared by all gunicorn
+  workers) or 'memory'. LINGUINE_STORE_PATH, LINGUINE_STORE_MAX_MB and
+  LINGUINE_STORE_TTL configure it.
+
+  Returns:
+    DocumentStore: The document store
+  """
+  max_bytes = int(os.environ.get('LINGUINE_STORE_MAX_MB', 1024)) * 2**20
+  ttl = int(os.environ.get('LINGUINE_STORE_TTL', 3600))
+  if os.environ.get('LINGUINE_STORE', 'sqlite') == 'memory':
+    backend = MemoryBackend(max_bytes)
+  else:
+    backend = SQLiteBackend(os.environ.get('LINGUINE_STORE_PATH', '/tmp/linguine/documents.sqlite3'), max_bytes)
+  return DocumentStore(backend, ttl=ttl)
@@ -1,26 +1,158 @@
 # pyright: reportMissingImports=false
 
 import base64
+import hashlib
+import math
 import os
-from dash import html
+import re
+import tempfile
+from dash import dash_table, html
 
 def generate_table(dataframe, max_rows=10):
+  # read whole columns once instead of building a Series per cell
+  rows = zip(*(dataframe[col].to_numpy()[:max_rows].tolist() for col in dataframe.columns))
   return html.Table([
     html.Thead(
       html.Tr([html.Th(col) for col in dataframe.columns])
     ),
     html.Tbody([
       html.Tr([
-          html.Td(dataframe.iloc[i][col]) for col in dataframe.columns
-      ]) for i in range(min(len(dataframe), max_rows))
+          html.Td(value) for value in row
+      ]) for row in rows
     ])
   ],
   className='table table-hover'
   )
 
-def write_file(upload_dir, filename, contents):
+# DataTable filter expressions, e.g. '{Count} s>= 10 && {Word} icontains "ing"'. The table puts s
+# (case-sensitive) or i (case-insensitive) in front of the operators it sends, bare ones are case-sensitive.
+FILTER_OPERATORS = {
+  'ge': 'ge', '>=': 'ge', 'le': 'le', '<=': 'le', 'lt': 'lt', '<': 'lt', 'gt': 'gt', '>': 'gt',
+  'ne': 'ne', '!=': 'ne', 'eq': 'eq', '=': 'eq', 'contains': 'contains',
+}
+FILTER_EXPRESSION = re.compile(
+  r'^\s*\{(?P<column>[^}]+)\}\s*(?P<case>[si])?(?P<operator>ge|le|lt|gt|ne|eq|contains|>=|<=|!=|<|>|=)\s*'
+  r'(?P<value>.*?)\s*$')
+
+def filter_mask(dataframe, filter_query):
+  """Evaluate a DataTable filter query against whole columns
+
+  Args:
+    dataframe (pd.DataFrame): The table being filtered
+    filter_query (str): The filter_query of the DataTable. Unsupported expressions are ignored.
+
+  Returns:
+    np.ndarray | slice: A boolean row mask, or slice(None) when nothing is filtered
+  """
+  mask = slice(None)
+  for expression in (filter_query or '').split(' && '):
+    match = FILTER_EXPRESSION.match(expression)
+    if match is None or match['column'] not in dataframe.columns:
+      continue
+    column, operator, value = dataframe[match['column']], FILTER_OPERATORS[match['operator']], match['value']
+    ignore_case = match['case'] == 'i'
+    if value[:1] == value[-1:] and value[:1] in ('"', "'", '`'):
+      value = value[1:-1]
+    if operator == 'contains':
+      condition = column.astype(str).str.contains(value, case=not ignore_case, regex=False)
+    else:
+      if column.dtype.kind in 'iuf':
+        try:
+          value = float(value)
+        except ValueError:
+          continue
+      elif ignore_case:
+        column, value = column.astype(str).str.lower(), value.lower()
+      condition = getattr(column, operator)(value)
+    condition = condition.to_numpy()
+    mask = condition if isinstance(mask, slice) else mask & condition
+  return mask
+
+def table_page(dataframe, page_current=0, page_size=20, sort_by=None, filter_query=''):
+  """The rows of one page of a server-side paged DataTable
+
+  Args:
+    dataframe (pd.DataFrame): The full table
+    page_current (int, optional): The page to return, from 0. Defaults to 0.
+    page_size (int, optional): The number of rows per page. Defaults to 20.
+    sort_by (list, optional): The sort_by of the DataTable. Defaults to None.
+    filter_query (str, optional): The filter_query of the DataTable. Defaults to ''.
+
+  Returns:
+    tuple: The records of the page and the number of pages (records, page_count)
+  """
+  dataframe = dataframe[filter_mask(dataframe, filter_query)]
+  if sort_by:
+    dataframe = dataframe.sort_values(
+      [column['column_id'] for column in sort_by],
+      ascending=[column['direction'] == 'asc' for column in sort_by],
+      kind='stable')
+  start = (page_current or 0) * page_size
+  columns = list(dataframe.columns)
+  # serialize the page from column arrays rather than row by row
+  values = [dataframe[column].to_numpy()[start:start + page_size].tolist() for column in columns]
+  records = [dict(zip(columns, row)) for row in zip(*values)]
+  return records, max(1, math.ceil(len(dataframe) / page_size))
+
+def paged_table(id, columns, text_columns=(), page_size=20):
+  """An empty DataTable that a callback pages, sorts and filters with table_page
+
+  Args:
+    id (str): The component id, the callback updates its data and page_count
+    columns (list): The column names
+    text_columns (list, optional): The columns holding text, the others are numeric. Defaults to ().
+    page_size (int, optional): The number of rows per page. Defaults to 20.
+
+  Returns:
+    dash_table.DataTable: The table
+  """
+  return dash_table.DataTable(
+    id=id,
+    columns=[
+      {'name': column, 'id': column, 'type': 'text' if column in text_columns else 'numeric'}
+      for column in columns
+    ],
+    data=[],
+    page_current=0,
+    page_size=page_size,
+    page_count=1,
+    page_action='custom',
+    sort_action='custom',
+    sort_mode='single',
+    sort_by=[],
+    filter_action='custom',
+    filter_query='',
+    style_as_list_view=True,
+    style_cell={'textAlign': 'left', 'fontFamily': 'inherit'},
+  )
+
+def write_file(upload_dir, filename, contents, chunk_size=1 << 20):
+  """Decode an uploaded data URL to disk, chunk by chunk
+
+  The file is stored under the SHA-256 of its contents, so uploads with the same
+  filename never collide and identical uploads share one file.
+
+  Args:
+    upload_dir (str): The directory to store the file in
+    filename (str): The uploaded filename, only its extension is kept
+    contents (str): The base64 data URL sent by dcc.Upload
+    chunk_size (int, optional): The number of base64 characters decoded at a time. Defaults to 1 MiB.
+
+  Returns:
+    tuple: The path of the stored file and the SHA-256 of its contents (file_path, document_hash)
+  """
   if not os.path.exists(upload_dir):
     os.makedirs(upload_dir)
-  data = contents.encode('utf8').split(b';base64,')[1]
-  with open(os.path.join(upload_dir, filename), 'wb') as f:
-    f.write(base64.decodebytes(data))
+  start = contents.index(';base64,') + len(';base64,')
+  chunk_size -= chunk_size % 4  # every 4 base64 characters decode to 3 bytes on their own
+  digest = hashlib.sha256()
+  handle, temporary_path = tempfile.mkstemp(dir=upload_dir, suffix='.part')
+  with os.fdopen(handle, 'wb') as f:
+    for offset in range(start, len(contents), chunk_size):
+      data = base64.b64decode(contents[offset:offset + chunk_size])
+      digest.update(data)
+      f.write(data)
+  document_hash = digest.hexdigest()
+  file_path = os.path.join(upload_dir, document_hash + os.path.splitext(filename)[1].lower())
+  os.replace(temporary_path, file_path)
+  return file_path, document_hash
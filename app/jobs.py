@@ -0,0 +1,86 @@
+# pyright: reportMissingImports=false
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+
+import metrics
+from document_store import MemoryBackend
+
+executor = None
+executor_lock = Lock()
+
+
+def get_executor(documents):
+  """The pool analyses run in, created on first use
+
+  Workers must write to the same store the callbacks read from, so a store kept in
+  memory gets a thread pool and a SQLite store a process pool. LINGUINE_JOB_WORKERS
+  sets the pool size.
+  """
+  global executor
+  with executor_lock:
+    if executor is None:
+      workers = int(os.environ.get('LINGUINE_JOB_WORKERS', 2))
+      if isinstance(documents.backend, MemoryBackend):
+        executor = ThreadPoolExecutor(max_workers=workers)
+      else:
+        # forked workers inherit the analytics stack, and no import is left half done by app.warm_up
+        import app_functions  # noqa: F401
+        executor = ProcessPoolExecutor(max_workers=workers)
+    return executor
+
+
+def run_analysis(documents, results, session_id, file_path, document_hash, filename, key):
+  """Analyse an upload stage by stage, saving every stage to the session as it completes
+
+  The progress of the job is saved under 'progress' as a dict of the completed
+  'stages' and the 'error' that stopped it, if any. The complete analysis is stored
+  in the result cache at the end. Jobs of a session that has since uploaded another
+  document stop at their next stage. Slow jobs are profiled with LINGUINE_PROFILE_DIR,
+  see metrics.profile.
+
+  Args:
+    documents (DocumentStore): The store the dashboard reads from
+    results (ResultCache): The store of complete analyses
+    session_id (str): The session that uploaded the file
+    file_path (str): The path to the uploaded file
+    document_hash (str): The SHA-256 of the uploaded file
+    filename (str): The name shown in the summary stats
+    key (str): The result cache key of the analysis
+  """
+  # imported here, the app starts serving before the analytics stack is loaded
+  from app_functions import analyze_upload_stages
+  document, stages = {}, []
+  try:
+    with metrics.profile(f'analysis-{document_hash[:12]}'):
+      for stage, values in analyze_upload_stages(file_path):
+        document.update(values)
+        if stage == 'vectorizing':
+          values = {**values, 'summary': {**values['summary'], 'filename': filename}}
+        stages.append(stage)
+        # stop writing to the session once it uploaded another document
+        if documents.get(session_id, 'document_hash') != document_hash:
+          return
+        with metrics.stage(f'save_{stage}'):
+          documents.save(session_id, **values)
+          documents.save(session_id, progress={'stages': list(stages), 'error': None})
+      with metrics.stage('save_results'):
+        results.save(key, document)
+  except Exception as e:
+    traceback.print_exc()
+    documents.save(session_id, progress={'stages': stages, 'error': str(e) or type(e).__name__})
+
+
+def submit_analysis(documents, results, session_id, file_path, document_hash, filename, key):
+  """Start analysing an upload in the background
+
+  Any document the session had before is dropped, so callbacks never mix the
+  results of two uploads.
+
+  Returns:
+    concurrent.futures.Future: The running job
+  """
+  documents.delete(session_id)
+  documents.save(session_id, document_hash=document_hash, analysis_key=key, progress={'stages': [], 'error': None})
+  return get_executor(documents).submit(run_analysis, documents, results, session_id, file_path, document_hash, filename, key)
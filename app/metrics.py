@@ -0,0 +1,305 @@
+# pyright: reportMissingImports=false
+import atexit
+import bisect
+import cProfile
+import functools
+import glob
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from threading import Lock, Thread
+
+# dash is only imported by callback, so the analysis code that records stages runs without it
+
+# LINGUINE_METRICS: '1' records the wall and CPU time of every stage and callback, 'memory'
+# their peak allocations too (tracemalloc slows the app down). Unset, nothing is recorded.
+METRICS = os.environ.get('LINGUINE_METRICS', '')
+ENABLED = METRICS not in ('', '0')
+METRICS_DIR = os.environ.get('LINGUINE_METRICS_DIR', '/tmp/linguine/metrics')
+# LINGUINE_METRICS_FLUSH_SECONDS: how often every process writes the totals it recorded since for the others
+FLUSH_SECONDS = float(os.environ.get('LINGUINE_METRICS_FLUSH_SECONDS', 5))
+# LINGUINE_PROFILE_DIR: where the cProfile output of slow uploads is written, unset to never profile
+PROFILE_DIR = os.environ.get('LINGUINE_PROFILE_DIR')
+PROFILE_MIN_SECONDS = float(os.environ.get('LINGUINE_PROFILE_MIN_SECONDS', 10))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = {'10KB': 10 << 10, '100KB': 100 << 10, '1MB': 1 << 20, '10MB': 10 << 20, '100MB': 100 << 20}
+VOCABULARY_BUCKETS = {'100': 100, '1000': 1000, '10000': 10000, '100000': 100000}
+# labels given as numbers are recorded as the bucket that holds them
+BUCKETED_LABELS = {'document_size': SIZE_BUCKETS, 'vocabulary': VOCABULARY_BUCKETS}
+FAMILIES = {
+  'stage': 'a stage of the analysis of an upload',
+  'callback': 'a Dash callback',
+}
+
+
+def bucket(value, buckets):
+  """The label of the smallest bucket that holds a value, '+Inf' past the last one"""
+  for label, bound in buckets.items():
+    if value <= bound:
+      return label
+  return '+Inf'
+
+
+class Registry:
+  """The totals of every timed series of this process, mirrored to a file other processes read
+
+  Every process that records (gunicorn workers, analysis job workers) writes its totals to
+  <directory>/<pid>.json from a background thread every flush_seconds, never while recording,
+  and render sums the files of all processes, so any worker serves the metrics of the whole
+  app. The process that renders writes its own totals first, the others are at most
+  flush_seconds behind.
+
+  Args:
+    directory (str): The directory shared by the processes of the app
+    flush_seconds (float, optional): The time between writes of the totals. Defaults to FLUSH_SECONDS.
+  """
+  def __init__(self, directory, flush_seconds=FLUSH_SECONDS):
+    self.directory = directory
+    self.flush_seconds = flush_seconds
+    self.series = {}
+    self.pid = None
+    self.dirty = False
+    self.lock = Lock()
+    self.flush_lock = Lock()
+
+  def record(self, family, labels, wall, cpu, peak=None):
+    key = json.dumps([family, sorted(labels.items())])
+    with self.lock:
+      if self.pid != os.getpid():
+        # a forked process starts its own totals rather than counting its parent's twice,
+        # and its own flushing thread, since threads do not survive a fork
+        self.series, self.pid = {}, os.getpid()
+        Thread(target=self.flush_every, args=(self.pid,), daemon=True).start()
+      series = self.series.setdefault(key, {'count': 0, 'sum': 0.0, 'cpu': 0.0, 'peak': None,
+        'buckets': [0] * len(DURATION_BUCKETS)})
+      series['count'] += 1
+      series['sum'] += wall
+      series['cpu'] += cpu
+      index = bisect.bisect_left(DURATION_BUCKETS, wall)
+      if index < len(DURATION_BUCKETS):
+        series['buckets'][index] += 1
+      if peak is not None:
+        series['peak'] = max(peak, series['peak'] or 0)
+      self.dirty = True
+
+  def flush_every(self, pid):
+    while self.pid == pid:
+      time.sleep(self.flush_seconds)
+      self.flush()
+
+  def flush(self):
+    """Write the totals of this process, if it recorded anything since the last write"""
+    # recording only waits for the copy of the totals, not for the write
+    with self.flush_lock:
+      with self.lock:
+        if not self.dirty or self.pid != os.getpid():
+          return
+        series, self.dirty = json.dumps(self.series), False
+      os.makedirs(self.directory, exist_ok=True)
+      file_name = os.path.join(self.directory, f'{self.pid}.json')
+      with open(file_name + '.tmp', 'w') as f:
+        f.write(series)
+      os.replace(file_name + '.tmp', file_name)
+
+  def collect(self):
+    """The totals of every series summed over all processes"""
+    totals = {}
+    for file_name in glob.glob(os.path.join(self.directory, '*.json')):
+      try:
+        with open(file_name) as f:
+          process = json.load(f)
+      except (OSError, ValueError):
+        continue
+      for key, series in process.items():
+        total = totals.setdefault(key, {'count': 0, 'sum': 0.0, 'cpu': 0.0, 'peak': None,
+          'buckets': [0] * len(DURATION_BUCKETS)})
+        for name in ['count', 'sum', 'cpu']:
+          total[name] += series[name]
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], series['buckets'])]
+        if series['peak'] is not None:
+          total['peak'] = max(series['peak'], total['peak'] or 0)
+    return totals
+
+  def reset(self):
+    """Drop the totals of every process, e.g. when the app (re)starts"""
+    with self.lock:
+      self.series, self.dirty = {}, False
+      for file_name in glob.glob(os.path.join(self.directory, '*.json')):
+        os.remove(file_name)
+
+  def render(self):
+    """The totals in the Prometheus text exposition format"""
+    self.flush()
+    series = sorted((json.loads(key), totals) for key, totals in self.collect().items())
+    lines = []
+    for family, description in FAMILIES.items():
+      rows = [(dict(labels), totals) for (name, labels), totals in series if name == family]
+      metric = f'linguine_{family}'
+      lines += [
+        f'# HELP {metric}_duration_seconds Wall time of {description}',
+        f'# TYPE {metric}_duration_seconds histogram',
+      ]
+      for labels, totals in rows:
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+          cumulative += count
+          lines.append(f'{metric}_duration_seconds_bucket{format_labels(labels, le=bound)} {cumulative}')
+        lines += [
+          f'{metric}_duration_seconds_bucket{format_labels(labels, le="+Inf")} {totals["count"]}',
+          f'{metric}_duration_seconds_sum{format_labels(labels)} {totals["sum"]}',
+          f'{metric}_duration_seconds_count{format_labels(labels)} {totals["count"]}',
+        ]
+      lines += [
+        f'# HELP {metric}_cpu_seconds_total CPU time of {description}, in the thread that ran it',
+        f'# TYPE {metric}_cpu_seconds_total counter',
+        *[f'{metric}_cpu_seconds_total{format_labels(labels)} {totals["cpu"]}' for labels, totals in rows],
+        f'# HELP {metric}_peak_memory_bytes The largest peak of Python allocations of {description}',
+        f'# TYPE {metric}_peak_memory_bytes gauge',
+        *[f'{metric}_peak_memory_bytes{format_labels(labels)} {totals["peak"]}'
+          for labels, totals in rows if totals['peak'] is not None],
+      ]
+    return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels, **extra):
+  labels = {**labels, **extra}
+  escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+  return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+registry = Registry(METRICS_DIR)
+atexit.register(registry.flush)
+
+
+class Peak:
+  """The peak allocations of a block above the allocations it started with, see timed"""
+  lock = Lock()
+  # the blocks being measured, whose peaks so far are saved before another block resets the peak
+  running = []
+
+  def __init__(self):
+    with Peak.lock:
+      self.start, peak = tracemalloc.get_traced_memory()
+      for block in Peak.running:
+        block.peak = max(block.peak, peak - block.start)
+      tracemalloc.reset_peak()
+      self.peak = 0
+      Peak.running.append(self)
+
+  def stop(self):
+    """Stop measuring, returns the peak in bytes"""
+    with Peak.lock:
+      Peak.running.remove(self)
+      return max(self.peak, tracemalloc.get_traced_memory()[1] - self.start)
+
+
+@contextmanager
+def timed(family, **labels):
+  """Record the wall time, the CPU time and the peak allocations of a block
+
+  Yields the labels, so labels only known at the end of the block can still be added.
+  The document_size and vocabulary labels are recorded as buckets, see BUCKETED_LABELS.
+  Peaks are only measured with LINGUINE_METRICS=memory. They are those of the whole
+  process, so stages running at once in threads of one process count each other's.
+  Blocks can be nested, e.g. a stage inside a callback.
+  """
+  peak = Peak() if tracemalloc.is_tracing() else None
+  start, start_cpu = time.perf_counter(), time.thread_time()
+  try:
+    yield labels
+  finally:
+    wall, cpu = time.perf_counter() - start, time.thread_time() - start_cpu
+    peak = peak.stop() if peak is not None else None
+    labels = {name: bucket(value, BUCKETED_LABELS[name]) if name in BUCKETED_LABELS else value
+      for name, value in labels.items()}
+    registry.record(family, labels, wall, cpu, peak)
+
+
+def stage(name, document_bytes=None, **labels):
+  """Time a stage of the analysis of an upload, see timed
+
+  Args:
+    name (str): The stage, the snake_case name of the function it times, e.g. write_file
+    document_bytes (int, optional): The size of the document, the document_size label. Defaults to None.
+    **labels: Other labels, e.g. vocabulary
+
+  Returns:
+    contextmanager: Yields the labels, set 'vocabulary' to tag the stage with the vocabulary size
+
+  Example:
+    >>> with stage('vectorize_document', os.path.getsize(file_path)) as labels:
+    >>>   analysis = vectorize_document(file_path)
+    >>>   labels['vocabulary'] = len(analysis.word_counts.vocabulary)
+  """
+  if not ENABLED:
+    return nullcontext({})
+  if document_bytes is not None:
+    labels['document_size'] = document_bytes
+  return timed('stage', stage=name, **labels)
+
+
+def callback(function):
+  """Time every call of a Dash callback, labelled with its outcome: ok, prevented or error
+
+  Put it under @app.callback. Returns the function itself when metrics are disabled.
+  """
+  if not ENABLED:
+    return function
+  from dash.exceptions import PreventUpdate
+  @functools.wraps(function)
+  def timed_callback(*args, **kwargs):
+    with timed('callback', callback=function.__name__) as labels:
+      try:
+        result = function(*args, **kwargs)
+      except PreventUpdate:
+        labels['outcome'] = 'prevented'
+        raise
+      except Exception:
+        labels['outcome'] = 'error'
+        raise
+      labels['outcome'] = 'ok'
+      return result
+  return timed_callback
+
+
+profile_lock = Lock()
+
+@contextmanager
+def profile(name):
+  """Profile a block with cProfile, keeping the output when it took PROFILE_MIN_SECONDS or more
+
+  Writes <name>-<time>.prof, for pstats or snakeviz, and the 50 slowest functions by
+  cumulative time as <name>-<time>.txt to LINGUINE_PROFILE_DIR. Only the thread that
+  runs the block is profiled, and only one block at a time: blocks that start while
+  another one is profiled run unprofiled.
+
+  Args:
+    name (str): The start of the file names, e.g. the document hash
+  """
+  if PROFILE_DIR is None or not profile_lock.acquire(blocking=False):
+    yield
+    return
+  profiler = cProfile.Profile()
+  start = time.perf_counter()
+  try:
+    profiler.enable()
+    try:
+      yield
+    finally:
+      profiler.disable()
+    if time.perf_counter() - start >= PROFILE_MIN_SECONDS:
+      os.makedirs(PROFILE_DIR, exist_ok=True)
+      path = os.path.join(PROFILE_DIR, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}')
+      profiler.dump_stats(path + '.prof')
+      with open(path + '.txt', 'w') as f:
+        pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(50)
+  finally:
+    profile_lock.release()
+
+
+if METRICS == 'memory' and not tracemalloc.is_tracing():
+  tracemalloc.start()
@@ -0,0 +1,193 @@
+# pyright: reportMissingImports=false
+import math
+import re
+from collections import Counter, namedtuple
+from functools import lru_cache
+from importlib.resources import files
+
+import pandas as pd
+from pyphen import Pyphen
+
+# The tokenization rules of textstat 0.7.3, whose scores these reproduce
+PUNCTUATION = re.compile(r'[^\w\s]')
+SENTENCE = re.compile(r'\b[^.!?]+[.!?]*')
+# a whitespace separated token with at least one word character, i.e. a textstat lexicon word
+WORD = re.compile(r'[^\s\w]*\w\S*')
+DALE_CHALL_WORD = re.compile(r"[\w\='‘’]+")
+
+hyphenator = Pyphen(lang='en_US')
+EASY_WORDS = frozenset((files('textstat') / 'resources' / 'en' / 'easy_words.txt').read_text('utf8').split())
+
+TextCounts = namedtuple('TextCounts', [
+  'sentences', 'words', 'syllables', 'characters', 'letters', 'polysyllables',
+  'dale_chall_difficult', 'difficult', 'linsear_easy', 'linsear_difficult', 'linsear_sentences',
+])
+
+@lru_cache(maxsize=1 << 16)
+def syllable_count(word):
+  """The syllables of a lowercase word without punctuation, counted by pyphen like textstat"""
+  return len(hyphenator.positions(word)) + 1 if word else 0
+
+@lru_cache(maxsize=1 << 16)
+def token_stats(token):
+  """The syllables and letters of a whitespace separated token"""
+  word = PUNCTUATION.sub('', token)
+  return syllable_count(word.lower()), len(word)
+
+def sentence_count(text):
+  """Sentences with more than two words, at least one"""
+  sentences = SENTENCE.findall(text)
+  return max(1, sum(1 for sentence in sentences if len(WORD.findall(sentence)) > 2))
+
+def count_text(text):
+  """Count everything the readability formulas need in a single pass over the tokens
+
+  Every unique token is only measured once, and syllables are memoized across calls.
+
+  Args:
+    text (str): The raw text
+
+  Returns:
+    TextCounts: The counts
+  """
+  tokens = text.split()
+  words = syllables = characters = letters = polysyllables = 0
+  unique_words = set()
+  for token, count in Counter(tokens).items():
+    token_syllables, token_letters = token_stats(token)
+    characters += count * len(token)
+    if token_letters:
+      words += count
+      letters += count * token_letters
+      syllables += count * token_syllables
+      polysyllables += count * (token_syllables >= 3)
+    unique_words.update(DALE_CHALL_WORD.findall(token.lower()))
+  difficult_words = [word for word in unique_words if word not in EASY_WORDS]
+  # Linsear Write only reads the first 100 words
+  linsear_syllables = [token_stats(token)[0] for token in tokens[:100]]
+  linsear_easy = sum(1 for count in linsear_syllables if count < 3)
+  return TextCounts(
+    sentences=sentence_count(text),
+    words=words,
+    syllables=syllables,
+    characters=characters,
+    letters=letters,
+    polysyllables=polysyllables,
+    dale_chall_difficult=len(difficult_words),
+    difficult=sum(1 for word in difficult_words if syllable_count(PUNCTUATION.sub('', word)) >= 3),
+    linsear_easy=linsear_easy,
+    linsear_difficult=len(linsear_syllables) - linsear_easy,
+    linsear_sentences=sentence_count(' '.join(tokens[:100])),
+  )
+
+def legacy_round(number, points=0):
+  """Round half away from zero, like textstat"""
+  p = 10 ** points
+  return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+def ratio(numerator, denominator):
+  return numerator / denominator if denominator else 0.0
+
+def grade_suffix(grade):
+  return {11: 'th', 12: 'th', 13: 'th'}.get(grade % 100, {1: 'st', 2: 'nd', 3: 'rd'}.get(grade % 10, 'th'))
+
+class Readability:
+  """The textstat readability scores of a text, derived from its TextCounts
+
+  Args:
+    counts (TextCounts): The counts of the text, see count_text
+
+  Example:
+    >>> Readability.of(text).flesch_reading_ease()
+  """
+  def __init__(self, counts):
+    self.counts = counts
+
+  @classmethod
+  def of(cls, text):
+    return cls(count_text(text))
+
+  def avg_sentence_length(self):
+    return legacy_round(self.counts.words / self.counts.sentences, 1)
+
+  def avg_syllables_per_word(self):
+    return legacy_round(ratio(self.counts.syllables, self.counts.words), 1)
+
+  def flesch_reading_ease(self):
+    return legacy_round(206.835 - 1.015 * self.avg_sentence_length() - 84.6 * self.avg_syllables_per_word(), 2)
+
+  def flesch_kincaid_grade(self):
+    return legacy_round(0.39 * self.avg_sentence_length() + 11.8 * self.avg_syllables_per_word() - 15.59, 1)
+
+  def smog_index(self):
+    if self.counts.sentences < 3:
+      return 0.0
+    return legacy_round(1.043 * (30 * (self.counts.polysyllables / self.counts.sentences)) ** .5 + 3.1291, 1)
+
+  def coleman_liau_index(self):
+    letters = legacy_round(legacy_round(ratio(self.counts.letters, self.counts.words), 2) * 100, 2)
+    sentences = legacy_round(legacy_round(ratio(self.counts.sentences, self.counts.words), 2) * 100, 2)
+    return legacy_round(0.058 * letters - 0.296 * sentences - 15.8, 2)
+
+  def automated_readability_index(self):
+    if not self.counts.words:
+      return 0.0
+    characters_per_word = legacy_round(self.counts.characters / self.counts.words, 2)
+    words_per_sentence = legacy_round(self.counts.words / self.counts.sentences, 2)
+    return legacy_round(4.71 * characters_per_word + 0.5 * words_per_sentence - 21.43, 1)
+
+  def linsear_write_formula(self):
+    number = (self.counts.linsear_easy + self.counts.linsear_difficult * 3) / self.counts.linsear_sentences
+    return (number - 2 if number <= 20 else number) / 2
+
+  def dale_chall_readability_score(self):
+    if not self.counts.words:
+      return 0.0
+    difficult = 100 - (self.counts.words - self.counts.dale_chall_difficult) / self.counts.words * 100
+    score = 0.1579 * difficult + 0.0496 * self.avg_sentence_length()
+    return legacy_round(score + 3.6365 if difficult > 5 else score, 2)
+
+  def gunning_fog(self):
+    if not self.counts.words:
+      return 0.0
+    return legacy_round(0.4 * (self.avg_sentence_length() + self.counts.difficult / self.counts.words * 100), 2)
+
+  def reading_time(self, ms_per_char=14.69):
+    return legacy_round(self.counts.characters * ms_per_char / 1000, 2)
+
+  def text_standard(self, float_output=False):
+    """The consensus grade of the readability formulas, e.g. '9th and 10th grade'"""
+    reading_ease = self.flesch_reading_ease()
+    if 60 <= reading_ease < 70:
+      reading_ease_grades = [8, 9]
+    else:
+      bands = [(90, 100, 5), (80, 90, 6), (70, 80, 7), (50, 60, 10), (40, 50, 11), (30, 40, 12)]
+      reading_ease_grades = [next((grade for low, high, grade in bands if low <= reading_ease < high), 13)]
+    flesch_kincaid_grade = self.flesch_kincaid_grade()
+    grades = [int(legacy_round(flesch_kincaid_grade)), math.ceil(flesch_kincaid_grade), *reading_ease_grades]
+    # the order matters, ties go to the grade counted first
+    for score in [self.smog_index(), self.coleman_liau_index(), self.automated_readability_index(),
+                  self.dale_chall_readability_score(), self.linsear_write_formula(), self.gunning_fog()]:
+      grades += [int(legacy_round(score)), math.ceil(score)]
+    score = Counter(grades).most_common(1)[0][0]
+    if float_output:
+      return float(score)
+    return f'{score - 1}{grade_suffix(score - 1)} and {score}{grade_suffix(score)} grade'
+
+def section_readability(sections):
+  """The readability of every section of a text
+
+  Args:
+    sections (list): The section strings, e.g. from correlator.split_sections
+
+  Returns:
+    pd.DataFrame: One row per section, numbered from 1, with reading_ease, grade_level
+      (Flesch-Kincaid) and reading_index (automated readability index) columns
+  """
+  scores = [Readability.of(section) for section in sections]
+  return pd.DataFrame({
+    'section': range(1, len(sections) + 1),
+    'reading_ease': [score.flesch_reading_ease() for score in scores],
+    'grade_level': [score.flesch_kincaid_grade() for score in scores],
+    'reading_index': [score.automated_readability_index() for score in scores],
+  })
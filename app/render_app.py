@@ -1,8 +1,8 @@
 # pyright: reportMissingImports=false
 
 from dash import dcc, html
-from helpers import generate_table
-from app_functions import plot_word_frequency, network_visualization, plot_word_correlations
+from helpers import generate_table, paged_table
+from analysis_config import ANALYSIS_STAGES
 
 def help_popover(help_text, direction='top'):
   return html.Div(className=f'popover popover-{direction} help-icon', children=[ '?',
@@ -15,144 +15,245 @@ def help_popover(help_text, direction='top'):
     ])
   ])
 
-def RunApplication(AppData):
-  # Get data
-  word_count_df, bigrams, stats = AppData['word_count_df'], AppData['bigrams'], AppData['stats']
-  word_freq_df = AppData['word_freq_df']
-  relative_freq_section_df = AppData['relative_freq_section_df']
+def pending(message):
+  return html.Div(className='empty', children=[
+    html.Div(className='loading loading-lg'),
+    html.P(className='empty-subtitle', children=[message]),
+  ])
 
-  # App layout
-  return html.Div(className='main-content', children=[
-    html.Div(className='stats-bar shadow panel', children=[
-      html.Div(className='panel-header', children=[
-        html.Div(className='panel-title', children=['Summary Stats']),
-        help_popover('''The summary stats panel provides a quick overview of the document.
-            - the total number of words in the document.,
-            - most frequent terms in the corpus.,
-            - readability statistics and so on''',
-          direction='right'
-        )
-      ]),
-      html.Div(className='stats-container shadow-line', children=[
-        html.Div(className='file-name', children=[
-          html.Div(className='stat__value', children=[
-            html.H4(className='stat-value', children=[stats['filename']])
-          ])]
-        )
-      ]),
-      html.Div(className='stats-container shadow-line', children=[
-        html.Div(className='word-count', children=[
-          html.Div(className='stat__value', children=[
-            html.H3(className='stat-value', children=[stats['word_count']]),
-            html.Span(className='stat__description', children=[
-              'Word Count'
-            ])
-          ])]
-        )
-      ]),
-      html.Div(className='stats-container shadow-line', children=[
-        html.Div(className='top-words', children=[
-          html.Div(className='stat__value', children=[
-            html.P(className='stat-value', children=[
-              *map(lambda w: html.Span(className='top__word chip', children=[w]), [w for w in stats['top_10_words']]),
-            ]),
-            html.Span(className='stat__description', children=[
-              'Top Words in Corpus'
-            ])
-          ])]
-        )
-      ]),
-      html.Div(className='stats-container shadow-line', children=[
-        html.Div(className='reading-ease', children=[
-          html.Div(className='stat__value', children=[
-            html.H3(className='stat-value', children=[stats['reading_ease']]),
-            html.Span(className='stat__description', children=[
-              'Reading Ease'
-            ])
-          ])]
-        )
+def stat(class_name, value, description, tag=html.H3):
+  return html.Div(className='stats-container shadow-line', children=[
+    html.Div(className=class_name, children=[
+      html.Div(className='stat__value', children=[
+        tag(className='stat-value', children=[value]),
+        html.Span(className='stat__description', children=[
+          description
+        ])
+      ])]
+    )
+  ])
+
+def StatsPanel():
+  return html.Div(className='stats-bar shadow panel', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Summary Stats']),
+      help_popover('''The summary stats panel provides a quick overview of the document.
+          - the total number of words in the document.,
+          - most frequent terms in the corpus.,
+          - readability statistics and so on''',
+        direction='right'
+      )
+    ]),
+    html.Div(id='stats-panel', children=[pending('Counting words...')]),
+    html.Div(id='reading-stats', children=[pending('Computing readability statistics...')]),
+  ])
+
+def stats_panel_body(summary):
+  return [
+    html.Div(className='stats-container shadow-line', children=[
+      html.Div(className='file-name', children=[
+        html.Div(className='stat__value', children=[
+          html.H4(className='stat-value', children=[summary['filename']])
+        ])]
+      )
+    ]),
+    stat('word-count', summary['word_count'], 'Word Count'),
+    stat('top-words', [
+      *map(lambda w: html.Span(className='top__word chip', children=[w]), [w for w in summary['top_10_words']]),
+    ], 'Top Words in Corpus', tag=html.P),
+  ]
+
+def reading_stats_body(stats):
+  return [
+    stat('reading-ease', stats['reading_ease'], 'Reading Ease'),
+    stat('reading-level', stats['reading_level'], 'Reading Level'),
+    stat('reading-time', stats['reading_time'], 'Reading Time'),
+  ]
+
+def WordFrequencyPanel():
+  return html.Div(className='column col-4 shadow panel word-count-table', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Word Frequency Analysis']),
+      help_popover('''This table shows the frequency of each word in the corpus, sorted by most frequent.
+        It also shows the relative frequency of each word in the corpus.
+        Click a column to sort it, and type in the row below the header to filter, e.g. > 100 or ing.''')
+    ]),
+    html.Div(className='panel-body', children=[
+      dcc.Loading(paged_table('word-frequency-table', ['Word', 'Count', 'Relative'], text_columns=['Word'])),
+    ])
+  ])
+
+def WordTrendsPanel():
+  return html.Div(className='column col-6 flex-grow-1 shadow panel', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Word Trends']),
+      help_popover(f'''The panel shows the relative frequency of words in the corpus, broken down by section.
+      The search box allows you to search and plot
+          the relative frequency of any word in the corpus.
+          - enter multiple terms separated by a comma to plot multiple terms.
+          - click on each plotted term to toggle its visibility on the graph.
+        ''',
+        direction='left')
+    ]),
+    html.Div(className='search-word-frequency input-group', children=[
+      dcc.Input(className='form-input', id='search-word-frequency-input', type='text', value=''),
+      html.Button(className='btn', id='search-word-frequency-button', n_clicks=0, children='View Trend'),
+    ]),
+    html.Div(className='panel-body', children=[
+      dcc.Loading(dcc.Graph(id='word-frequency')),
+    ])
+  ])
+
+def ReadabilityPanel():
+  return html.Div(className='section-readability panel shadow', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Readability by Section']),
+      help_popover('''This graph shows how difficult each section of the text is to read.
+          A higher reading ease means an easier section, a higher grade level a harder one.''', direction='left')
       ]),
-      html.Div(className='stats-container shadow-line', children=[
-        html.Div(className='reading-level', children=[
-          html.Div(className='stat__value', children=[
-            html.H3(className='stat-value', children=[stats['reading_level']]),
-            html.Span(className='stat__description', children=[
-              'Reading Level'
-            ])
-          ])]
-        )
+    html.Div(id='readability-panel', children=[pending('Computing readability statistics...')]),
+  ])
+
+def readability_panel_body(stats):
+  from app_functions import plot_section_readability
+  return dcc.Graph(figure=plot_section_readability(stats['section_readability']))
+
+def NetworkPanel():
+  return html.Div(className='network-analysis panel shadow', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Centrality Analysis']),
+      help_popover('''This graph shows the centrality of each word in the text you uploaded.
+          Text centrality is a measure of how important a word is to the text.
+          The more central a word is, the more important it is to the text.
+          Words are ranked by PageRank over the graph of bigrams, only the most central are drawn.''', direction='left')
       ]),
-      html.Div(className='stats-container shadow-line', children=[
-        html.Div(className='reading-time', children=[
-          html.Div(className='stat__value', children=[
-            html.H3(className='stat-value', children=[stats['reading_time']]),
-            html.Span(className='stat__description', children=[
-              'Reading Time'
-            ])
-          ])]
-        )
+    dcc.Loading(html.Div(id='network-panel', children=[pending('Counting bigrams...')])),
+  ])
+
+def network_panel_body(bigrams):
+  from app_functions import centrality_table, network_visualization
+  from bigram_graph import BigramGraph
+  # the graph and its PageRank are built once for the network and the table
+  graph = BigramGraph.from_pairs(*bigrams, min_count=2)
+  rank = graph.pagerank()
+  return html.Div(className='columns', children=[
+    html.Div(className='column col-8', children=[network_visualization(graph, rank=rank)]),
+    html.Div(className='column col-4', children=[centrality_table(graph, rank=rank)]),
+  ])
+
+def CorrelationsPanel():
+  return html.Div(className='column correlation-table panel shadow', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Word Correlations']),
+      help_popover('''This table shows the correlation between each word in the text you uploaded.
+      Use the search bar to find specific words and their correlations.''', direction='left')
+    ]),
+    html.Div(className='search-word-correlation input-group', children=[
+      dcc.Input(className='form-input', id='search-word-correlation-input', type='text', value=''),
+      html.Button(className='btn', id='search-word-correlation-button', n_clicks=0, children='Get Correlations'),
+    ]),
+    html.Div(className='panel-body', children=[
+      dcc.Loading(html.Div(id='word-correlation-table', children=[pending('Correlating words...')])),
+    ])
+  ])
+
+def analysis_error(error):
+  if error is None:
+    return None
+  return html.Div(className='toast toast-error', children=[f'The analysis failed: {error}'])
+
+def RunApplication(stages, error=None):
+  """Builds the dashboard of a document as empty panels
+
+  Every panel is filled in by its own callback once the analysis stage it needs is done,
+  so cheap panels show while the expensive ones are still computing. The analysis-poll
+  interval sets the stage-<name> stores as the background analysis completes them.
+
+  Args:
+    stages (list): The analysis stages already completed
+    error (str, optional): The error that stopped the analysis. Defaults to None.
+
+  Returns:
+    html.Div: The dashboard
+  """
+  finished = error is not None or len(stages) == len(ANALYSIS_STAGES)
+  # App layout
+  return html.Div(children=[
+    dcc.Interval(id='analysis-poll', interval=1000, disabled=finished),
+    *[dcc.Store(id=f'stage-{stage}', data=stage in stages) for stage in ANALYSIS_STAGES],
+    html.Div(id='analysis-error', children=analysis_error(error)),
+    html.Div(className='main-content', children=[
+      StatsPanel(),
+      html.Div(className='dashboard-items', children=[
+        html.Div(className='columns content-space', children=[
+          WordFrequencyPanel(),
+          WordTrendsPanel(),
+        ]),
+        ReadabilityPanel(),
+        NetworkPanel(),
+        CorrelationsPanel(),
       ]),
     ]),
+  ])
+
+def CorpusSummaryPanel(summary):
+  return html.Div(className='column col-4 shadow panel', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Corpus']),
+      help_popover('''The documents of the corpus: their number of words, the tokens left once
+        stop words are dropped, and their vocabulary, the number of distinct tokens.
+        Upload more files to add them to the corpus.''', direction='right')
+    ]),
+    html.Div(className='panel-body', children=[generate_table(summary, max_rows=len(summary))]),
+  ])
+
+def CorpusFrequencyPanel():
+  return html.Div(className='column col-6 flex-grow-1 shadow panel', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Word Usage by Document']),
+      help_popover('''The panel compares the relative frequency of words, per 100,000 words, across the documents.
+          - enter multiple terms separated by a comma to compare multiple terms.
+          - with no terms, the most frequent words of the corpus are compared.''', direction='left')
+    ]),
+    html.Div(className='search-word-frequency input-group', children=[
+      dcc.Input(className='form-input', id='search-corpus-frequency-input', type='text', value=''),
+      html.Button(className='btn', id='search-corpus-frequency-button', n_clicks=0, children='Compare'),
+    ]),
+    html.Div(className='panel-body', children=[
+      dcc.Loading(dcc.Graph(id='corpus-frequency')),
+    ])
+  ])
+
+def DistinctiveWordsPanel(documents):
+  return html.Div(className='column distinctive-words panel shadow', children=[
+    html.Div(className='panel-header', children=[
+      html.Div(className='panel-title', children=['Distinctive Words']),
+      help_popover('''This table shows the words a document uses more than the other documents of the corpus,
+        ranked by keyness: the log-likelihood of their count in the document given their count in the others.''',
+        direction='left')
+    ]),
+    dcc.Dropdown(id='corpus-document', options=documents, value=documents[0], clearable=False),
+    html.Div(className='panel-body', children=[
+      dcc.Loading(html.Div(id='distinctive-words-table', children=[pending('Comparing documents...')])),
+    ])
+  ])
+
+def CorpusApplication(documents, summary):
+  """Builds the dashboard that compares the documents of a corpus
+
+  Args:
+    documents (list): The names of the documents
+    summary (pd.DataFrame): The size of every document, see Corpus.summary
+
+  Returns:
+    html.Div: The dashboard
+  """
+  return html.Div(className='main-content', children=[
     html.Div(className='dashboard-items', children=[
       html.Div(className='columns content-space', children=[
-        html.Div(className='column col-4 shadow panel word-count-table', children=[
-          html.Div(className='panel-header', children=[
-            html.Div(className='panel-title', children=['Word Frequency Analysis']),
-            help_popover('''This table shows the frequency of each word in the corpus, sorted by most frequent.
-              It also shows the relative frequency of each word in the corpus.''')
-          ]),
-          html.Div(className='panel-body', children=[
-            generate_table(word_freq_df, max_rows=100),
-          ])
-        ]),
-        html.Div(className='column col-6 flex-grow-1 shadow panel', children=[
-          html.Div(className='panel-header', children=[
-            html.Div(className='panel-title', children=['Word Trends']),
-            help_popover(f'''The panel shows the relative frequency of words in the corpus, broken down by section.
-            The search box allows you to search and plot 
-                the relative frequency of any word in the corpus.
-                - enter multiple terms separated by a comma to plot multiple terms.
-                - click on each plotted term to toggle its visibility on the graph.
-              ''',
-              direction='left')
-          ]),
-          html.Div(className='search-word-frequency input-group', children=[
-            dcc.Input(className='form-input', id='search-word-frequency-input', type='text', value=''),
-            html.Button(className='btn', id='search-word-frequency-button', n_clicks=0, children='View Trend'),
-          ]),
-          html.Div(className='panel-body', children=[
-              dcc.Graph(
-                id='word-frequency',
-                figure=plot_word_frequency(relative_freq_section_df)
-              )
-          ])
-        ]),
-      ]),
-      html.Div(className='network-analysis panel shadow', children=[
-        html.Div(className='panel-header', children=[
-          html.Div(className='panel-title', children=['Centrality Analysis']),
-          help_popover('''This graph shows the centrality of each word in the text you uploaded.
-              Text centrality is a measure of how important a word is to the text.
-              The more central a word is, the more important it is to the text.''', direction='left')
-          ]),
-        network_visualization(df=bigrams, min_count=2)
+        CorpusSummaryPanel(summary),
+        CorpusFrequencyPanel(),
       ]),
-      html.Div(className='column correlation-table panel shadow', children=[
-        html.Div(className='panel-header', children=[
-          html.Div(className='panel-title', children=['Word Correlations']),
-          help_popover('''This table shows the correlation between each word in the text you uploaded.
-          Use the search bar to find specific words and their correlations.''', direction='left')
-        ]),
-        html.Div(className='search-word-correlation input-group', children=[
-          dcc.Input(className='form-input', id='search-word-correlation-input', type='text', value=''),
-          html.Button(className='btn', id='search-word-correlation-button', n_clicks=0, children='Get Correlations'),
-        ]),
-        html.Div(className='panel-body', children=[
-          html.Div(
-            id='word-correlation-table',
-            children=plot_word_correlations(word_count_df)
-          )
-        ])
-      ])
+      DistinctiveWordsPanel(documents),
     ]),
   ])
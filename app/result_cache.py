@@ -0,0 +1,173 @@
+# pyright: reportMissingImports=false
+import hashlib
+import json
+import os
+import tempfile
+
+# numpy, pandas, scipy and correlator are imported where they are used, so the app starts without them
+
+# bump when the layout of the cached files or the meaning of a cached value changes
+CACHE_VERSION = 4
+
+
+def cache_key(document_hash, stop_words, **analysis_params):
+  """The cache key of a document analysed with some parameters
+
+  Args:
+    document_hash (str): The SHA-256 of the document contents
+    stop_words (frozenset | str): The stop words the analysis removes
+    **analysis_params: The correlator.vectorize_document parameters, e.g. max_features
+
+  Returns:
+    str: A hex digest that changes whenever the contents or any parameter change
+  """
+  payload = {
+    'version': CACHE_VERSION,
+    'document': document_hash,
+    'stop_words': stop_words if isinstance(stop_words, str) else sorted(stop_words),
+    'ngrams_ranges': [(1, 1), (2, 2)],
+    **analysis_params,
+  }
+  return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def pack_matrix(prefix, matrix):
+  import numpy as np
+  from scipy.sparse import csr_matrix
+  counts = csr_matrix(matrix.counts)
+  return {
+    f'{prefix}_data': counts.data,
+    f'{prefix}_indices': counts.indices,
+    f'{prefix}_indptr': counts.indptr,
+    f'{prefix}_shape': np.array(counts.shape),
+    f'{prefix}_vocabulary': np.asarray(matrix.vocabulary, dtype=str),
+    f'{prefix}_word_count': matrix.word_count,
+  }
+
+
+def pack_bigrams(bigrams):
+  import numpy as np
+  return {
+    'bigram_vocabulary': np.asarray(bigrams.vocabulary, dtype=str),
+    'bigram_sources': bigrams.sources,
+    'bigram_targets': bigrams.targets,
+    'bigram_count': bigrams.counts,
+  }
+
+
+def unpack_bigrams(arrays):
+  from correlator import BigramCounts
+  return BigramCounts(arrays['bigram_vocabulary'].astype(object), arrays['bigram_sources'], arrays['bigram_targets'],
+    arrays['bigram_count'])
+
+
+def unpack_matrix(prefix, arrays):
+  from correlator import SectionMatrix
+  from scipy.sparse import csr_matrix
+  counts = csr_matrix(
+    (arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']),
+    shape=tuple(arrays[f'{prefix}_shape']))
+  return SectionMatrix(counts, arrays[f'{prefix}_vocabulary'].astype(object), arrays[f'{prefix}_word_count'])
+
+
+class ResultCache:
+  """Complete document analyses stored as .npz files named by their cache key
+
+  Files are written atomically, so several worker processes can share the directory.
+  Once the directory grows past max_bytes the least recently read files are removed.
+
+  Args:
+    directory (str): Where the cached analyses are kept
+    max_bytes (int): The disk budget of the cache
+
+  Example:
+    >>> results = ResultCache('/tmp/linguine/results', max_bytes=2**30)
+    >>> key = cache_key(document_hash, stop_words, **ANALYSIS_PARAMS)
+    >>> document = results.load(key) or analyze_upload(file_path)
+  """
+  def __init__(self, directory, max_bytes):
+    self.directory = directory
+    self.max_bytes = max_bytes
+    os.makedirs(directory, exist_ok=True)
+
+  def path(self, key):
+    return os.path.join(self.directory, f'{key}.npz')
+
+  def load(self, key):
+    """Load a cached analysis
+
+    Args:
+      key (str): The cache key
+
+    Returns:
+      dict | None: The analysis, laid out like app_functions.analyze_upload, or None on a miss
+    """
+    import numpy as np
+    import pandas as pd
+    try:
+      with np.load(self.path(key), allow_pickle=False) as arrays:
+        arrays = dict(arrays)
+      os.utime(self.path(key))
+    except (FileNotFoundError, ValueError, OSError):
+      return None
+    word_freq_df = pd.DataFrame({
+      'Word': arrays['word_freq_word'].astype(object),
+      'Count': arrays['word_freq_count'],
+      'Relative': arrays['word_freq_relative'],
+    })
+    stats = json.loads(str(arrays['stats']))
+    return {
+      'word_counts': unpack_matrix('word_counts', arrays),
+      'bigrams': unpack_bigrams(arrays),
+      'summary': {'word_count': stats['word_count'], 'top_10_words': stats['top_10_words']},
+      'stats': stats,
+      'word_freq_df': word_freq_df,
+      'relative_freq_section': unpack_matrix('relative_freq_section', arrays),
+    }
+
+  def save(self, key, document):
+    """Store an analysis
+
+    Args:
+      key (str): The cache key
+      document (dict): The analysis, as returned by app_functions.analyze_upload
+    """
+    import numpy as np
+    word_freq_df = document['word_freq_df']
+    arrays = {
+      **pack_matrix('word_counts', document['word_counts']),
+      **pack_matrix('relative_freq_section', document['relative_freq_section']),
+      **pack_bigrams(document['bigrams']),
+      'word_freq_word': word_freq_df['Word'].to_numpy(dtype=str),
+      'word_freq_count': word_freq_df['Count'].to_numpy(),
+      'word_freq_relative': word_freq_df['Relative'].to_numpy(dtype=float),
+      'stats': np.array(json.dumps(document['stats'], default=lambda value: value.item())),
+    }
+    handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    with os.fdopen(handle, 'wb') as f:
+      np.savez_compressed(f, **arrays)
+    os.replace(temporary_path, self.path(key))
+    self.evict()
+
+  def evict(self):
+    entries = []
+    for entry in os.scandir(self.directory):
+      if entry.name.endswith('.npz'):
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, path in sorted(entries)[:-1]:
+      if size <= self.max_bytes:
+        break
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      size -= entry_size
+
+
+def create_result_cache():
+  """Create the cache configured by LINGUINE_CACHE_PATH and LINGUINE_CACHE_MAX_MB"""
+  return ResultCache(
+    os.environ.get('LINGUINE_CACHE_PATH', '/tmp/linguine/results'),
+    int(os.environ.get('LINGUINE_CACHE_MAX_MB', 2048)) * 2**20)
@@ -0,0 +1,101 @@
+# pyright: reportMissingImports=false
+import re
+import unicodedata
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+# the same matches as the default CountVectorizer token pattern, (?u)\b\w\w+\b
+WORD = re.compile(r'\w{2,}')
+DIGITS_AND_UNDERSCORES = re.compile(r'_|\d+')
+
+TokenIds = namedtuple('TokenIds', ['ids', 'sections', 'vocabulary'])
+
+
+class AsciiFolding(dict):
+  """A str.translate table that folds characters to ASCII like sklearn's strip_accents='ascii'
+
+  Characters are decomposed (NFKD) and whatever is not ASCII dropped, e.g. 'é' -> 'e'
+  and 'ﬁ' -> 'fi'. The table is filled in as characters are first seen.
+  """
+  def __missing__(self, code):
+    folded = unicodedata.normalize('NFKD', chr(code)).encode('ascii', 'ignore').decode('ascii')
+    self[code] = folded
+    return folded
+
+ASCII_FOLDING = AsciiFolding()
+
+def fold_ascii(text):
+  """Fold a text to ASCII, see AsciiFolding"""
+  return text if text.isascii() else text.translate(ASCII_FOLDING)
+
+
+class Tokenizer:
+  """Splits text into lowercase words of two or more characters and drops stop words
+
+  Gives the same tokens as the CountVectorizer analyzer it replaces, without building a
+  vectorizer per call. Build one per configuration and share it, e.g. correlator.get_tokenizer.
+  It holds no state besides its configuration: every encoded document gets its own vocabulary.
+
+  Args:
+    stop_words (frozenset, optional): The words to drop. Defaults to none.
+    fold_accents (bool, optional): Whether to fold the text to ASCII first. Defaults to False.
+    strip_digits (bool, optional): Whether to delete digits and underscores before splitting. Defaults to True.
+
+  Example:
+    >>> tokenizer = Tokenizer(frozenset(['the']))
+    >>> tokenizer.tokenize('The 2 cats of Café_Noir')
+    ['cats', 'of', 'cafénoir']
+    >>> tokenizer.ids('cats and dogs and cats')
+    TokenIds(ids=array([1, 0, 2, 0, 1]), sections=array([0, 0, 0, 0, 0]), vocabulary=array(['and', 'cats', 'dogs'], dtype=object))
+  """
+  def __init__(self, stop_words=frozenset(), fold_accents=False, strip_digits=True):
+    self.stop_words = frozenset(stop_words)
+    self.fold_accents = fold_accents
+    self.strip_digits = strip_digits
+
+  def preprocess(self, text):
+    """Lowercase the text and fold it to ASCII as configured"""
+    text = text.lower()
+    return fold_ascii(text) if self.fold_accents else text
+
+  def split(self, text):
+    """The words of an already preprocessed text, stop words dropped"""
+    stop_words = self.stop_words
+    words = WORD.findall(text)
+    if self.strip_digits:
+      # digits and underscores are word characters, so deleting them from the text never joins
+      # two words: it only shortens the words that hold some, dropping those left too short
+      words = (word if word.isalpha() else DIGITS_AND_UNDERSCORES.sub('', word) for word in words)
+      return [word for word in words if len(word) > 1 and word not in stop_words]
+    return [word for word in words if word not in stop_words]
+
+  def tokenize(self, text):
+    """The words of a text, stop words dropped"""
+    return self.split(self.preprocess(text))
+
+  def encode(self, section_tokens):
+    """Replace the tokens of every section of a document with integer ids
+
+    The vocabulary is that of the document alone. Ids follow its alphabetical order, so
+    sorting packed n-gram ids sorts the n-grams alphabetically, as CountVectorizer does.
+
+    Args:
+      section_tokens (list): A list of token lists, one per section
+
+    Returns:
+      TokenIds: The id of every token, the section of every token and the word of every id
+    """
+    import pandas as pd
+    codes, words = pd.factorize(np.fromiter(chain.from_iterable(section_tokens), dtype=object))
+    words = np.asarray(words, dtype=object)
+    order = np.argsort(words, kind='stable')
+    alphabetical = np.empty(len(order), dtype=np.int64)
+    alphabetical[order] = np.arange(len(order))
+    sections = np.repeat(np.arange(len(section_tokens)), [len(tokens) for tokens in section_tokens])
+    return TokenIds(alphabetical[codes], sections, words[order])
+
+  def ids(self, text):
+    """The token ids of a text, as a single section, see encode"""
+    return self.encode([self.tokenize(text)])
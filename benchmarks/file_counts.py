@@ -0,0 +1,94 @@
+"""Check file_counts against wc and compare their speed.
+
+The line, word and byte counts of every file must match `LC_ALL=C wc -lwc`, and so must
+those of random files built to hit the edge cases (control and non-ASCII bytes, words
+across block boundaries, no final newline). Exits non-zero on any mismatch.
+
+Usage:
+  python benchmarks/file_counts.py [--source data/raw/books1/epubtxt] [--random 200]
+"""
+import argparse
+import glob
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'data_processing'))
+
+from file_counts import FileCounts, count_file, count_files, read_head  # noqa: E402
+
+ALPHABET = b'ab \t\n\r\v\f\x00\x01\x7f\x80\xc2\xa0\xe2\x80\x83~!'
+
+
+def wc(file_name):
+  output = subprocess.check_output(['wc', '-lwc', file_name], env={**os.environ, 'LC_ALL': 'C'})
+  return FileCounts(*map(int, output.split()[:3]))
+
+
+def random_files(directory, count, seed=0):
+  rng = random.Random(seed)
+  for i in range(count):
+    size = rng.choice([0, 1, 2, 10, 1000, 70000])
+    path = os.path.join(directory, f'random-{i}.txt')
+    with open(path, 'wb') as f:
+      f.write(bytes(rng.choice(ALPHABET) for _ in range(size)))
+    yield path
+
+
+def check(paths):
+  mismatches = 0
+  for path in paths:
+    expected = wc(path)
+    # a tiny block size puts words across block boundaries
+    for block_size in [1 << 20, 7]:
+      counts = count_file(path, block_size=block_size)
+      if counts != expected:
+        mismatches += 1
+        print(f'MISMATCH {path} (block size {block_size}): {counts} != wc {expected}')
+    # the old way of reading the head, skipped when a lone carriage return splits its lines differently
+    with open(path, errors='ignore', encoding='utf8') as f:
+      expected_head = ''.join(next(f) for _ in range(min(300, expected.lines)))
+    with open(path, 'rb') as f:
+      lone_returns = f.read().replace(b'\r\n', b'').count(b'\r')
+    if not lone_returns and read_head(path, 300) != expected_head:
+      mismatches += 1
+      print(f'MISMATCH {path}: read_head differs from the first {min(300, expected.lines)} lines')
+  return mismatches
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--source', default=os.path.join(ROOT_DIR, 'data', 'raw', 'books1', 'epubtxt'),
+    help='a directory of .txt files to count')
+  parser.add_argument('--random', type=int, default=200, help='the number of random edge case files')
+  args = parser.parse_args()
+
+  books = sorted(glob.glob(os.path.join(args.source, '**', '*.txt'), recursive=True))
+  with tempfile.TemporaryDirectory() as directory:
+    mismatches = check(list(random_files(directory, args.random)) + books)
+  print(f'{len(books)} files and {args.random} random files checked, {mismatches} mismatches')
+
+  if books:
+    start = time.perf_counter()
+    expected = [wc(book) for book in books]
+    wc_time = time.perf_counter() - start
+    start = time.perf_counter()
+    counts = [count_file(book) for book in books]
+    ours_time = time.perf_counter() - start
+    start = time.perf_counter()
+    pooled = list(count_files(books))
+    pool_time = time.perf_counter() - start
+    assert counts == expected == pooled
+    size = sum(count.bytes for count in counts) / 2**20
+    print(f'wc subprocesses: {wc_time:.3f}s ({size / wc_time:.1f} MB/s)')
+    print(f'file_counts:     {ours_time:.3f}s ({size / ours_time:.1f} MB/s), {wc_time / ours_time:.1f}x')
+    print(f'worker pool:     {pool_time:.3f}s ({size / pool_time:.1f} MB/s), {wc_time / pool_time:.1f}x')
+  return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
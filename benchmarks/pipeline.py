@@ -0,0 +1,248 @@
+"""Time and memory-profile every stage of the analysis pipeline on corpora of several sizes.
+
+Corpora are generated deterministically, so runs on different commits measure the same
+input: a synthetic text of made-up words drawn from a Zipf distribution, in sentences and
+paragraphs, and, with --source, a real text made by repeating the given files. Each stage
+is timed --repeat times (the minimum and the median are kept) and run once more under
+tracemalloc for its peak memory. The results are written to a JSON file together with the
+commit, and --compare prints the change of every stage against the JSON file of another run.
+
+Usage:
+  python benchmarks/pipeline.py [--sizes 100KB,1MB,10MB,100MB] [--source path/to/book.txt]
+    [--repeat 3] [--output pipeline.json] [--compare baseline.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from app_functions import (ANALYSIS_PARAMS, generate_word_frequency, get_readability_stats,  # noqa: E402
+  network_visualization, relative_frequency_by_section)
+from correlation_index import CorrelationIndex  # noqa: E402
+from correlator import (count_bigrams, create_sections, get_all_correlations, get_tokenizer,  # noqa: E402
+  get_vectorization, read_text, tokenize_sections)
+from helpers import generate_table  # noqa: E402
+
+SIZE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMG]?B)?', re.IGNORECASE)
+UNITS = {'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30}
+SYLLABLES = ['a', 'an', 'ar', 'be', 'co', 'de', 'di', 'el', 'en', 'er', 'es', 'in', 'is', 'la', 'le', 'lo',
+  'ma', 'me', 'mi', 'na', 'ne', 'no', 'on', 'or', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si', 'so', 'ta', 'te',
+  'ti', 'to', 'tu', 'un', 'ur', 've']
+
+
+def parse_size(size):
+  """Bytes from a size like 100KB or 1.5MB"""
+  match = SIZE.fullmatch(size.strip())
+  if not match:
+    raise argparse.ArgumentTypeError(f'not a size: {size}')
+  return int(float(match.group(1)) * UNITS[(match.group(2) or 'B').upper()])
+
+
+def format_size(size):
+  for unit in ['GB', 'MB', 'KB']:
+    if size >= UNITS[unit] and size % UNITS[unit] == 0:
+      return f'{size // UNITS[unit]}{unit}'
+  return f'{size}B'
+
+
+def synthetic_text(size, seed=0, vocabulary_size=20000):
+  """A text of about size bytes of made-up words with a Zipf distribution
+
+  Sentences of 5 to 25 words end with a period, every 8th sentence ends a paragraph.
+  """
+  rng = np.random.default_rng(seed)
+  lengths = rng.integers(1, 5, vocabulary_size)
+  vocabulary = np.array([''.join(rng.choice(SYLLABLES, length)) for length in lengths], dtype=object)
+  # the rank of a word is its position, frequencies fall off as 1 / rank
+  weights = 1 / np.arange(1, vocabulary_size + 1)
+  words = vocabulary[rng.choice(vocabulary_size, size // 6 + 1, p=weights / weights.sum())]
+  sentence_ends = np.cumsum(rng.integers(5, 26, len(words) // 5 + 1))
+  sentence_ends = sentence_ends[sentence_ends < len(words)]
+  words[sentence_ends] = words[sentence_ends] + '.'
+  paragraph_ends = sentence_ends[7::8]
+  words[paragraph_ends] = words[paragraph_ends] + '\n'
+  text = ' '.join(words).replace('\n ', '\n\n')
+  return text[:text.rfind(' ', 0, size)]
+
+
+def repeated_text(source_files, size):
+  """A text of about size bytes made of the source files, repeated as needed and cut at a line end"""
+  text = '\n'.join(read_text(file_name) for file_name in source_files)
+  if not text.strip():
+    raise ValueError('the source files are empty')
+  text = text * (size // len(text.encode('utf8')) + 1)
+  cut = text.rfind('\n', 0, size)
+  return text[:cut if cut > 0 else size]
+
+
+def write_corpus(directory, kind, size, make_text):
+  """Write a corpus once and reuse it on later runs"""
+  file_name = os.path.join(directory, f'{kind}_{format_size(size)}.txt')
+  if not os.path.exists(file_name):
+    with open(file_name + '.tmp', 'w', encoding='utf8') as f:
+      f.write(make_text())
+    os.replace(file_name + '.tmp', file_name)
+  return file_name
+
+
+def pipeline_stages(file_name, params):
+  """The stages of the analysis, in order, as (name, function of the earlier results) pairs
+
+  Each function returns a dict of results the later stages use.
+  """
+  section_count, max_features = params['section_count'], params['max_features']
+  stop_words, split_by = params['expanded_stop_words'], params['split_by']
+
+  def correlation_index(results):
+    index = CorrelationIndex(results['word_counts'])
+    index.build()
+    return index
+
+  def top_word(results):
+    frequencies = results['word_freq_df']
+    return frequencies['Word'].iloc[0] if len(frequencies) else None
+
+  return [
+    ('read_text', lambda r: {'text': read_text(file_name)}),
+    ('create_sections', lambda r: {'sections': list(create_sections(r['text'], section_count))}),
+    ('tokenize_sections', lambda r: {'section_tokens': tokenize_sections(r['sections'], get_tokenizer(stop_words))}),
+    ('get_vectorization unigrams', lambda r: {'word_counts': get_vectorization(
+      file_name, max_features, stop_words, (1, 1), section_count, split_by, sparse=True)}),
+    ('get_vectorization bigrams', lambda r: {'bigram_counts': get_vectorization(
+      file_name, max_features, stop_words, (2, 2), section_count, split_by, sparse=True)}),
+    ('count_bigrams', lambda r: {'bigrams': count_bigrams(r['section_tokens'], max_features)}),
+    ('generate_word_frequency', lambda r: {'word_freq_df': generate_word_frequency(
+      r['word_counts'], {'word_count': r['word_counts'].word_count.sum()})}),
+    ('relative_frequency_by_section', lambda r: {'relative_freq_section': relative_frequency_by_section(r['word_counts'])}),
+    ('get_all_correlations', lambda r: {'correlations': list(get_all_correlations(r['word_counts'], top_word(r)))
+      if top_word(r) else []}),
+    ('CorrelationIndex.build', lambda r: {'correlation_index': correlation_index(r)}),
+    ('network_visualization', lambda r: {'network': network_visualization(r['bigrams'])}),
+    ('generate_table', lambda r: {'table': generate_table(r['word_freq_df'])}),
+    ('get_readability_stats', lambda r: {'stats': get_readability_stats(
+      r['text'], r['word_counts'].word_count.sum(), r['sections'])}),
+  ]
+
+
+def measure(function, results, repeat):
+  """Time a stage repeat times, then run it once under tracemalloc for its peak memory"""
+  seconds = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    output = function(results)
+    seconds.append(time.perf_counter() - start)
+  tracemalloc.start()
+  function(results)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return output, {
+    'seconds_min': min(seconds),
+    'seconds_median': statistics.median(seconds),
+    'peak_memory_mb': peak / (1 << 20),
+  }
+
+
+def run_corpus(kind, size, file_name, params, repeat):
+  print(f'{kind} {format_size(size)} ({file_name}, {os.path.getsize(file_name)} bytes)')
+  results, rows = {}, []
+  for stage, function in pipeline_stages(file_name, params):
+    output, row = measure(function, results, repeat)
+    results.update(output)
+    rows.append({'corpus': kind, 'size': size, 'stage': stage, **row})
+    print(f'  {stage:<30} {row["seconds_min"]:9.4f} s {row["peak_memory_mb"]:10.1f} MB')
+  return rows
+
+
+def git_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, stderr=subprocess.DEVNULL,
+      text=True).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def compare(rows, baseline_file, tolerance=0.1, noise=0.01):
+  """Print the time and memory of every stage against another run
+
+  Stages more than tolerance (a fraction) and noise (seconds) slower are marked.
+  """
+  with open(baseline_file) as f:
+    baseline = json.load(f)
+  before = {(row['corpus'], row['size'], row['stage']): row for row in baseline['results']}
+  print(f'compared with {baseline_file} (commit {baseline["meta"]["commit"]})')
+  for row in rows:
+    old = before.get((row['corpus'], row['size'], row['stage']))
+    if old is None:
+      continue
+    speedup = old['seconds_min'] / row['seconds_min'] if row['seconds_min'] else float('inf')
+    slower = row['seconds_min'] - old['seconds_min']
+    flag = '  SLOWER' if slower > noise and slower > tolerance * old['seconds_min'] else ''
+    print(f'  {row["corpus"]} {format_size(row["size"]):>6} {row["stage"]:<30} '
+      f'{old["seconds_min"]:9.4f} s -> {row["seconds_min"]:9.4f} s ({speedup:5.2f}x)  '
+      f'{old["peak_memory_mb"]:8.1f} MB -> {row["peak_memory_mb"]:8.1f} MB{flag}')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='100KB,1MB,10MB,100MB', help='comma separated corpus sizes')
+  parser.add_argument('--source', nargs='*', default=[], help='text files to build the real-text corpora from')
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'linguine_benchmark'),
+    help='where the generated corpora are kept between runs')
+  parser.add_argument('--output', help='the JSON file to write, defaults to pipeline-<commit>.json')
+  parser.add_argument('--compare', help='the JSON file of an earlier run')
+  args = parser.parse_args()
+
+  sizes = [parse_size(size) for size in args.sizes.split(',')]
+  os.makedirs(args.corpus_dir, exist_ok=True)
+  # real corpora built from other source files get other names
+  source_id = hashlib.sha1('\n'.join(map(os.path.abspath, args.source)).encode('utf8')).hexdigest()[:8]
+  corpora = []
+  for size in sizes:
+    corpora.append(('synthetic', size, write_corpus(args.corpus_dir, f'synthetic{args.seed}', size,
+      lambda: synthetic_text(size, args.seed))))
+    if args.source:
+      corpora.append(('real', size, write_corpus(args.corpus_dir, f'real{source_id}', size,
+        lambda: repeated_text(args.source, size))))
+
+  get_tokenizer()  # built once per process, as in the app
+  rows = []
+  for kind, size, file_name in corpora:
+    rows += run_corpus(kind, size, file_name, ANALYSIS_PARAMS, args.repeat)
+
+  commit = git_commit()
+  meta = {
+    'commit': commit,
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'sizes': sizes,
+    'sources': [os.path.abspath(file_name) for file_name in args.source],
+    'repeat': args.repeat,
+    'seed': args.seed,
+    'analysis_params': ANALYSIS_PARAMS,
+  }
+  output = args.output or f'pipeline-{(commit or "unknown")[:8]}.json'
+  with open(output, 'w') as f:
+    json.dump({'meta': meta, 'results': rows}, f, indent=2)
+  print(f'wrote {output}')
+  if args.compare:
+    compare(rows, args.compare)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
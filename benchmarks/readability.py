@@ -0,0 +1,63 @@
+"""Check readability.Readability against textstat and compare their speed.
+
+Usage:
+  python benchmarks/readability.py [--source path/to/book.txt] [--sections 10] [--tolerance 0.01]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+import textstat  # noqa: E402
+from correlator import read_text, split_sections  # noqa: E402
+from readability import Readability  # noqa: E402
+
+METRICS = ['flesch_reading_ease', 'flesch_kincaid_grade', 'smog_index', 'coleman_liau_index',
+  'automated_readability_index', 'dale_chall_readability_score', 'linsear_write_formula',
+  'gunning_fog', 'reading_time', 'text_standard']
+
+SAMPLE = '''It was the best of times, it was the worst of times. It was the age of wisdom, it
+was the age of foolishness! Wasn't it the epoch of belief -- or the epoch of incredulity?
+Mr. Lorry's "great" expectations = 3.5 units, e.g. U.S. currency... Short. Very short.'''
+
+
+def compare(text, tolerance):
+  start = time.perf_counter()
+  readability = Readability.of(text)
+  ours = {metric: getattr(readability, metric)() for metric in METRICS}
+  ours_time = time.perf_counter() - start
+  textstat.textstat._cache_clear()
+  start = time.perf_counter()
+  theirs = {metric: getattr(textstat, metric)(text) for metric in METRICS}
+  theirs_time = time.perf_counter() - start
+  mismatches = [
+    (metric, ours[metric], theirs[metric]) for metric in METRICS
+    if (ours[metric] != theirs[metric] if isinstance(theirs[metric], str) else abs(ours[metric] - theirs[metric]) > tolerance)
+  ]
+  return mismatches, ours_time, theirs_time
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--source', default=None, help='text file to score, defaults to a short sample')
+  parser.add_argument('--sections', type=int, default=10)
+  parser.add_argument('--tolerance', type=float, default=0.01)
+  args = parser.parse_args()
+
+  text = read_text(args.source) if args.source else SAMPLE
+  failures = 0
+  for label, part in [('document', text), *((f'section {i + 1}', s) for i, s in enumerate(split_sections(text, args.sections)))]:
+    mismatches, ours_time, theirs_time = compare(part, args.tolerance)
+    failures += len(mismatches)
+    print(f'{label:<12} {len(part):>10,} chars  readability {ours_time:7.3f}s  textstat {theirs_time:7.3f}s')
+    for metric, ours, theirs in mismatches:
+      print(f'{"":<12} {metric}: {ours} != {theirs}')
+  print(f'{failures} metrics outside a tolerance of {args.tolerance}')
+  sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,93 @@
+"""Compare correlator.split_sections with the original character-iterator generator.
+
+Splitting by tokens is also compared with finding every token with a regex and indexing
+the list of their offsets.
+
+Usage:
+  python benchmarks/section_splitter.py [--size-mb 50] [--sections 10] [--source path/to/book.txt]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from correlator import split_sections  # noqa: E402
+
+
+def legacy_create_sections(text, section_size):
+  # the generator correlator.create_sections used before split_sections
+  chunk_size = len(text)//section_size
+  if len(text) % section_size: chunk_size += 1
+  iterator = iter(text)
+  for _ in range(section_size):
+      accumulator = list()
+      for _ in range(chunk_size):
+          try: accumulator.append(next(iterator))
+          except StopIteration: break
+      yield ''.join(accumulator)
+
+
+def regex_token_sections(text, section_count):
+  # every token offset as a Python list, the straightforward way to split by tokens
+  starts = [match.start() for match in re.finditer(r'\S+', text)]
+  positions = [0, *(starts[len(starts) * i // section_count] for i in range(1, section_count)), len(text)]
+  return [text[start:end] for start, end in zip(positions, positions[1:])]
+
+
+def build_text(size_mb, source=None):
+  if source:
+    with open(source, encoding='utf8', errors='ignore') as f:
+      seed = f.read()
+  else:
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))) for _ in range(5000)]
+    paragraphs = []
+    for p in range(2000):
+      if p % 100 == 0:
+        paragraphs.append(f'CHAPTER {p // 100 + 1}')
+      paragraphs.append(' '.join(rng.choice(words) for _ in range(rng.randint(20, 120))) + '.')
+    seed = '\n\n'.join(paragraphs)
+  size = size_mb * (1 << 20)
+  return (seed * (size // len(seed) + 1))[:size]
+
+
+def timed(label, function, repeat):
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = function()
+    best = min(best, time.perf_counter() - start)
+  print(f'{label:<28} {best:8.3f}s')
+  return result, best
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--size-mb', type=int, default=50)
+  parser.add_argument('--sections', type=int, default=10)
+  parser.add_argument('--source', default=None, help='text file repeated up to --size-mb, defaults to synthetic text')
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  text = build_text(args.size_mb, args.source)
+  print(f'{len(text) / (1 << 20):.1f} MB of text, {args.sections} sections')
+  legacy, legacy_time = timed('legacy generator', lambda: list(legacy_create_sections(text, args.sections)), 1)
+  cut_tokens = sum(1 for a, b in zip(legacy, legacy[1:]) if a and b and not a[-1].isspace() and not b[0].isspace())
+  print(f'{"":<28} {cut_tokens} tokens cut at section boundaries')
+  for split_by in ('characters', 'tokens', 'paragraphs', 'chapters'):
+    sections, best = timed(f'split_sections[{split_by}]', lambda: split_sections(text, args.sections, split_by), args.repeat)
+    assert ''.join(sections) == text
+    print(f'{"":<28} {len(sections)} sections, {legacy_time / best:,.0f}x faster than legacy')
+    if split_by == 'tokens':
+      regex_sections, regex_time = timed('regex token offsets', lambda: regex_token_sections(text, args.sections), 1)
+      assert regex_sections == sections
+      print(f'{"":<28} split_sections[tokens] {regex_time / best:,.1f}x faster')
+
+
+if __name__ == '__main__':
+  main()
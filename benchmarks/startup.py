@@ -0,0 +1,96 @@
+"""Report how long the web app takes to start and serve its first pages.
+
+Every run starts a fresh interpreter that imports app.py and requests the static about
+page, the Dash index and the layout through the Flask test client. Times are measured
+from the start of the import, the median of the runs is reported along with the heavy
+modules the import loaded and the slowest imports (python -X importtime). Pass --baseline
+to measure another revision of the app the same way, e.g. the one before a change.
+
+Usage:
+  python benchmarks/startup.py [--runs 5] [--baseline HEAD~1]
+"""
+import argparse
+import io
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/about/', '/', '/_dash-layout']
+HEAVY_MODULES = ['pandas', 'scipy', 'sklearn', 'plotly.express', 'visdcc', 'textstat', 'pyphen', 'correlator', 'app_functions']
+
+CHILD = f'''
+import json, sys, time
+start = time.perf_counter()
+import app
+timings = {{'import app': time.perf_counter() - start}}
+client = app.server.test_client()
+for path in {PATHS!r}:
+  assert client.get(path).status_code == 200, path
+  timings[path] = time.perf_counter() - start
+print(json.dumps({{'timings': timings, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+'''
+
+
+def measure(app_dir, runs):
+  results = []
+  for _ in range(runs):
+    output = subprocess.check_output([sys.executable, '-c', CHILD], cwd=app_dir, stderr=subprocess.DEVNULL)
+    results.append(json.loads(output.decode('utf8').strip().splitlines()[-1]))
+  timings = {name: statistics.median(result['timings'][name] for result in results) for name in results[0]['timings']}
+  return timings, results[0]['loaded']
+
+
+def slowest_imports(app_dir, count=8):
+  """The top-level imports of app.py that took the longest, cumulative microseconds"""
+  output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+    cwd=app_dir, capture_output=True, text=True).stderr
+  rows = []
+  for line in output.splitlines():
+    match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)', line)
+    # direct imports of app.py are indented by two spaces
+    if match and len(match.group(3)) == 3:
+      rows.append((int(match.group(2)), match.group(4)))
+  return sorted(rows, reverse=True)[:count]
+
+
+def report(label, app_dir, runs):
+  timings, loaded = measure(app_dir, runs)
+  print(f'{label} ({app_dir})')
+  for name, seconds in timings.items():
+    print(f'  {name:<16} {seconds * 1000:8.0f} ms')
+  print(f'  heavy modules loaded: {", ".join(loaded) or "none"}')
+  print('  slowest imports: ' + ', '.join(f'{name} {micros / 1000:.0f} ms' for micros, name in slowest_imports(app_dir)))
+  return timings
+
+
+def checkout(revision, directory):
+  """Extract the app directory of a git revision"""
+  archive = subprocess.check_output(['git', 'archive', revision, 'app'], cwd=ROOT_DIR)
+  with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+    tar.extractall(directory)
+  return os.path.join(directory, 'app')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--baseline', help='a git revision to compare with')
+  args = parser.parse_args()
+
+  current = report('current', os.path.join(ROOT_DIR, 'app'), args.runs)
+  if args.baseline:
+    with tempfile.TemporaryDirectory() as directory:
+      baseline = report(f'baseline {args.baseline}', checkout(args.baseline, directory), args.runs)
+    for name in current:
+      print(f'{name:<16} {baseline[name] * 1000:8.0f} ms -> {current[name] * 1000:8.0f} ms '
+        f'({baseline[name] / current[name]:.1f}x)')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,80 @@
+"""Compare the tokens per second of the shared Tokenizer with the CountVectorizer analyzer it replaces.
+
+The old setup re-read the stop words and built a CountVectorizer on every call, the
+"cold" rows include that cost. Without --source the text is the synthetic Zipf text of
+benchmarks/pipeline.py. Exits non-zero if the tokens differ.
+
+Usage:
+  python benchmarks/tokenizer.py [--source path/to/book.txt | --size 1MB] [--sections 10] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer  # noqa: E402
+from correlator import STOP_WORDS_PATH, get_tokenizer, read_text, split_sections  # noqa: E402
+from pipeline import parse_size, synthetic_text  # noqa: E402
+
+
+def old_stop_words():
+  with open(STOP_WORDS_PATH, 'r') as f:
+    stop_words = f.read().splitlines()
+  return ENGLISH_STOP_WORDS.union(set([word.lower() for word in stop_words]))
+
+
+def old_tokenize_sections(sections):
+  analyzer = CountVectorizer(
+    stop_words=old_stop_words(),
+    strip_accents='ascii',
+    lowercase=True,
+    decode_error='ignore',
+    preprocessor=lambda x: re.sub(r'_|\d+', '', x.lower()).lower()
+  ).build_analyzer()
+  return [analyzer(section) for section in sections]
+
+
+def time_it(function, repeat):
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = function()
+    best = min(best, time.perf_counter() - start)
+  return best, result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--source', default=None, help='a text file, defaults to a synthetic text of --size')
+  parser.add_argument('--size', type=parse_size, default='1MB', help='the size of the synthetic text')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--sections', type=int, default=10)
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+
+  text = read_text(args.source) if args.source else synthetic_text(args.size, args.seed)
+  sections = split_sections(text, args.sections)
+  cold_time, old_tokens = time_it(lambda: old_tokenize_sections(sections), args.repeat)
+  get_tokenizer.cache_clear()
+  build_time, tokenizer = time_it(lambda: get_tokenizer(), 1)
+  new_time, new_tokens = time_it(lambda: [tokenizer.tokenize(section) for section in sections], args.repeat)
+  ids_time, _ = time_it(lambda: tokenizer.encode([tokenizer.tokenize(section) for section in sections]), args.repeat)
+
+  tokens = sum(len(section_tokens) for section_tokens in old_tokens)
+  print(f'{tokens} tokens in {len(sections)} sections of {args.source or "a synthetic text"}')
+  print(f'CountVectorizer, built per call: {cold_time:.4f}s, {tokens / cold_time:,.0f} tokens/s')
+  print(f'Tokenizer, built once ({build_time:.4f}s): {new_time:.4f}s, {tokens / new_time:,.0f} tokens/s, '
+    f'{cold_time / new_time:.1f}x')
+  print(f'Tokenizer token ids: {ids_time:.4f}s, {tokens / ids_time:,.0f} tokens/s')
+  if old_tokens != new_tokens:
+    print('MISMATCH: the tokenizers disagree')
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,169 @@
+import csv
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from tqdm import tqdm
+
+COUNTS_SUFFIX = '_counts.txt'
+ID_DTYPE = np.int32
+COUNT_DTYPE = np.int64
+
+
+def source_files(counts_directory):
+    """The size and modification time of every counts file of a directory, by file name
+
+    Returns:
+        dict: [size, mtime in nanoseconds] by file name, as stored in index.json
+    """
+    files = {}
+    for file_name in sorted(glob.glob(os.path.join(counts_directory, f'*{COUNTS_SUFFIX}'))):
+        stat = os.stat(file_name)
+        files[os.path.basename(file_name)] = [stat.st_size, stat.st_mtime_ns]
+    return files
+
+
+def read_counts(file_name):
+    """Parse a SPGC counts file, one word<TAB>count line per word
+
+    Returns:
+        tuple: The words and their counts as arrays (words, counts)
+    """
+    f = pd.read_csv(file_name, sep='\t', header=None, names=['word', 'count'], lineterminator='\n',
+                    quoting=csv.QUOTE_NONE, na_filter=False, dtype={'word': str, 'count': COUNT_DTYPE})
+    return f['word'].to_numpy(), f['count'].to_numpy()
+
+
+class CountsIndex:
+    """The word counts of every Gutenberg book, stored once so queries never parse the counts files again
+
+    The index directory holds the vocabulary (one word per line, the line number is its id),
+    the book ids, and the counts of every book as a sparse matrix in CSR arrays: indptr.npy
+    and totals.npy, and the word_ids.bin and counts.bin arrays that are memory mapped rather
+    than read, whatever the size of the corpus. index.json records the size and modification
+    time of every counts file it was built from, so open rebuilds an index whose files changed.
+
+    Example:
+        >>> index = CountsIndex.build('data/raw/project_gutenberg_data', 'data/processed/gutenberg_index')
+        >>> index.term_counts(['trauma', 'anxiety'], book_ids=['PG10', 'PG11'])
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, 'vocabulary.txt'), encoding='utf8', newline='') as f:
+            self.vocabulary = {word: i for i, word in enumerate(f.read().split('\n')[:-1])}
+        with open(os.path.join(directory, 'books.txt'), encoding='utf8') as f:
+            self.books = pd.Index(f.read().split('\n')[:-1])
+        self.indptr = np.load(os.path.join(directory, 'indptr.npy'), mmap_mode='r')
+        self.totals = pd.Series(np.load(os.path.join(directory, 'totals.npy')), index=self.books)
+        nnz = int(self.indptr[-1])
+        self.word_ids = self._memmap('word_ids.bin', ID_DTYPE, nnz)
+        self.counts = self._memmap('counts.bin', COUNT_DTYPE, nnz)
+
+    def _memmap(self, name, dtype, size):
+        if size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode='r', shape=(size,))
+
+    @classmethod
+    def build(cls, counts_directory, directory):
+        """Index every counts file of a directory
+
+        The book id of a file is its name without _counts.txt. Files that cannot be parsed
+        are reported and left out. Any index already in the directory is replaced.
+
+        Args:
+            counts_directory (str): The directory of the *_counts.txt files
+            directory (str): The directory to write the index to
+
+        Returns:
+            CountsIndex: The index
+        """
+        os.makedirs(directory, exist_ok=True)
+        # an index being replaced is incomplete until index.json is written again
+        if os.path.exists(os.path.join(directory, 'index.json')):
+            os.remove(os.path.join(directory, 'index.json'))
+        # taken before the files are read, so a file changed during the build is read again next time
+        files = source_files(counts_directory)
+        file_names = [os.path.join(counts_directory, file_name) for file_name in files]
+        vocabulary = {}
+        books, indptr, totals = [], [0], []
+        with open(os.path.join(directory, 'word_ids.bin'), 'wb') as word_ids_file, \
+                open(os.path.join(directory, 'counts.bin'), 'wb') as counts_file:
+            for file_name in tqdm(file_names, unit='book'):
+                try:
+                    words, counts = read_counts(file_name)
+                except (ValueError, pd.errors.ParserError) as e:
+                    tqdm.write(f'Skipping {file_name}: {e}')
+                    continue
+                ids = np.fromiter((vocabulary.setdefault(word, len(vocabulary)) for word in words),
+                                  dtype=ID_DTYPE, count=len(words))
+                order = np.argsort(ids, kind='stable')
+                ids[order].tofile(word_ids_file)
+                counts.astype(COUNT_DTYPE)[order].tofile(counts_file)
+                books.append(os.path.basename(file_name)[:-len(COUNTS_SUFFIX)])
+                indptr.append(indptr[-1] + len(ids))
+                totals.append(counts.sum())
+        with open(os.path.join(directory, 'vocabulary.txt'), 'w', encoding='utf8', newline='') as f:
+            f.writelines(f'{word}\n' for word in vocabulary)
+        with open(os.path.join(directory, 'books.txt'), 'w', encoding='utf8') as f:
+            f.writelines(f'{book}\n' for book in books)
+        np.save(os.path.join(directory, 'indptr.npy'), np.asarray(indptr, dtype=np.int64))
+        np.save(os.path.join(directory, 'totals.npy'), np.asarray(totals, dtype=COUNT_DTYPE))
+        # written last, an index without it is incomplete
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump({'books': len(books), 'words': len(vocabulary), 'source': os.path.abspath(counts_directory),
+                       'files': files}, f)
+        return cls(directory)
+
+    @classmethod
+    def open(cls, counts_directory, directory):
+        """Open the index in a directory, building it first if there is none or its counts files changed
+
+        A counts file added, removed, resized or modified since the index was built makes it stale.
+        """
+        meta_path = os.path.join(directory, 'index.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                files = json.load(f).get('files')
+            if files == source_files(counts_directory):
+                return cls(directory)
+        return cls.build(counts_directory, directory)
+
+    def matrix(self):
+        """The book by word count matrix, backed by the memory mapped arrays"""
+        return csr_matrix((self.counts, self.word_ids, self.indptr), shape=(len(self.books), len(self.vocabulary)))
+
+    def term_counts(self, terms, book_ids=None):
+        """The count of every term in every book, 0 for terms not in a book or not in the index
+
+        Args:
+            terms (list): The terms
+            book_ids (list, optional): The books, in order. Defaults to every indexed book.
+
+        Returns:
+            pd.DataFrame: A column per term, indexed by book id
+        """
+        known = [term for term in terms if term in self.vocabulary]
+        columns = self.matrix()[:, [self.vocabulary[term] for term in known]].toarray()
+        df = pd.DataFrame(columns, index=self.books, columns=known).reindex(columns=list(terms), fill_value=0)
+        if book_ids is not None:
+            df = df.reindex(pd.Index(book_ids).astype(str), fill_value=0)
+        return df
+
+    def total_counts(self, book_ids=None):
+        """The total token count of every book, NaN for books not in the index
+
+        Args:
+            book_ids (list, optional): The books, in order. Defaults to every indexed book.
+
+        Returns:
+            pd.Series: The totals, indexed by book id
+        """
+        if book_ids is None:
+            return self.totals
+        return self.totals.reindex(pd.Index(book_ids).astype(str))
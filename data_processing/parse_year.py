@@ -1,49 +1,111 @@
+import argparse
+import csv
 import os
 import glob
-import pandas as pd
-from tqdm import tqdm
 import re
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from tqdm import tqdm
+
+from file_counts import read_head
+
+COLUMNS = ["year_published", "filename", "title"]
+# consecutively less constraining patterns, the first one with a match in range wins
+YEAR_PUBLISHED_REGEX = [re.compile(pattern) for pattern in [r'20\d{2}$', r'20\d{2}', r'\d{4}$', r'\d{4}']]
+# every four digit window, for the early exit mode
+ANY_YEAR = re.compile(r'(?=(\d{4}))')
+HEAD_LINES = 300
+UNKNOWN_YEAR = 1111
+
+def is_valid_year(year):
+    # filter years between 1990 and 2023
+    return 1990 <= int(year) <= 2023
+
+def find_year(top_lines):
+    """The estimated publication year in the top lines of a book, or None"""
+    for reg in YEAR_PUBLISHED_REGEX:
+        # get the first match we find
+        for year in reg.findall(top_lines):
+            if is_valid_year(year):
+                return year
+    return None
 
-def parse_year_published():
+def find_first_year(book, lines=HEAD_LINES):
+    """The first year in range in the top lines of a book, or None, reading no further than it"""
+    with open(book, "r", errors="ignore") as bk:
+        for _, line in zip(range(lines), bk):
+            for year in ANY_YEAR.findall(line):
+                if is_valid_year(year):
+                    return year
+    return None
+
+def parse_book(book, early_exit=False):
+    """The year_published, filename and title record of a book"""
+    if early_exit:
+        publication_year = find_first_year(book)
+    else:
+        # get the first couple of lines (300 here) in the novel and see if there is a publication year
+        publication_year = find_year(read_head(book, HEAD_LINES))
+    # do some minor cleanup
+    filename = os.path.basename(book)
+    return {
+        "year_published": int(publication_year) if publication_year else UNKNOWN_YEAR,
+        "filename": filename,
+        "title": filename.split(".")[0].replace("-", " ").capitalize(),
+    }
+
+def write_records(records, output_path, batch_size=1000):
+    """Write records to a CSV or, if the path ends in .parquet, a Parquet file, a batch at a time
+
+    Args:
+        records (iterator): The records, dicts of COLUMNS
+        output_path (str): The path of the file
+        batch_size (int, optional): The number of records held in memory. Defaults to 1000.
+    """
+    records = iter(records)
+    batches = iter(lambda: list(islice(records, batch_size)), [])
+    if output_path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([("year_published", pa.int64()), ("filename", pa.string()), ("title", pa.string())])
+        with pq.ParquetWriter(output_path, schema) as writer:
+            for batch in batches:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    else:
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for batch in batches:
+                writer.writerows(batch)
+
+def parse_year_published(output_path=None, workers=None, early_exit=False, batch_size=1000):
     ''' Parse the original data to extract the year the book was published.
         This only returns an estimated year based on the idea that the publication
         year will usually be at the top of the book. For example: Copyright (c) 2008.
         So there is a fair chance that the year picked up may not be accurate, but
         this is a close approximation.
+
+        Books are parsed across a process pool and the records are written as they come,
+        a batch at a time. With early_exit, each book is only read up to the first year
+        in range instead of trying the patterns in order over its top lines, which is faster
+        but can pick a different year.
     '''
     ROOT_DIR = os.path.dirname(os.path.abspath(__file__).split('data_processing')[0])
     raw_dataset_path = f"{ROOT_DIR}/data/raw/books1/epubtxt"
-    columns = ["year_published",  "filename", "title"]
-    output = pd.DataFrame(columns=columns)
+    output_path = output_path or f"{ROOT_DIR}/data/metadata/year_published.csv"
     # get all filenames
     all_books = glob.glob(f"{raw_dataset_path}/*.txt")
 
-    year_published_regex = [r'20\d{2}$', r'20\d{2}', r'\d{4}$', r'\d{4}']
-    for book in tqdm(all_books):
-        # get the first couple of lines (300 here) in the novel and see if there is a publication year
-        # we use regular expressions that are consecutively less constraining until we find a match
-        LINES = min(300, int(subprocess.check_output(['wc', '-l', book]).split()[0]))
-        with open(book, "r", errors="ignore") as bk:
-            top_lines = "".join(next(bk) for _ in range(LINES))
-            publication_year = None
-            for reg in year_published_regex:
-                year = re.findall(reg, top_lines)
-                # get the first match we find
-                if len(year) >= 1:
-                    # filter years between 2000 and 2023
-                    year = [yr for yr in year if ((int(yr) >= 1990) and (int(yr) <= 2023))]
-                    if len(year) >= 1:
-                        publication_year = year[0]
-                        break
-            # do some minor cleanup and append everything to the data frame
-            output = pd.concat([output, pd.Series({
-                "year_published": publication_year if publication_year else 1111,
-                "filename": book.split("/")[-1],
-                "title": book.split("/")[-1].split(".", -2)[0].replace("-", " ").capitalize(),}).to_frame().T],
-                ignore_index=True)
-    # write output to CSV file
-    output.to_csv(f"{ROOT_DIR}/data/metadata/year_published.csv", index=False)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        records = pool.map(parse_book, all_books, [early_exit] * len(all_books), chunksize=64)
+        write_records(tqdm(records, total=len(all_books)), output_path, batch_size)
 
 if __name__ == "__main__":
-    parse_year_published()
+    parser = argparse.ArgumentParser(description='Estimate the year every BookCorpus book was published')
+    parser.add_argument('--output', default=None, help='a .csv or .parquet file, defaults to data/metadata/year_published.csv')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('--early-exit', action='store_true', help='stop reading each book at its first year in range')
+    parser.add_argument('--batch-size', type=int, default=1000, help='records written at a time')
+    args = parser.parse_args()
+    parse_year_published(args.output, args.workers, args.early_exit, args.batch_size)
@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# the tokenizer is shared with the web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+from tokenizer import Tokenizer  # noqa: E402
+
+BLOCK_SIZE = 1 << 20
+
+
+class PhraseCounter:
+    """Counts the occurrences of a fixed list of words and phrases in text files
+
+    Matches what CountVectorizer(stop_words='english', strip_accents='ascii',
+    lowercase=True, ngram_range=(1, max_n)) fitted on the terms counts line by line:
+    lines are lowercased, stripped of accents and tokenized, stop words are dropped,
+    and phrases match consecutive remaining tokens of one line. Terms that this
+    tokenization changes (e.g. ones made of stop words) or longer than max_n tokens
+    are never counted.
+
+    The matcher is built once. Only the lines that contain one of the term words are
+    tokenized, and files are read in blocks rather than whole.
+
+    Args:
+        terms (list): The words and phrases to count
+        max_n (int, optional): The longest phrase, in tokens. Defaults to 3.
+
+    Example:
+        >>> counter = PhraseCounter(['trauma', 'shell shock'])
+        >>> counter.count_file('book.txt')
+        {'trauma': 3, 'shell shock': 0}
+    """
+    def __init__(self, terms, max_n=3):
+        self.terms = list(terms)
+        self.tokenizer = Tokenizer(ENGLISH_STOP_WORDS, fold_accents=True, strip_digits=False)
+        # first token -> the token tuples of the phrases that start with it
+        self.phrases = {}
+        for term in self.terms:
+            tokens = tuple(self.tokenizer.tokenize(term))
+            if ' '.join(tokens) == term and 0 < len(tokens) <= max_n:
+                self.phrases.setdefault(tokens[0], []).append(tokens)
+        # a line can only hold a phrase if it holds the phrase's first word
+        first_words = '|'.join(map(re.escape, sorted(self.phrases)))
+        self.candidate = re.compile(rf'\b(?:{first_words})\b') if self.phrases else None
+
+    def count_line(self, line, counts):
+        tokens = self.tokenizer.split(line)
+        for i, token in enumerate(tokens):
+            for phrase in self.phrases.get(token, ()):
+                if tuple(tokens[i:i + len(phrase)]) == phrase:
+                    counts[' '.join(phrase)] += 1
+
+    def count_text(self, text, counts=None):
+        """Count the terms in a block of whole lines
+
+        Args:
+            text (str): The text
+            counts (dict, optional): The counts to add to. Defaults to new zero counts.
+
+        Returns:
+            dict: The count of every term
+        """
+        counts = {term: 0 for term in self.terms} if counts is None else counts
+        if self.candidate is None:
+            return counts
+        folded = self.tokenizer.preprocess(text)
+        end = -1
+        for match in self.candidate.finditer(folded):
+            if match.start() <= end:
+                continue  # the line was already counted
+            start = folded.rfind('\n', 0, match.start()) + 1
+            end = folded.find('\n', match.end())
+            end = len(folded) if end == -1 else end
+            self.count_line(folded[start:end], counts)
+        return counts
+
+    def count_file(self, file_name, block_size=BLOCK_SIZE):
+        """Count the terms in a file, reading it a block of lines at a time
+
+        Args:
+            file_name (str): The path of the file
+            block_size (int, optional): The number of characters read at a time. Defaults to 1 MiB.
+
+        Returns:
+            dict: The count of every term
+        """
+        counts = {term: 0 for term in self.terms}
+        with open(file_name, errors='ignore') as f:
+            rest = ''
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                block = rest + block
+                cut = block.rfind('\n') + 1
+                self.count_text(block[:cut], counts)
+                rest = block[cut:]
+            self.count_text(rest, counts)
+        return counts
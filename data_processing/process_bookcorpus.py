@@ -1,46 +1,126 @@
+import argparse
+import csv
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import pandas as pd
-# from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.feature_extraction.text import CountVectorizer
 from tqdm import tqdm
-tqdm.pandas()
+
+from phrase_counter import PhraseCounter
 
 THERAPY_WORD_LIST = ['trauma', 'traumatic', 'traumatized', 'traumatizing', 'ptsd', 'depression', 'great depression', 'depressed', 'suicidal', 'depressing', 'anxiety', 'ocd', 'obsessive compulsive disorder', 'schizophrenia', 'bipolar', 'bipolar disorder', 'psychosis', 'psychotic', 'shell shock']
 
+# built once per process, not once per book
+THERAPY_COUNTER = PhraseCounter(THERAPY_WORD_LIST)
+
 def process_file(file_name):
-    THERAPY_WORDS = {word: 0 for word in THERAPY_WORD_LIST}
-    vectorizer = CountVectorizer(
-        stop_words='english',
-        strip_accents='ascii',
-        lowercase=True,
-        ngram_range=(1, 3),
-    )
-    with open(file_name) as f:
-        corpus = f.readlines()
-        corpus = [x.strip() for x in corpus]
+    """Count the therapy words and phrases in a book
+
+    The counts are the ones a CountVectorizer(stop_words='english', strip_accents='ascii',
+    ngram_range=(1, 3)) fitted on THERAPY_WORD_LIST gives over the lines of the book.
+
+    Returns:
+        dict: The count of every term of THERAPY_WORD_LIST
+    """
+    return THERAPY_COUNTER.count_file(file_name)
+
+def process_book(raw_dataset_path, file_name):
     try:
-        vectorizer.fit_transform(THERAPY_WORDS.keys())
-        term_freq_vector = vectorizer.transform(corpus)
-
-        word_list = vectorizer.get_feature_names_out()
-        count_list = term_freq_vector.toarray().sum(axis=0)
-        vocab = dict(zip(word_list, count_list))
-    except ValueError:
-        vocab = {}
-    for k, v in THERAPY_WORDS.items():
-        THERAPY_WORDS[k] = vocab[k] if k in vocab else v
-    return THERAPY_WORDS
-
-def count_occurrences():
+        return file_name, process_file(f'{raw_dataset_path}/{file_name}'), None
+    except OSError as e:
+        return file_name, None, str(e)
+
+# every complete checkpoint row ends with ROW_END, which a row cut short by an interrupted write lacks
+ROW_END = 'end'
+CHECKPOINT_COLUMNS = ['filename', *THERAPY_WORD_LIST, ROW_END]
+
+def read_checkpoint(checkpoint_path):
+    """The counts of the books a previous, interrupted run already processed
+
+    Only complete rows are read: rows with every column and ROW_END last.
+
+    Returns:
+        pd.DataFrame: The filename and counts of every book, None if there is no checkpoint
+            or it has other columns
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, newline='') as f:
+        reader = csv.reader(f)
+        if next(reader, None) != CHECKPOINT_COLUMNS:
+            return None
+        rows = [row[:-1] for row in reader if len(row) == len(CHECKPOINT_COLUMNS) and row[-1] == ROW_END]
+    done = pd.DataFrame(rows, columns=CHECKPOINT_COLUMNS[:-1])
+    return done.astype({word: int for word in THERAPY_WORD_LIST})
+
+def drop_partial_line(checkpoint_path, block_size=1 << 16):
+    """Cut off the partial last line an interrupted write leaves, so new rows start on a line of their own"""
+    with open(checkpoint_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+def count_occurrences(workers=None, checkpoint_every=100):
+    """Count the therapy words of every book in the metadata into data/processed/book_corpus.csv
+
+    Books are processed across a process pool. The counts are appended to a checkpoint file
+    as books finish, and books already in it are skipped, so an interrupted run resumes where
+    it stopped. The checkpoint is removed once the output is written.
+
+    Args:
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        checkpoint_every (int, optional): The number of books between flushes of the checkpoint. Defaults to 100.
+    """
     ROOT_DIR = os.path.dirname(os.path.abspath(__file__).split('data_processing')[0])
-    raw_dataset_path = f"{ROOT_DIR}/data/raw/books1/epubtxt" 
+    raw_dataset_path = f"{ROOT_DIR}/data/raw/books1/epubtxt"
+    output_path = f"{ROOT_DIR}/data/processed/book_corpus.csv"
+    checkpoint_path = f"{ROOT_DIR}/data/processed/book_corpus.checkpoint.csv"
     df = pd.read_csv(f"{ROOT_DIR}/data/metadata/year_published.csv")
-    # file_names = df["filename"].values[:10]
-    # results = [process_file(f'{raw_dataset_path}/{file}') for file in file_names]
-    process_line = lambda file_name: pd.Series(process_file(f'{raw_dataset_path}/{file_name}'))
-    df[[*THERAPY_WORD_LIST]] = df["filename"].progress_apply(process_line)
-    df.to_csv(f"{ROOT_DIR}/data/processed/book_corpus.csv", index=False)
+
+    if os.path.exists(checkpoint_path):
+        # before reading, so that the books of rows cut off are processed again
+        drop_partial_line(checkpoint_path)
+    done = read_checkpoint(checkpoint_path)
+    new_checkpoint = done is None
+    todo = sorted(set(df["filename"]) - (set() if new_checkpoint else set(done["filename"])))
+    failed = 0
+    # a checkpoint of another layout cannot be trusted, it is started over
+    mode = 'w' if new_checkpoint else 'a'
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(checkpoint_path, mode, newline='') as f:
+        writer = csv.writer(f)
+        if new_checkpoint:
+            writer.writerow(CHECKPOINT_COLUMNS)
+        futures = [pool.submit(process_book, raw_dataset_path, file_name) for file_name in todo]
+        for i, future in enumerate(tqdm(as_completed(futures), total=len(futures), unit='book'), 1):
+            file_name, counts, error = future.result()
+            if error is not None:
+                failed += 1
+                tqdm.write(f'Skipping {file_name}: {error}')
+                continue
+            writer.writerow([file_name, *(counts[word] for word in THERAPY_WORD_LIST), ROW_END])
+            if i % checkpoint_every == 0:
+                f.flush()
+
+    counts = read_checkpoint(checkpoint_path).drop_duplicates('filename').set_index('filename')
+    counts = counts.reindex(df["filename"])
+    for word in THERAPY_WORD_LIST:
+        df[word] = counts[word].to_numpy()
+    df.to_csv(output_path, index=False)
+    if failed:
+        # keep the checkpoint so a rerun only retries the books that failed
+        print(f'{failed} books failed, rerun to retry them')
+    else:
+        os.remove(checkpoint_path)
 
 if __name__ == "__main__":
-    count_occurrences()
+    parser = argparse.ArgumentParser(description='Count therapy words in the BookCorpus books')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs')
+    args = parser.parse_args()
+    count_occurrences(workers=args.workers)
@@ -1,17 +1,17 @@
 import os
-import subprocess
 
 import pandas as pd
 from tqdm import tqdm
 
-tqdm.pandas()
+import file_counts
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__).split('data_processing')[0])
 data_path = f"{ROOT_DIR}/data/raw/books1/epubtxt/"
 
 def count_words(file_name):
+    # the words `LC_ALL=C wc -w` counts, see file_counts.BYTE_CLASS
     try:
-        count = int(subprocess.check_output(['wc', '-w', data_path + file_name]).split()[0])
+        count = file_counts.count_words(data_path + file_name)
     except FileNotFoundError:
         count = None
     return count
@@ -19,7 +19,7 @@ def count_words(file_name):
 def process_book_corpus():
     df_path = f"{ROOT_DIR}/data/processed/book_corpus.csv"
     df = pd.read_csv(df_path)
-    df['word_count'] = df['filename'].progress_apply(count_words)
+    df['word_count'] = list(tqdm(file_counts.count_files(df['filename'], count_words), total=len(df)))
     df.to_csv(f"{ROOT_DIR}/data/processed/book_corpus_wc.csv")
 
 if __name__ == '__main__':
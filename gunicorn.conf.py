@@ -0,0 +1,16 @@
+# Gunicorn settings of the App Engine entrypoint, see app.yaml
+
+# Import the app once in the master and fork it into the workers. Importing it is cheap since
+# the analytics stack is loaded lazily, so workers serve the layout and static pages at once.
+preload_app = True
+
+def on_starting(server):
+  # the metrics of the previous run are dropped, workers start counting from zero
+  import metrics
+  if metrics.ENABLED:
+    metrics.registry.reset()
+
+def post_worker_init(worker):
+  # threads do not survive a fork, so every worker starts its own warm up
+  from app import warm_up
+  warm_up()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the app and the data processing scripts import their modules by bare name
+sys.path.insert(0, os.path.join(ROOT_DIR, 'data_processing'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
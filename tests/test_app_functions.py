@@ -0,0 +1,39 @@
+import pandas as pd
+
+from app_functions import analyze_upload, analyze_upload_stages, generate_word_frequency, plot_word_frequency
+
+
+def test_tiny_document(tmp_path):
+  path = tmp_path / 'tiny.txt'
+  path.write_text('zebra giraffe zebra. giraffe zebra okapi.')
+  document = analyze_upload(str(path))
+  assert document['word_freq_df']['Word'].tolist() == ['zebra', 'giraffe', 'okapi']
+  figure = plot_word_frequency(document['relative_freq_section'])
+  assert sorted(trace.name for trace in figure.data) == ['giraffe', 'okapi', 'zebra']
+
+
+def test_generate_word_frequency_per_100000_words():
+  df = pd.DataFrame({'war': [2, 1], 'peace': [1, 0], 'word_count': [4, 3]})
+  word_freq_df = generate_word_frequency(df, {'word_count': 7})
+  assert word_freq_df[['Word', 'Count']].values.tolist() == [['war', 3], ['peace', 1]]
+  assert word_freq_df['Relative'].tolist() == [42857.143, 14285.714]
+
+
+def test_summary_comes_with_the_word_counts(tmp_path):
+  path = tmp_path / 'tiny.txt'
+  path.write_text('zebra giraffe zebra. giraffe zebra okapi.')
+  stages = analyze_upload_stages(str(path))
+  stage, results = next(stages)
+  assert stage == 'vectorizing'
+  summary = results['summary']
+  assert summary['top_10_words'] == ['zebra', 'giraffe', 'okapi']
+  stats = dict(stages)['readability']['stats']
+  assert (summary['word_count'], summary['top_10_words']) == (stats['word_count'], stats['top_10_words'])
+
+
+def test_document_and_corpus_count_the_same_words(tmp_path):
+  from corpus import count_document
+  path = tmp_path / 'spaced.txt'
+  path.write_text('zebra  giraffe\nzebra.\n\ngiraffe zebra okapi.\n')
+  document = analyze_upload(str(path))
+  assert document['stats']['word_count'] == count_document(str(path)).word_count == 6
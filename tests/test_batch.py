@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import batch
+
+
+def test_write_errors_fail_only_their_document(tmp_path, monkeypatch):
+  path = tmp_path / 'book.txt'
+  path.write_text('The war and the peace. ' * 200)
+  for table in batch.TABLES:
+    (tmp_path / 'out' / table).mkdir(parents=True)
+
+  def full_disk(df, path):
+    raise OSError('No space left on device')
+  monkeypatch.setattr(batch, 'write_table', full_disk)
+  doc_id, _, error = batch.analyze_file('book', str(path), str(tmp_path / 'out'), batch.ANALYSIS_PARAMS)
+  assert (doc_id, error) == ('book', 'OSError: No space left on device')
+
+
+def test_failures_are_listed_once_per_run(tmp_path):
+  documents = [('missing', str(tmp_path / 'missing.txt'))]
+  output = tmp_path / 'out'
+  for _ in range(2):
+    summary = batch.run(documents, str(output), workers=1)
+    assert summary['failed'] == 1
+  assert (output / 'failed.tsv').read_text().splitlines() == [
+    f"missing\tFileNotFoundError: [Errno 2] No such file or directory: '{tmp_path / 'missing.txt'}'"]
+
+
+def test_batch_runs_without_dash():
+  app_dir = os.path.dirname(batch.__file__)
+  code = 'import sys, batch; print("dash" in sys.modules)'
+  output = subprocess.run([sys.executable, '-c', code], cwd=app_dir, capture_output=True, text=True, check=True)
+  assert output.stdout.strip() == 'False'
@@ -0,0 +1,52 @@
+from app_functions import centrality_table, network_visualization
+from bigram_graph import BigramGraph
+from correlator import count_bigrams, get_bigrams
+
+
+def test_get_bigrams_without_bigrams():
+  bigrams = get_bigrams([['word'], []])
+  assert len(bigrams) == 0
+  assert bigrams['bigram'].dtype == object
+
+
+def test_network_panel_without_bigrams():
+  bigrams = count_bigrams([['word']])
+  network = network_visualization(bigrams, min_count=2)
+  assert network.data == {'nodes': [], 'edges': []}
+  assert centrality_table(bigrams, min_count=2) is not None
+
+
+def test_get_bigrams_counts_within_sections():
+  bigrams = get_bigrams([['war', 'peace', 'war', 'peace'], ['peace', 'war']])
+  assert dict(zip(bigrams['bigram'], bigrams['count'])) == {'war peace': 2, 'peace war': 2}
+
+
+def test_count_bigrams_matches_get_bigrams():
+  section_tokens = [['war', 'peace', 'war', 'peace', 'love'], ['peace', 'war']]
+  bigrams = count_bigrams(section_tokens)
+  pairs = {f'{bigrams.vocabulary[s]} {bigrams.vocabulary[t]}': c
+    for s, t, c in zip(bigrams.sources, bigrams.targets, bigrams.counts)}
+  bigrams_df = get_bigrams(section_tokens)
+  assert pairs == dict(zip(bigrams_df['bigram'], bigrams_df['count']))
+  assert list(bigrams.vocabulary) == ['love', 'peace', 'war']
+
+
+def test_graph_from_pairs_drops_rare_bigrams():
+  graph = BigramGraph.from_pairs(*count_bigrams([['war', 'peace', 'war', 'peace', 'love']]), min_count=1)
+  assert list(graph.words) == ['peace', 'war']
+  assert graph.weights.tolist() == [2]
+
+
+def test_degree_ignores_repeated_words(recwarn):
+  graph = BigramGraph.from_pairs(*count_bigrams([['very', 'very', 'good', 'war', 'good', 'very']]))
+  assert dict(zip(graph.words, graph.degree())) == {'good': 2, 'very': 1, 'war': 1}
+  assert not recwarn.list
+
+
+def test_network_panel_shares_the_graph():
+  from render_app import network_panel_body
+  bigrams = count_bigrams([['war', 'peace', 'war', 'peace', 'love', 'war', 'peace']])
+  graph = BigramGraph.from_pairs(*bigrams, min_count=2)
+  network, table = network_panel_body(bigrams).children
+  assert network.children[0].data == network_visualization(graph).data
+  assert str(table.children[0]) == str(centrality_table(graph))
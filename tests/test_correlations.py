@@ -0,0 +1,19 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from correlation_index import CorrelationIndex
+from correlator import SectionMatrix, get_all_correlations
+
+
+def test_index_orders_ties_like_get_all_correlations():
+  rng = np.random.default_rng(0)
+  counts = rng.poisson(10 ** 6, (200, 1))
+  # near copies of one word, weakest first: their p-values all round to 0, and exact copies tie on |r| too
+  noise = rng.poisson(1, (200, 1))
+  counts = np.concatenate([counts + 3 * noise, counts + 2 * noise, counts + noise, counts, counts, counts * 2,
+    rng.poisson(5, (200, 4))], axis=1)
+  word_counts = SectionMatrix(csr_matrix(counts), np.array([f'w{i}' for i in range(10)], dtype=object), np.full(200, 10))
+  index = CorrelationIndex(word_counts, top_k=3, block_size=4)
+  for word in word_counts.vocabulary:
+    expected = [correlation.word2 for correlation in get_all_correlations(word_counts, word)[:3]]
+    assert [correlation.word2 for correlation in index.get_correlations(word)] == expected
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+import document_store
+from document_store import DocumentStore, MemoryBackend, estimate_size
+
+
+def test_estimate_size_counts_buffers_and_strings():
+  words = np.array([f'word{i}' for i in range(1000)], dtype=object)
+  df = pd.DataFrame({'Word': words, 'Count': np.arange(1000)})
+  assert estimate_size(np.zeros(1000)) == 8000
+  assert 8000 + 1000 * 50 < estimate_size(words) < 8000 + 1000 * 70
+  assert estimate_size(df) > estimate_size(words) + 8000
+  assert estimate_size({'words': words, 'count': 1000}) > estimate_size(words)
+
+
+def test_memory_store_does_not_pickle(monkeypatch):
+  def pickle_everything(value):
+    raise AssertionError('pickled')
+  monkeypatch.setattr(document_store, 'serialize', pickle_everything)
+  store = DocumentStore(MemoryBackend(max_bytes=2**20))
+  store.save('a', counts=np.zeros(100000))
+  store.save('b', counts=np.zeros(100000))
+  # a session over the budget pushes out the least recently used one
+  assert store.get('a', 'counts') is None
+  assert len(store.get('b', 'counts')) == 100000
@@ -0,0 +1,48 @@
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from file_counts import FileCounts, count_file, read_head
+
+EDGE_CASES = [
+  (b'', FileCounts(0, 0, 0)),
+  (b'one', FileCounts(0, 1, 3)),
+  (b'  two words\n', FileCounts(1, 2, 12)),
+  (b'tab\tand\r\nreturn\n\n', FileCounts(3, 3, 17)),
+  # control and non-ASCII bytes neither start nor end a word in the C locale, so a lone
+  # em dash is no word and a non-breaking space does not split one, unlike in a UTF-8 locale
+  (b'\x00\x01 a\x7fb \x80', FileCounts(0, 1, 8)),
+  ('caf\u00e9 \u2014 end\u00a0here'.encode('utf8'), FileCounts(0, 2, 19)),
+]
+
+
+@pytest.mark.parametrize('contents, expected', EDGE_CASES)
+def test_count_file(tmp_path, contents, expected):
+  path = tmp_path / 'file.txt'
+  path.write_bytes(contents)
+  assert count_file(path) == expected
+  # words across block boundaries
+  assert count_file(path, block_size=3) == expected
+
+
+@pytest.mark.skipif(shutil.which('wc') is None, reason='needs wc')
+def test_count_file_matches_wc_in_the_c_locale(tmp_path):
+  rng = random.Random(0)
+  alphabet = b'ab \t\n\r\v\f\x00\x01\x7f\x80\xc2\xa0\xe2\x80\x83~!'
+  for i in range(50):
+    path = tmp_path / f'random-{i}.txt'
+    path.write_bytes(bytes(rng.choice(alphabet) for _ in range(rng.choice([1, 10, 1000, 5000]))))
+    output = subprocess.check_output(['wc', '-lwc', str(path)], env={**os.environ, 'LC_ALL': 'C'})
+    expected = FileCounts(*map(int, output.split()[:3]))
+    assert count_file(path) == expected
+    assert count_file(path, block_size=7) == expected
+
+
+def test_read_head_returns_complete_lines(tmp_path):
+  path = tmp_path / 'file.txt'
+  path.write_bytes(b'first\r\nsecond\nthird')
+  assert read_head(path, 1) == 'first\n'
+  assert read_head(path, 5) == 'first\nsecond\n'
@@ -0,0 +1,38 @@
+import os
+
+from gutenberg_counts import CountsIndex
+
+
+def write_counts(directory, book, counts):
+  (directory / f'{book}_counts.txt').write_text(''.join(f'{word}\t{count}\n' for word, count in counts.items()))
+
+
+def test_index_counts_terms_and_totals(tmp_path):
+  write_counts(tmp_path, 'PG1', {'war': 3, 'peace': 1})
+  write_counts(tmp_path, 'PG2', {'"quoted': 2, 'war': 1})
+  index = CountsIndex.open(str(tmp_path), str(tmp_path / 'index'))
+  assert index.term_counts(['war', 'peace', 'love'], ['PG2', 'PG1', 'PG3']).values.tolist() == [
+    [1, 0, 0], [3, 1, 0], [0, 0, 0]]
+  assert index.total_counts(['PG1', 'PG2']).tolist() == [4, 3]
+
+
+def test_open_rebuilds_a_stale_index(tmp_path):
+  write_counts(tmp_path, 'PG1', {'war': 3})
+  index_dir = str(tmp_path / 'index')
+  assert CountsIndex.open(str(tmp_path), index_dir).total_counts().tolist() == [3]
+  write_counts(tmp_path, 'PG1', {'war': 30})
+  assert CountsIndex.open(str(tmp_path), index_dir).total_counts().tolist() == [30]
+  write_counts(tmp_path, 'PG2', {'war': 1})
+  assert CountsIndex.open(str(tmp_path), index_dir).total_counts().to_dict() == {'PG1': 30, 'PG2': 1}
+  os.remove(tmp_path / 'PG1_counts.txt')
+  assert CountsIndex.open(str(tmp_path), index_dir).total_counts().to_dict() == {'PG2': 1}
+
+
+def test_open_reuses_a_current_index(tmp_path, monkeypatch):
+  write_counts(tmp_path, 'PG1', {'war': 3})
+  CountsIndex.open(str(tmp_path), str(tmp_path / 'index'))
+
+  def build(*args):
+    raise AssertionError('rebuilt an index that was current')
+  monkeypatch.setattr(CountsIndex, 'build', build)
+  assert CountsIndex.open(str(tmp_path), str(tmp_path / 'index')).total_counts().tolist() == [3]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from helpers import filter_mask, table_page
+
+WORDS = pd.DataFrame({'Word': ['sing', 'Ring', 'war', 'peace'], 'Count': [120, 80, 300, 100]})
+
+
+def test_filter_mask_reads_the_queries_the_table_sends():
+  assert WORDS[filter_mask(WORDS, '{Word} scontains ing')]['Word'].tolist() == ['sing', 'Ring']
+  assert WORDS[filter_mask(WORDS, '{Count} s> 100')]['Word'].tolist() == ['sing', 'war']
+  assert WORDS[filter_mask(WORDS, '{Count} s>= 100 && {Word} scontains "a"')]['Word'].tolist() == ['war', 'peace']
+  assert WORDS[filter_mask(WORDS, '{Word} s= war')]['Word'].tolist() == ['war']
+
+
+def test_filter_mask_ignores_case_only_when_asked():
+  assert WORDS[filter_mask(WORDS, '{Word} scontains RING')]['Word'].tolist() == []
+  assert WORDS[filter_mask(WORDS, '{Word} icontains RING')]['Word'].tolist() == ['Ring']
+  assert WORDS[filter_mask(WORDS, '{Word} s= ring')]['Word'].tolist() == []
+  assert WORDS[filter_mask(WORDS, '{Word} i= ring')]['Word'].tolist() == ['Ring']
+
+
+def test_filter_mask_ignores_what_it_cannot_read():
+  assert filter_mask(WORDS, '') == slice(None)
+  assert filter_mask(WORDS, '{Missing} s> 1') == slice(None)
+  assert filter_mask(WORDS, '{Count} s> many') == slice(None)
+
+
+def test_table_page_filters_before_paging():
+  records, page_count = table_page(WORDS, page_size=1, sort_by=[{'column_id': 'Count', 'direction': 'desc'}],
+    filter_query='{Count} s< 300')
+  assert (records, page_count) == ([{'Word': 'sing', 'Count': 120}], 3)
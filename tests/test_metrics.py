@@ -0,0 +1,32 @@
+import json
+import os
+import tracemalloc
+
+import metrics
+from metrics import Registry, timed
+
+
+def test_record_waits_for_the_flush(tmp_path):
+  registry = Registry(str(tmp_path), flush_seconds=3600)
+  registry.record('stage', {'stage': 'read_text'}, 0.5, 0.25)
+  assert not os.listdir(tmp_path)
+  assert 'linguine_stage_duration_seconds_count{stage="read_text"} 1' in registry.render()
+  with open(tmp_path / f'{os.getpid()}.json') as f:
+    assert [series['count'] for series in json.load(f).values()] == [1]
+
+
+def test_nested_timers_keep_the_outer_peak(tmp_path, monkeypatch):
+  registry = Registry(str(tmp_path), flush_seconds=3600)
+  monkeypatch.setattr(metrics, 'registry', registry)
+  tracemalloc.start()
+  try:
+    with timed('callback', callback='save_file'):
+      block = bytearray(10 << 20)
+      del block
+      with timed('stage', stage='write_file'):
+        pass
+  finally:
+    tracemalloc.stop()
+  peaks = {json.loads(key)[0]: series['peak'] for key, series in registry.series.items()}
+  assert peaks['callback'] > 9 << 20
+  assert peaks['stage'] < 1 << 20
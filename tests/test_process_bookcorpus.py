@@ -0,0 +1,38 @@
+import csv
+
+from process_bookcorpus import CHECKPOINT_COLUMNS, ROW_END, THERAPY_WORD_LIST, drop_partial_line, read_checkpoint
+
+
+def write_checkpoint(path, rows, partial=''):
+  with open(path, 'w', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(CHECKPOINT_COLUMNS)
+    writer.writerows(rows)
+    f.write(partial)
+
+
+def test_read_checkpoint_skips_incomplete_rows(tmp_path):
+  path = tmp_path / 'checkpoint.csv'
+  counts = list(range(len(THERAPY_WORD_LIST)))
+  # the last row was cut in the middle of its last count, 12 instead of 123
+  write_checkpoint(path, [['a.txt', *counts, ROW_END]], 'b.txt,' + ','.join(map(str, counts[:-1] + [12])))
+  done = read_checkpoint(path)
+  assert list(done['filename']) == ['a.txt']
+  assert done.iloc[0, 1:].tolist() == counts
+
+
+def test_drop_partial_line_lets_the_run_resume(tmp_path):
+  path = tmp_path / 'checkpoint.csv'
+  counts = [1] * len(THERAPY_WORD_LIST)
+  write_checkpoint(path, [['a.txt', *counts, ROW_END]], 'b.txt,1,1')
+  drop_partial_line(path)
+  with open(path, 'a', newline='') as f:
+    csv.writer(f).writerow(['b.txt', *counts, ROW_END])
+  assert list(read_checkpoint(path)['filename']) == ['a.txt', 'b.txt']
+
+
+def test_read_checkpoint_of_another_layout(tmp_path):
+  path = tmp_path / 'checkpoint.csv'
+  path.write_text('filename,trauma\na.txt,1\n')
+  assert read_checkpoint(path) is None
+  assert read_checkpoint(tmp_path / 'missing.csv') is None
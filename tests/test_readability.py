@@ -0,0 +1,59 @@
+import pytest
+import textstat
+
+from correlator import split_sections
+from readability import Readability, count_text, section_readability
+
+TOLERANCE = 0.01
+METRICS = ['flesch_reading_ease', 'flesch_kincaid_grade', 'smog_index', 'coleman_liau_index',
+  'automated_readability_index', 'dale_chall_readability_score', 'linsear_write_formula',
+  'gunning_fog', 'reading_time', 'text_standard']
+TEXTS = {
+  'dickens': '''It was the best of times, it was the worst of times. It was the age of wisdom, it
+was the age of foolishness! Wasn't it the epoch of belief -- or the epoch of incredulity?
+Mr. Lorry's "great" expectations = 3.5 units, e.g. U.S. currency... Short. Very short.''',
+  'simple': 'The cat sat on the mat. The dog ran to the cat. They sat in the sun and had a nap. ' * 5,
+  'technical': '''Polysyllabic terminology characterizes institutional documentation: administrators
+communicate responsibilities, organizational considerations and interdepartmental
+recommendations unambiguously. Nevertheless, comprehensibility deteriorates considerably.''',
+  'unpunctuated': 'a long line of words without any sentence ending at all just words and more words',
+  'one word': 'Hello',
+  'numbers': 'In 1984, 3 of 12 people paid $4.50 for 2-for-1 tickets (about 25%). That was 1/3 off!',
+}
+
+
+def textstat_scores(text):
+  textstat.textstat._cache_clear()
+  return {metric: getattr(textstat, metric)(text) for metric in METRICS}
+
+
+@pytest.mark.parametrize('name', TEXTS)
+def test_readability_matches_textstat(name):
+  text = TEXTS[name]
+  readability = Readability.of(text)
+  expected = textstat_scores(text)
+  assert readability.text_standard() == expected.pop('text_standard')
+  for metric, score in expected.items():
+    assert getattr(readability, metric)() == pytest.approx(score, abs=TOLERANCE), metric
+
+
+@pytest.mark.parametrize('name', TEXTS)
+def test_counts_match_textstat(name):
+  text = TEXTS[name]
+  textstat.textstat._cache_clear()
+  counts = count_text(text)
+  assert counts.words == textstat.lexicon_count(text)
+  assert counts.syllables == textstat.syllable_count(text)
+  assert counts.sentences == max(1, textstat.sentence_count(text))
+  assert counts.polysyllables == textstat.polysyllabcount(text)
+
+
+def test_section_readability_matches_textstat_per_section():
+  sections = split_sections(' '.join(TEXTS.values()) * 3, 8)
+  scores = section_readability(sections)
+  assert scores['section'].tolist() == list(range(1, len(sections) + 1))
+  for section, row in zip(sections, scores.itertuples()):
+    expected = textstat_scores(section)
+    assert row.reading_ease == pytest.approx(expected['flesch_reading_ease'], abs=TOLERANCE)
+    assert row.grade_level == pytest.approx(expected['flesch_kincaid_grade'], abs=TOLERANCE)
+    assert row.reading_index == pytest.approx(expected['automated_readability_index'], abs=TOLERANCE)
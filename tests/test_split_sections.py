@@ -0,0 +1,26 @@
+import random
+import re
+
+import pytest
+
+import correlator
+from correlator import split_sections
+
+
+def reference_token_boundaries(text, section_count):
+  starts = [match.start() for match in re.finditer(r'\S+', text)]
+  return [starts[len(starts) * i // section_count] if starts else len(text) for i in range(1, section_count)]
+
+
+@pytest.mark.parametrize('block_size', [3, 1 << 20])
+def test_token_sections_start_at_equal_token_counts(monkeypatch, block_size):
+  monkeypatch.setattr(correlator, 'BLOCK_SIZE', block_size)
+  rng = random.Random(0)
+  alphabet = ['a', 'é', '—', '\U0001f600', ' ', '\n', '\t', '\xa0', '\x1c', '　', '\x08']
+  for _ in range(500):
+    text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+    section_count = rng.randint(1, 8)
+    sections = split_sections(text, section_count, 'tokens')
+    assert ''.join(sections) == text
+    positions = [len(''.join(sections[:i])) for i in range(1, len(sections))]
+    assert positions == reference_token_boundaries(text, section_count)
@@ -0,0 +1,30 @@
+import pytest
+
+from correlator import count_ngrams, get_tokenizer
+
+
+def test_encode_gives_every_document_its_own_vocabulary():
+  tokenizer = get_tokenizer()
+  first = tokenizer.ids('Peace and war, war and peace')
+  second = tokenizer.ids('Love in war')
+  assert list(first.vocabulary) == ['peace', 'war']
+  assert first.ids.tolist() == [0, 1, 1, 0]
+  assert list(second.vocabulary) == ['love', 'war']
+  assert second.ids.tolist() == [0, 1]
+
+
+def test_count_ngrams_orders_columns_alphabetically():
+  counts, vocabulary = count_ngrams([['war', 'peace', 'war'], ['peace']], ngrams_range=(1, 2))
+  assert list(vocabulary) == ['peace', 'peace war', 'war', 'war peace']
+  assert counts.toarray().tolist() == [[1, 1, 2, 1], [1, 0, 0, 0]]
+
+
+def test_count_ngrams_keeps_the_most_frequent():
+  counts, vocabulary = count_ngrams([['war', 'peace', 'war', 'love', 'war']], max_features=1)
+  assert list(vocabulary) == ['war']
+  assert counts.toarray().tolist() == [[3]]
+
+
+def test_count_ngrams_without_tokens():
+  with pytest.raises(ValueError):
+    count_ngrams([[], []])